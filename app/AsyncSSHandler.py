@@ -1,19 +1,99 @@
 import asyncio
-from typing import List, TypedDict
+import os
+import signal
+from typing import Dict, List
 import time
 
+from app.core.config import settings
+from app.host_health import HOST_HEALTH, SSH_CONNECTION_ERROR_CODE
+from app.ssh_broker_client import (
+    SSH_BROKER_CLIENT,
+    SshBrokerError,
+    SshBrokerResponseError,
+)
+from app.ssh_result import SSHCommandResult, SSHResult, SSHResultSet
+from app.ssh_sessions import SSH_SESSIONS, SshSessionError
+from app.ssh_socket_usage import mark_host_used
 
-class SSHCommandResult(TypedDict):
-    host: str
-    stdout: str | None
-    stderr: str | None
-    returncode: int | None
+STREAM_CHUNK_SIZE = 64 * 1024
+HOST_UNAVAILABLE = "unavailable"
 
 
-async def _execute_ssh_command(host, command, verbose: bool) -> SSHCommandResult:
+def _build_ssh_command(host: str, command: str) -> str:
+    return f'ssh -q  {host} "{command}"'
+
+
+def _print_answer(
+    host: str,
+    execution_time: float,
+    returncode: int | None,
+    stdout: bytes | str | None,
+    stderr: bytes | str | None,
+) -> None:
+    # Sizes only, so printing doesn't decode output nobody reads
+    print(
+        f"{host} exited with {returncode} in {execution_time:.2f}s : "
+        f"{len(stdout or '')} bytes out, {len(stderr or '')} bytes err"
+    )
+
+
+class _StdoutBudget:
+    """
+    Collects stdout fed in chunks until `max_lines` lines are kept or more
+    than `max_bytes` bytes arrive. A line cut by the byte budget is dropped.
+    """
+
+    def __init__(self, max_lines: int | None, max_bytes: int | None):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.exceeded = False
+        self._lines: List[bytes] = []
+        self._buffer = b""
+        self._bytes_read = 0
+
+    def feed(self, chunk: bytes) -> None:
+        if (
+            self.max_bytes is not None
+            and self._bytes_read + len(chunk) > self.max_bytes
+        ):
+            chunk = chunk[: self.max_bytes - self._bytes_read]
+            self.exceeded = True
+        self._bytes_read += len(chunk)
+        *complete_lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        for line in complete_lines:
+            self._lines.append(line)
+            if self.max_lines is not None and len(self._lines) >= self.max_lines:
+                self.exceeded = True
+                break
+
+    def output(self) -> bytes:
+        lines = self._lines
+        if self._buffer and not self.exceeded:
+            lines = lines + [self._buffer]
+        return b"\n".join(lines)
+
+
+def _budget_result(
+    host: str,
+    budget: _StdoutBudget,
+    stderr: bytes,
+    returncode: int | None,
+    execution_time: float,
+    verbose: bool,
+) -> SSHResult:
+    stdout = budget.output()
+    # A command stopped early has no exit code of its own
+    if budget.exceeded:
+        returncode = None
+    if verbose:
+        _print_answer(host, execution_time, returncode, stdout, stderr)
+    return SSHResult(host, stdout, stderr, returncode, execution_time, budget.exceeded)
+
+
+async def _execute_ssh_command(host, command, verbose: bool) -> SSHResult:
     start_time = time.time()
 
-    ssh_command = f'ssh -q  {host} "{command}"'
+    ssh_command = _build_ssh_command(host, command)
     process = await asyncio.create_subprocess_shell(
         ssh_command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
     )
@@ -27,38 +107,262 @@ async def _execute_ssh_command(host, command, verbose: bool) -> SSHCommandResult
     execution_time = end_time - start_time
 
     if verbose:
-        succesfulAnswer = stdout.decode().strip().rstrip()
-        failAnswer = stderr.decode().strip().rstrip()
-        if failAnswer:
-            print(f"{host} failed in {execution_time:.2f}s : {failAnswer}")
-        else:
-            print(f"{host} answered in {execution_time:.2f}s : {succesfulAnswer}")
-
-    stdout_output: str | None = (
-        stdout.decode().strip() if stdout.decode().strip() != "" else None
+        _print_answer(host, execution_time, process.returncode, stdout, stderr)
+    return SSHResult(host, stdout, stderr, process.returncode, execution_time)
+
+
+async def _stream_ssh_command(
+    host, command, verbose: bool, budget: _StdoutBudget
+) -> SSHResult:
+    """
+    Read stdout as it arrives until the budget is used up, then terminate
+    the ssh process. The remote command ends on its next write.
+    """
+    start_time = time.time()
+
+    ssh_command = _build_ssh_command(host, command)
+    process = await asyncio.create_subprocess_shell(
+        ssh_command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+
+    if verbose:
+        print(f"{host} {ssh_command}| Streaming result...")
+
+    eof = False
+    try:
+        while not budget.exceeded:
+            chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                eof = True
+                break
+            budget.feed(chunk)
+    finally:
+        if process.returncode is None and not eof:
+            try:
+                # The shell and everything it started hold the pipes open
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        returncode = await process.wait()
+        stderr = await stderr_task
+
+    return _budget_result(
+        host, budget, stderr, returncode, time.time() - start_time, verbose
+    )
+
+
+def _build_session_budget_command(command: str, budget: _StdoutBudget) -> str:
+    # The session can't be interrupted, so head stops the command on the
+    # host instead. One byte over the budget tells a cut line from a whole
+    # one. `$` is escaped like in any command, sessions run bash.
+    limited = f"({command})"
+    if budget.max_bytes is not None:
+        limited += f" | head -c {budget.max_bytes + 1}"
+    if budget.max_lines is not None:
+        limited += f" | head -n {budget.max_lines}"
+    return f"{limited}; exit \\${{PIPESTATUS[0]}}"
+
+
+async def _execute_in_session(
+    host, command, verbose: bool, budget: _StdoutBudget | None = None
+) -> SSHResult:
+    start_time = time.time()
+    if verbose:
+        print(f"{host} session| {command}| Awaiting result...")
+
+    if budget is None:
+        stdout, stderr, returncode = await SSH_SESSIONS.run(host, command)
+    else:
+        stdout, stderr, returncode = await SSH_SESSIONS.run(
+            host, _build_session_budget_command(command, budget)
+        )
+        # Sessions end the output with a newline of their own
+        budget.feed(stdout.removesuffix(b"\n"))
+
+    execution_time = time.time() - start_time
+    if budget is not None:
+        return _budget_result(host, budget, stderr, returncode, execution_time, verbose)
+    if verbose:
+        _print_answer(host, execution_time, returncode, stdout, stderr)
+    return SSHResult(host, stdout, stderr, returncode, execution_time)
+
+
+async def _run_ssh_command(
+    host,
+    command,
+    verbose: bool,
+    max_lines: int | None = None,
+    max_bytes: int | None = None,
+) -> SSHResult:
+    """
+    Run the command in a persistent shell session of the host when they are
+    enabled, in a new ssh process otherwise or when no session can take it.
+    With a `max_lines` or `max_bytes` budget, stdout is read only up to it.
+    """
+    budget = None
+    if max_lines is not None or max_bytes is not None:
+        budget = _StdoutBudget(max_lines, max_bytes)
+    if settings.SSH_PERSISTENT_SESSIONS:
+        try:
+            return await _execute_in_session(host, command, verbose, budget)
+        except SshSessionError as e:
+            print(f"{host} running without session: {e}")
+    if budget is not None:
+        return await _stream_ssh_command(host, command, verbose, budget)
+    return await _execute_ssh_command(host, command, verbose)
+
+
+def _unavailable_result(host: str) -> SSHResult:
+    return SSHResult(host, None, HOST_UNAVAILABLE, None)
+
+
+async def _execute_with_circuit_breaker(
+    host,
+    command,
+    verbose: bool,
+    max_lines: int | None = None,
+    max_bytes: int | None = None,
+) -> SSHResult:
+    if not HOST_HEALTH.allow_request(host):
+        if verbose:
+            print(f"{host} skipped: circuit open")
+        return _unavailable_result(host)
+    start_time = time.perf_counter()
+    result = SSHResult.coerce(
+        await _run_ssh_command(host, command, verbose, max_lines, max_bytes)
     )
-    stderr_output: str | None = (
-        stderr.decode().strip() if stderr.decode().strip() != "" else None
+    HOST_HEALTH.record_result(
+        host, result.returncode, (time.perf_counter() - start_time) * 1000
+    )
+    if result.returncode != SSH_CONNECTION_ERROR_CODE:
+        mark_host_used(host)
+    return result
+
+
+async def _dispatch_ssh_command(
+    host,
+    command,
+    verbose: bool,
+    max_lines: int | None = None,
+    max_bytes: int | None = None,
+) -> SSHResult:
+    """
+    Send the command to the shared SSH broker when one is configured, run it
+    from this process if the broker can't be reached. A request the broker
+    has received is never run again here, the command may already have run.
+    """
+    if SSH_BROKER_CLIENT.is_enabled:
+        try:
+            result: SSHCommandResult = await SSH_BROKER_CLIENT.request(
+                "exec",
+                host=host,
+                command=command,
+                verbose=verbose,
+                max_lines=max_lines,
+                max_bytes=max_bytes,
+            )
+            return SSHResult.coerce(result)
+        except SshBrokerResponseError:
+            raise
+        except SshBrokerError as e:
+            print(f"{host} running locally: {e}")
+    return await _execute_with_circuit_breaker(
+        host, command, verbose, max_lines, max_bytes
     )
-    returncode_output: int | None = process.returncode
-    return {
-        "host": host,
-        "stdout": stdout_output,
-        "stderr": stderr_output,
-        "returncode": returncode_output,
-    }
 
 
 async def execute_ssh_commands_in_batch(
-    server_list, command, verbose: bool
-) -> List[SSHCommandResult]:
-    tasks = [_execute_ssh_command(host, command, verbose) for host in server_list]
+    server_list,
+    command,
+    verbose: bool,
+    max_lines: int | None = None,
+    max_bytes: int | None = None,
+) -> SSHResultSet:
+    """
+    Run a command on several hosts. Hosts with an open circuit are skipped
+    and reported with `unavailable` stderr.
+
+    Once `max_lines` lines or more than `max_bytes` bytes of a host's stdout
+    are read its command is stopped, the result is then marked truncated
+    with an unknown return code.
+    """
+    tasks = [
+        _dispatch_ssh_command(host, command, verbose, max_lines, max_bytes)
+        for host in server_list
+    ]
     results = await asyncio.gather(*tasks)
-    return results
+    return SSHResultSet(results)
+
+
+class SshConcurrencyLimits:
+    """
+    Slots of execute_ssh_commands_per_host: at most `max_concurrency`
+    commands at once overall and `max_per_host` on a single host. They are
+    shared by every call using the same limits, so concurrent callers
+    together keep a ControlMaster under sshd's MaxSessions.
+    """
+
+    def __init__(self, max_concurrency: int, max_per_host: int):
+        self.max_per_host = max_per_host
+        self.total = asyncio.Semaphore(max_concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def host(self, host: str) -> asyncio.Semaphore:
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        return self._hosts[host]
+
+
+SSH_BATCH_LIMITS = SshConcurrencyLimits(
+    settings.SSH_BATCH_MAX_CONCURRENCY, settings.SSH_BATCH_MAX_PER_HOST
+)
+
+
+async def execute_ssh_commands_per_host(
+    commands_by_host: Dict[str, List[str]],
+    verbose: bool,
+    limits: SshConcurrencyLimits | None = None,
+) -> Dict[str, SSHResultSet]:
+    """
+    Run a different list of commands on each host in one pass, within
+    SSH_BATCH_LIMITS unless other limits are given. Results keep the shape
+    of the input: host to results in command order.
+    """
+    limits = limits or SSH_BATCH_LIMITS
+
+    async def run_command(host: str, command: str) -> SSHResult:
+        # The host slot is taken first so waiting on a busy host doesn't
+        # hold a slot other hosts could use
+        async with limits.host(host), limits.total:
+            return await _dispatch_ssh_command(host, command, verbose)
+
+    async def run_host_commands(host: str, commands: List[str]) -> SSHResultSet:
+        return SSHResultSet(
+            await asyncio.gather(*(run_command(host, command) for command in commands))
+        )
+
+    results = await asyncio.gather(
+        *(
+            run_host_commands(host, commands)
+            for host, commands in commands_by_host.items()
+        )
+    )
+    return dict(zip(commands_by_host, results))
 
 
 async def execute_ssh_command(
-    host: str, command: str, verbose: bool = True
-) -> SSHCommandResult:
-    result = await asyncio.gather(_execute_ssh_command(host, command, verbose))
+    host: str,
+    command: str,
+    verbose: bool = True,
+    max_lines: int | None = None,
+    max_bytes: int | None = None,
+) -> SSHResult:
+    """Run a command on a host, budgets as in `execute_ssh_commands_in_batch`."""
+    result = await asyncio.gather(
+        _dispatch_ssh_command(host, command, verbose, max_lines, max_bytes)
+    )
     return result[0]
@@ -0,0 +1,51 @@
+"""Add indexes for keyset paginated activity log search
+
+Revision ID: 01da257dbb85
+Revises: 7a4d2e9c1b35
+Create Date: 2026-10-19 10:12:31.518204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '01da257dbb85'
+down_revision = '7a4d2e9c1b35'
+branch_labels = None
+depends_on = None
+
+DETAIL_INDEXES = [
+    ('log_zone_master_delete', 'domain'),
+    ('log_zone_master_set', 'domain'),
+    ('log_zone_master_get', 'domain'),
+    ('log_plesk_subscription_login', 'plesk_server'),
+    ('log_plesk_subscription_login', 'ssh_username'),
+    ('log_plesk_subscription_login', 'subscription_id'),
+    ('log_plesk_mail_get_test_mail', 'plesk_server'),
+    ('log_plesk_mail_get_test_mail', 'domain'),
+]
+
+
+def upgrade():
+    # Pages are read newest first by (timestamp, id), optionally per user or
+    # log type
+    op.create_index('ix_log_user_activity_timestamp_id', 'log_user_activity',
+                    ['timestamp', 'id'])
+    op.create_index('ix_log_user_activity_user_id_timestamp_id', 'log_user_activity',
+                    ['user_id', 'timestamp', 'id'])
+    op.create_index('ix_log_user_activity_log_type_timestamp_id', 'log_user_activity',
+                    ['log_type', 'timestamp', 'id'])
+    op.create_index('ix_log_user_activity_ip', 'log_user_activity', ['ip'])
+    for table, column in DETAIL_INDEXES:
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def downgrade():
+    for table, column in DETAIL_INDEXES:
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
+    op.drop_index('ix_log_user_activity_ip', table_name='log_user_activity')
+    op.drop_index('ix_log_user_activity_log_type_timestamp_id',
+                  table_name='log_user_activity')
+    op.drop_index('ix_log_user_activity_user_id_timestamp_id',
+                  table_name='log_user_activity')
+    op.drop_index('ix_log_user_activity_timestamp_id', table_name='log_user_activity')
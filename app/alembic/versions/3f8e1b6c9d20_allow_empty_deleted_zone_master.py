@@ -0,0 +1,32 @@
+"""Allow an empty zone master in zone master removal logs
+
+Revision ID: 3f8e1b6c9d20
+Revises: e6b2f0a9d713
+Create Date: 2026-10-19 22:41:07.518904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8e1b6c9d20'
+down_revision = 'e6b2f0a9d713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('log_zone_master_delete', 'current_zone_master',
+                    existing_type=sa.String(), nullable=True)
+    # Domains without a zone master were logged as the string 'None'
+    for table in ['log_zone_master_delete', 'log_zone_master_set']:
+        op.execute(f"UPDATE {table} SET current_zone_master = NULL "
+                   "WHERE current_zone_master = 'None'")
+
+
+def downgrade():
+    op.execute("UPDATE log_zone_master_delete SET current_zone_master = 'None' "
+               "WHERE current_zone_master IS NULL")
+    op.alter_column('log_zone_master_delete', 'current_zone_master',
+                    existing_type=sa.String(), nullable=False)
@@ -0,0 +1,141 @@
+"""Partition the activity log tables by month
+
+Revision ID: 5b7e0c2d9a41
+Revises: 01da257dbb85
+Create Date: 2026-10-19 14:03:52.107316
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e0c2d9a41'
+down_revision = '01da257dbb85'
+branch_labels = None
+depends_on = None
+
+LOG_TABLE = 'log_user_activity'
+DETAIL_TABLES = [
+    'log_zone_master_delete',
+    'log_zone_master_set',
+    'log_zone_master_get',
+    'log_plesk_subscription_login',
+    'log_plesk_mail_get_test_mail',
+]
+LOG_INDEXES = [
+    ('ix_log_user_activity_timestamp_id', ['timestamp', 'id']),
+    ('ix_log_user_activity_user_id_timestamp_id', ['user_id', 'timestamp', 'id']),
+    ('ix_log_user_activity_log_type_timestamp_id', ['log_type', 'timestamp', 'id']),
+    ('ix_log_user_activity_ip', ['ip']),
+]
+DETAIL_INDEXES = [
+    ('log_zone_master_delete', 'domain'),
+    ('log_zone_master_set', 'domain'),
+    ('log_zone_master_get', 'domain'),
+    ('log_plesk_subscription_login', 'plesk_server'),
+    ('log_plesk_subscription_login', 'ssh_username'),
+    ('log_plesk_subscription_login', 'subscription_id'),
+    ('log_plesk_mail_get_test_mail', 'plesk_server'),
+    ('log_plesk_mail_get_test_mail', 'domain'),
+]
+# Same as the LOG_PARTITION_MONTHS_AHEAD default
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month):
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def _drop_indexes():
+    for table, column in DETAIL_INDEXES:
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
+    for name, _ in LOG_INDEXES:
+        op.drop_index(name, table_name=LOG_TABLE)
+
+
+def _create_indexes():
+    for name, columns in LOG_INDEXES:
+        op.create_index(name, LOG_TABLE, columns)
+    for table, column in DETAIL_INDEXES:
+        op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def _rename_to_old(table):
+    op.rename_table(table, f'{table}_old')
+    op.execute(f'ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey '
+               f'TO {table}_old_pkey')
+
+
+def upgrade():
+    _drop_indexes()
+    op.execute(f'UPDATE {LOG_TABLE} SET timestamp = now() WHERE timestamp IS NULL')
+    for table in [LOG_TABLE] + DETAIL_TABLES:
+        _rename_to_old(table)
+
+    # Primary keys of partitioned tables have to include the partition key,
+    # the details tables get the timestamp of their log to be partitioned
+    # the same way
+    op.execute(f'CREATE TABLE {LOG_TABLE} (LIKE {LOG_TABLE}_old INCLUDING DEFAULTS) '
+               'PARTITION BY RANGE (timestamp)')
+    op.create_primary_key(f'{LOG_TABLE}_pkey', LOG_TABLE, ['id', 'timestamp'])
+    op.create_foreign_key(f'{LOG_TABLE}_user_id_fkey', LOG_TABLE, 'user',
+                          ['user_id'], ['id'])
+    for table in DETAIL_TABLES:
+        op.execute(f'CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS, '
+                   'timestamp TIMESTAMP WITH TIME ZONE NOT NULL) '
+                   'PARTITION BY RANGE (timestamp)')
+        op.create_primary_key(f'{table}_pkey', table, ['id', 'timestamp'])
+        op.create_foreign_key(f'{table}_id_timestamp_fkey', table, LOG_TABLE,
+                              ['id', 'timestamp'], ['id', 'timestamp'],
+                              ondelete='CASCADE')
+
+    oldest = op.get_bind().execute(
+        sa.text(f'SELECT min(timestamp) FROM {LOG_TABLE}_old')
+    ).scalar()
+    now = datetime.now(timezone.utc)
+    oldest = (oldest or now).astimezone(timezone.utc)
+    month = date(oldest.year, oldest.month, 1)
+    last_month = _add_months(date(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last_month:
+        for table in [LOG_TABLE] + DETAIL_TABLES:
+            op.execute(f'CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} '
+                       f'FOR VALUES FROM ({_bound(month)}) '
+                       f'TO ({_bound(_add_months(month, 1))})')
+        month = _add_months(month, 1)
+
+    op.execute(f'INSERT INTO {LOG_TABLE} SELECT * FROM {LOG_TABLE}_old')
+    for table in DETAIL_TABLES:
+        op.execute(f'INSERT INTO {table} SELECT details.*, log.timestamp '
+                   f'FROM {table}_old details JOIN {LOG_TABLE}_old log USING (id)')
+        op.drop_table(f'{table}_old')
+    op.drop_table(f'{LOG_TABLE}_old')
+    _create_indexes()
+
+
+def downgrade():
+    _drop_indexes()
+    for table in [LOG_TABLE] + DETAIL_TABLES:
+        op.execute(f'CREATE TABLE {table}_plain (LIKE {table} INCLUDING DEFAULTS)')
+        op.execute(f'INSERT INTO {table}_plain SELECT * FROM {table}')
+    for table in DETAIL_TABLES:
+        op.drop_table(table)
+        op.drop_column(f'{table}_plain', 'timestamp')
+    op.drop_table(LOG_TABLE)
+
+    for table in [LOG_TABLE] + DETAIL_TABLES:
+        op.rename_table(f'{table}_plain', table)
+        op.create_primary_key(f'{table}_pkey', table, ['id'])
+    op.create_foreign_key(f'{LOG_TABLE}_user_id_fkey', LOG_TABLE, 'user',
+                          ['user_id'], ['id'])
+    for table in DETAIL_TABLES:
+        op.create_foreign_key(f'{table}_id_fkey', table, LOG_TABLE,
+                              ['id'], ['id'], ondelete='CASCADE')
+    _create_indexes()
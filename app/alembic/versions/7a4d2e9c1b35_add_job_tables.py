@@ -0,0 +1,61 @@
+"""Add the background job tables
+
+Revision ID: 7a4d2e9c1b35
+Revises: 1a31ce608336
+Create Date: 2026-10-19 02:56:09.204371
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4d2e9c1b35'
+down_revision = '1a31ce608336'
+branch_labels = None
+depends_on = None
+
+ENUM_NAMES = ['jobtype', 'jobstatus', 'jobitemstatus']
+
+
+def upgrade():
+    op.create_table(
+        'job',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('ip', sa.String(length=15), nullable=False),
+        sa.Column('job_type', sa.Enum('ZONE_MASTER_MIGRATION', 'ZONE_MASTER_REMOVAL',
+                                      name='jobtype'), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED',
+                                    'CANCELLED', name='jobstatus'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True),
+                  server_default=sa.text('now()'), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'job_item',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('job_id', sa.UUID(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'DONE', 'FAILED', 'CANCELLED',
+                                    name='jobitemstatus'), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['job.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_item_job_id', 'job_item', ['job_id'])
+
+
+def downgrade():
+    op.drop_index('ix_job_item_job_id', table_name='job_item')
+    op.drop_table('job_item')
+    op.drop_table('job')
+    for name in ENUM_NAMES:
+        sa.Enum(name=name).drop(op.get_bind(), checkfirst=True)
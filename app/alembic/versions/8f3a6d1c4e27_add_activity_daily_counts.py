@@ -0,0 +1,49 @@
+"""Add daily activity log counts
+
+Revision ID: 8f3a6d1c4e27
+Revises: 5b7e0c2d9a41
+Create Date: 2026-10-19 16:21:07.384410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3a6d1c4e27'
+down_revision = '5b7e0c2d9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'log_activity_daily_count',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('log_type', postgresql.ENUM(name='useractiontype',
+                                              create_type=False), nullable=False),
+        sa.Column('plesk_server', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'user_id', 'log_type', 'plesk_server'),
+    )
+    # Counts of the logs written so far, later ones are added as they are
+    # written
+    op.execute(
+        "INSERT INTO log_activity_daily_count "
+        "(day, user_id, log_type, plesk_server, count) "
+        "SELECT (log.timestamp AT TIME ZONE 'UTC')::date, log.user_id, log.log_type, "
+        "coalesce(login.plesk_server, mail.plesk_server, ''), count(*) "
+        "FROM log_user_activity log "
+        "LEFT JOIN log_plesk_subscription_login login "
+        "ON login.id = log.id AND login.timestamp = log.timestamp "
+        "LEFT JOIN log_plesk_mail_get_test_mail mail "
+        "ON mail.id = log.id AND mail.timestamp = log.timestamp "
+        "GROUP BY 1, 2, 3, 4"
+    )
+
+
+def downgrade():
+    op.drop_table('log_activity_daily_count')
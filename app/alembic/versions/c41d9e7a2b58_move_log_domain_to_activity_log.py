@@ -0,0 +1,50 @@
+"""Move the log domain to the activity log table
+
+Revision ID: c41d9e7a2b58
+Revises: 8f3a6d1c4e27
+Create Date: 2026-10-19 18:44:19.602953
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d9e7a2b58'
+down_revision = '8f3a6d1c4e27'
+branch_labels = None
+depends_on = None
+
+LOG_TABLE = 'log_user_activity'
+DOMAIN_TABLES = [
+    'log_zone_master_delete',
+    'log_zone_master_set',
+    'log_zone_master_get',
+    'log_plesk_mail_get_test_mail',
+]
+
+
+def upgrade():
+    # A domain's history is then a range of one index instead of an OR
+    # across four outer joined tables
+    op.add_column(LOG_TABLE, sa.Column('domain', sa.String(), nullable=True))
+    for table in DOMAIN_TABLES:
+        op.execute(f'UPDATE {LOG_TABLE} log SET domain = details.domain '
+                   f'FROM {table} details '
+                   'WHERE details.id = log.id AND details.timestamp = log.timestamp')
+        op.drop_index(f'ix_{table}_domain', table_name=table)
+        op.drop_column(table, 'domain')
+    op.create_index('ix_log_user_activity_domain_timestamp_id', LOG_TABLE,
+                    ['domain', 'timestamp', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_log_user_activity_domain_timestamp_id', table_name=LOG_TABLE)
+    for table in DOMAIN_TABLES:
+        op.add_column(table, sa.Column('domain', sa.String(), nullable=True))
+        op.execute(f'UPDATE {table} details SET domain = log.domain '
+                   f'FROM {LOG_TABLE} log '
+                   'WHERE details.id = log.id AND details.timestamp = log.timestamp')
+        op.alter_column(table, 'domain', nullable=False)
+        op.create_index(f'ix_{table}_domain', table, ['domain'])
+    op.drop_column(LOG_TABLE, 'domain')
@@ -0,0 +1,29 @@
+"""Add the user version stamp
+
+Revision ID: e6b2f0a9d713
+Revises: c41d9e7a2b58
+Create Date: 2026-10-19 20:05:36.811250
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2f0a9d713'
+down_revision = 'c41d9e7a2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('user_version')
@@ -1,4 +1,4 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
 import jwt
@@ -6,14 +6,16 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import exc
 
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import engine, AsyncSessionLocal
 from app.schemas import TokenPayload, UserRoles, UserPublic
+from app.user_cache import USER_CACHE
 from typing import List
 import app.db.models
 
@@ -31,7 +33,17 @@ def get_db() -> Generator[Session, None, None]:
             raise
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except exc.SQLAlchemyError:
+            await session.rollback()
+            raise
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
@@ -47,14 +59,16 @@ def get_current_user(session: SessionDep, token: TokenDep) -> UserPublic:
             detail="Could not validate credentials",
         )
 
-    user = session.get(app.db.models.User, token_data.sub)
+    user = USER_CACHE.get(session, token_data.sub)
+    if user is None:
+        db_user = session.get(app.db.models.User, token_data.sub)
+        if not db_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = UserPublic.model_validate(db_user, from_attributes=True)
+        USER_CACHE.set(user)
 
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-
-    user = UserPublic.model_validate(user, from_attributes=True)
     return user
 
 
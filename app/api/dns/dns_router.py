@@ -1,4 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request
+import asyncio
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Depends,
+    BackgroundTasks,
+    Query,
+    Request,
+    Response,
+)
 from typing import Annotated
 
 from app.api.dns.ssh_utils import (
@@ -10,8 +20,16 @@ from app.api.dns.dns_utils import resolve_record, RecordNotFoundError
 from app.db.crud import (
     log_dns_zone_master_removal,
     log_dns_zone_master_fetch,
+    create_job,
+    get_job_progress,
+)
+from app.api.dns import zonemaster_removal  # noqa: F401 registers job handler
+from app.job_queue import JOB_QUEUE
+from app.api.dependencies import (
+    CurrentUser,
+    SessionDep,
+    RoleChecker,
 )
-from app.api.dependencies import CurrentUser, SessionDep, RoleChecker
 from app.schemas import (
     UserRoles,
     DomainName,
@@ -23,8 +41,13 @@ from app.schemas import (
     Message,
     SubscriptionName,
     HostIpData,
+    JobType,
+    JobProgress,
+    ZoneMasterRemovalInput,
 )
 from app.DomainMapper import HOSTS
+from app.core.config import settings
+from app.workflow import Workflow, WorkflowStep
 
 router = APIRouter(tags=["dns"], prefix="/dns")
 
@@ -62,7 +85,6 @@ async def get_ptr_record(ip: Annotated[IPv4Address, Query()]):
     dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
 )
 async def get_zone_master_from_dns_servers(
-    session: SessionDep,
     background_tasks: BackgroundTasks,
     current_user: CurrentUser,
     domain: Annotated[SubscriptionName, Depends()],
@@ -79,7 +101,6 @@ async def get_zone_master_from_dns_servers(
         request_ip = IPv4Address(ip=request.client.host)
         background_tasks.add_task(
             log_dns_zone_master_fetch,
-            session=session,
             user=current_user,
             domain=domain,
             ip=request_ip,
@@ -132,19 +153,35 @@ async def get_ns_records(
     dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
 )
 async def delete_zone_file_for_domain(
-    session: SessionDep,
     background_tasks: BackgroundTasks,
     current_user: CurrentUser,
     domain: Annotated[DomainName, Query()],
     request: Request,
+    response: Response,
 ):
-    try:
-        curr_zonemaster = await dns_get_domain_zone_master(domain)
+    async def get_zone_master():
+        return await dns_get_domain_zone_master(domain)
+
+    async def remove_zone_master(zone_master) -> None:
         await dns_remove_domain_zone_master(domain)
+
+    try:
+        workflow_result = await Workflow(
+            [
+                WorkflowStep("zone_master", get_zone_master),
+                WorkflowStep(
+                    "remove_zone_master",
+                    remove_zone_master,
+                    depends_on=["zone_master"],
+                ),
+            ]
+        ).run()
+        if settings.SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = workflow_result.server_timing_header()
+        curr_zonemaster = workflow_result.results["zone_master"]
         request_ip = IPv4Address(ip=request.client.host)
         background_tasks.add_task(
             log_dns_zone_master_removal,
-            session=session,
             user=current_user,
             current_zone_master=curr_zonemaster,
             domain=domain,
@@ -155,6 +192,36 @@ async def delete_zone_file_for_domain(
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.post(
+    "/internal/zonemaster/removals",
+    status_code=202,
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+async def create_zone_master_removal(
+    data: ZoneMasterRemovalInput,
+    current_user: CurrentUser,
+    session: SessionDep,
+    request: Request,
+) -> JobProgress:
+    def create() -> JobProgress:
+        job = create_job(
+            session=session,
+            user=current_user,
+            ip=IPv4Address(ip=request.client.host),
+            job_type=JobType.ZONE_MASTER_REMOVAL,
+            items=[
+                (domain, {})
+                for domain in dict.fromkeys(d.lower() for d in data.domains)
+            ],
+        )
+        return get_job_progress(session=session, job=job)
+
+    # The session is sync, keep its queries off the event loop
+    progress = await asyncio.to_thread(create)
+    JOB_QUEUE.enqueue(progress.id)
+    return progress
+
+
 @router.get(
     "/internal/hostbydomain",
     dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
@@ -1,40 +1,49 @@
+import re
 import shlex
+from typing import Dict, Iterable, List
 
-from app.AsyncSSHandler import execute_ssh_commands_in_batch
-from app.schemas import SubscriptionName, PleskServerDomain, DomainName, DNS_SERVER_LIST
+from app.AsyncSSHandler import (
+    execute_ssh_commands_in_batch,
+    execute_ssh_commands_per_host,
+)
+from app.ssh_result import SSHResultSet
+from app.composite_command import CompositeStep, execute_composite_command_in_batch
+from app.schemas import SubscriptionName, DomainName, DNS_SERVER_LIST
 from app.api.dns.dns_utils import resolve_record
 
 ZONEFILE_PATH = "/var/opt/isc/scls/isc-bind/zones/_default.nzf"
 DOMAIN_REGEX_PATTERN = (
     r"^([a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,6}$"
 )
+RNDC_PATH = "/opt/isc/isc-bind/root/usr/sbin/rndc"
+ZONEFILE_QUOTED_NAME_PATTERN = re.compile(r'"\\?([^"\\]+)\\?"')
+ZONEFILE_IP_PATTERN = re.compile(r"\b((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b){4}")
 
 
 async def build_get_zone_master_command(domain: SubscriptionName | DomainName) -> str:
     escaped_domain = shlex.quote('\\"' + domain.name.lower())
     return (
-        f"cat {ZONEFILE_PATH} | "
-        f"grep -F {escaped_domain} | "
-        r"grep -Po '((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b){4}' | "
-        "head -n1"
+        f"grep -F {escaped_domain} {ZONEFILE_PATH} | "
+        r"grep -Po '((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b){4}'"
     )
 
 
-async def batch_ssh_execute(cmd: str):
+async def batch_ssh_execute(cmd: str, max_lines: int | None = None) -> SSHResultSet:
     return await execute_ssh_commands_in_batch(
         server_list=DNS_SERVER_LIST,
         command=cmd,
         verbose=True,
+        max_lines=max_lines,
     )
 
 
 async def dns_query_domain_zone_master(domain: SubscriptionName | DomainName):
     getZoneMasterCmd = await build_get_zone_master_command(domain)
-    dnsAnswers = await batch_ssh_execute(getZoneMasterCmd)
+    # The zone file is read only up to the first zone master found
+    dnsAnswers = await batch_ssh_execute(getZoneMasterCmd, max_lines=1)
     dnsAnswers = [
-        {"ns": answer["host"], "zone_master": answer["stdout"]}
-        for answer in dnsAnswers
-        if answer["stdout"]
+        {"ns": answer.host, "zone_master": answer.stdout}
+        for answer in dnsAnswers.answered()
     ]
     if not dnsAnswers:
         return None
@@ -45,33 +54,122 @@ async def build_remove_zone_master_command(
     domain: SubscriptionName | DomainName,
 ) -> str:
     escaped_domain = shlex.quote(domain.name.lower())
-    return f"/opt/isc/isc-bind/root/usr/sbin/rndc delzone -clean {escaped_domain}"
+    return f"{RNDC_PATH} delzone -clean {escaped_domain}"
 
 
 async def dns_remove_domain_zone_master(domain: SubscriptionName | DomainName):
     rm_zone_master_md = await build_remove_zone_master_command(domain)
     dnsAnswers = await batch_ssh_execute(rm_zone_master_md)
     for item in dnsAnswers:
-        if item["stderr"] and "not found" not in item["stderr"]:
+        if item.stderr and "not found" not in item.stderr:
             raise RuntimeError(
-                f"DNS zone removal failed for host: {item['host']} "
-                f"with error: {item['stderr']}"
+                f"DNS zone removal failed for host: {item.host} "
+                f"with error: {item.stderr}"
             )
 
 
+def resolve_zone_master_names(
+    zone_master_ips: set[str], ptr_cache: Dict[str, List[str] | None] | None = None
+) -> str:
+    """
+    Name zone masters by the PTR records of their IPs, or by the IPs when
+    none of them has one. Lookups are cached in `ptr_cache` when given.
+    """
+    if ptr_cache is None:
+        ptr_cache = {}
+    zonemaster_domains_set = set()
+    for zonemaster in zone_master_ips:
+        if zonemaster not in ptr_cache:
+            ptr_cache[zonemaster] = resolve_record(record=zonemaster, type="PTR")
+        if ptr_cache[zonemaster]:
+            zonemaster_domains_set.update(ptr_cache[zonemaster])
+    if not zonemaster_domains_set:
+        return ",".join(str(ip) for ip in zone_master_ips)
+    return ",".join(str(ip) for ip in zonemaster_domains_set)
+
+
 async def dns_get_domain_zone_master(
     domain: SubscriptionName | DomainName,
-) -> PleskServerDomain | str | None:
+) -> str | None:
     zonemaster_data = await dns_query_domain_zone_master(domain=domain)
     if zonemaster_data is None:
         return None
 
-    zonemaster_ip_set = {answer["zone_master"] for answer in zonemaster_data["answers"]}
-    zonemaster_domains_set = set()
-    for zonemaster in zonemaster_ip_set:
-        zonemaster_domain = resolve_record(record=zonemaster, type="PTR")
-        if zonemaster_domain:
-            zonemaster_domains_set.update(zonemaster_domain)
-    if not zonemaster_domains_set:
-        return ",".join(str(ip) for ip in zonemaster_ip_set)
-    return ",".join(str(ip) for ip in zonemaster_domains_set)
+    return resolve_zone_master_names(
+        {answer["zone_master"] for answer in zonemaster_data["answers"]}
+    )
+
+
+async def build_get_zone_masters_command(
+    domains: List[SubscriptionName | DomainName],
+) -> str:
+    patterns = []
+    for domain in domains:
+        escaped_domain = shlex.quote('\\"' + domain.name.lower() + '\\"')
+        patterns.append(f"-e {escaped_domain}")
+    return f"grep -F {' '.join(patterns)} {ZONEFILE_PATH}"
+
+
+def parse_zone_masters(
+    lines: Iterable[str], domain_names: set[str]
+) -> Dict[str, set[str]]:
+    """Map requested domains to zone master IPs found in zone file lines."""
+    zone_masters: Dict[str, set[str]] = {}
+    for line in lines:
+        domain_name = next(
+            (
+                name.lower()
+                for name in ZONEFILE_QUOTED_NAME_PATTERN.findall(line)
+                if name.lower() in domain_names
+            ),
+            None,
+        )
+        ip = ZONEFILE_IP_PATTERN.search(line)
+        if domain_name and ip:
+            zone_masters.setdefault(domain_name, set()).add(ip.group(0).rstrip("."))
+    return zone_masters
+
+
+async def dns_query_zone_masters_bulk(
+    domains: List[SubscriptionName | DomainName],
+) -> Dict[str, set[str]]:
+    """Fetch zone master IPs of several domains with one command per DNS server."""
+    command = await build_get_zone_masters_command(domains)
+    host_answers = await execute_ssh_commands_per_host(
+        {host: [command] for host in DNS_SERVER_LIST}, verbose=True
+    )
+    domain_names = {domain.name.lower() for domain in domains}
+    zone_masters: Dict[str, set[str]] = {}
+    for dns_answers in host_answers.values():
+        for answer in dns_answers:
+            for domain_name, ips in parse_zone_masters(
+                answer.lines(), domain_names
+            ).items():
+                zone_masters.setdefault(domain_name, set()).update(ips)
+    return zone_masters
+
+
+async def dns_remove_zone_masters_bulk(
+    domains: List[SubscriptionName | DomainName],
+) -> Dict[str, str]:
+    """
+    Remove zones of several domains with one composite command per DNS server.
+    Returns errors keyed by domain name, a missing zone is not an error.
+    """
+    steps = [
+        CompositeStep(
+            f"zone_{i}",
+            f"{RNDC_PATH} delzone -clean {shlex.quote(domain.name.lower())}",
+        )
+        for i, domain in enumerate(domains)
+    ]
+    host_results = await execute_composite_command_in_batch(DNS_SERVER_LIST, steps)
+    errors: Dict[str, str] = {}
+    for host, results in host_results.items():
+        for step, domain in zip(steps, domains):
+            result = results[step.name]
+            if result["skipped"]:
+                errors[domain.name.lower()] = f"{host}: zone removal did not run"
+            elif result["stderr"] and "not found" not in result["stderr"]:
+                errors[domain.name.lower()] = f"{host}: {result['stderr']}"
+    return errors
@@ -0,0 +1,49 @@
+from typing import Dict, List
+
+from app.api.dns.ssh_utils import (
+    dns_query_zone_masters_bulk,
+    dns_remove_zone_masters_bulk,
+    resolve_zone_master_names,
+)
+from app.core.config import settings
+from app.db.models import DeleteZonemasterLog, Job, JobItem
+from app.job_queue import ItemOutcome, JobHandler, register_job_handler
+from app.schemas import DomainName, JobType
+
+
+async def run_zonemaster_removal_batch(
+    job: Job, items: List[JobItem]
+) -> Dict[str, ItemOutcome]:
+    domains = [DomainName(name=item.key) for item in items]
+    zone_master_ips = await dns_query_zone_masters_bulk(domains)
+    errors = await dns_remove_zone_masters_bulk(domains)
+
+    ptr_cache: Dict[str, List[str] | None] = {}
+    outcomes = {}
+    for item in items:
+        current_zone_master = None
+        if item.key in zone_master_ips:
+            current_zone_master = resolve_zone_master_names(
+                zone_master_ips[item.key], ptr_cache
+            )
+        outcomes[item.key] = ItemOutcome(
+            result={"current_zone_master": current_zone_master},
+            error=errors.get(item.key),
+            audit_log=DeleteZonemasterLog(
+                user_id=job.user_id,
+                current_zone_master=current_zone_master,
+                domain=item.key,
+                ip=job.ip,
+            ),
+        )
+    return outcomes
+
+
+register_job_handler(
+    JobType.ZONE_MASTER_REMOVAL,
+    JobHandler(
+        run_batch=run_zonemaster_removal_batch,
+        batch_size=settings.ZONEMASTER_MIGRATION_BATCH_SIZE,
+        concurrency=settings.ZONEMASTER_MIGRATION_CONCURRENCY,
+    ),
+)
@@ -0,0 +1,54 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+
+from app.api.dependencies import AsyncSessionDep, RoleChecker
+from app.db import crud
+from app.schemas import (
+    CountStrategy,
+    PaginatedUserLogListSchema,
+    UserLogFilterSchema,
+    UserRoles,
+    ValidatedDomainName,
+)
+
+router = APIRouter(tags=["domains"], prefix="/domains")
+
+
+@router.get(
+    "/{name}/history",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+    response_model=PaginatedUserLogListSchema,
+)
+async def get_domain_history(
+    name: Annotated[ValidatedDomainName, Path()],
+    session: AsyncSessionDep,
+    page_size: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: str | None = None,
+    count_strategy: CountStrategy = CountStrategy.CACHED,
+) -> PaginatedUserLogListSchema:
+    """
+    Everything done to a domain by any user, newest first. Pass the
+    `next_cursor` of a page as `cursor` to get the next one.
+    """
+    filters = UserLogFilterSchema(domain={"name": name})
+    try:
+        history = await crud.get_user_log_entries_by_id(
+            session,
+            filters=filters,
+            page_size=page_size,
+            cursor=cursor,
+            count_strategy=count_strategy,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if history is None:
+        return PaginatedUserLogListSchema(
+            total_count=0,
+            page=1,
+            page_size=page_size,
+            total_pages=0,
+            data=[],
+            count_strategy=count_strategy,
+        )
+    return history
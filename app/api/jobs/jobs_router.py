@@ -0,0 +1,98 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Annotated
+from uuid import UUID
+
+from app.api.dependencies import SessionDep, RoleChecker
+from app.db.crud import (
+    get_job,
+    get_job_progress,
+    get_job_items,
+    cancel_job,
+    reset_job,
+)
+from app.db.models import Job
+from app.job_queue import JOB_QUEUE
+from app.schemas import (
+    UserRoles,
+    JobStatus,
+    JobItemStatus,
+    JobProgress,
+    PaginatedJobItemListSchema,
+)
+
+router = APIRouter(tags=["jobs"], prefix="/jobs")
+
+
+def _get_job_or_404(session: SessionDep, job_id: UUID) -> Job:
+    job = get_job(session=session, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job [{job_id}] not found.")
+    return job
+
+
+@router.get(
+    "/{job_id}",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+def get_job_status(job_id: UUID, session: SessionDep) -> JobProgress:
+    job = _get_job_or_404(session, job_id)
+    return get_job_progress(session=session, job=job)
+
+
+@router.get(
+    "/{job_id}/items",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+def get_job_item_results(
+    job_id: UUID,
+    session: SessionDep,
+    status: Annotated[JobItemStatus | None, Query()] = None,
+    page: Annotated[int, Query(ge=1)] = 1,
+    page_size: Annotated[int, Query(ge=1, le=100)] = 10,
+) -> PaginatedJobItemListSchema:
+    _get_job_or_404(session, job_id)
+    return get_job_items(
+        session=session, job_id=job_id, status=status, page=page, page_size=page_size
+    )
+
+
+@router.post(
+    "/{job_id}/cancel",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+async def cancel_job_run(job_id: UUID, session: SessionDep) -> JobProgress:
+    def cancel() -> JobProgress:
+        job = _get_job_or_404(session, job_id)
+        if job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            raise HTTPException(
+                status_code=409, detail=f"Job [{job_id}] is {job.status.value.lower()}."
+            )
+        cancel_job(session=session, job=job)
+        return get_job_progress(session=session, job=job)
+
+    # The session is sync, keep its queries off the event loop
+    progress = await asyncio.to_thread(cancel)
+    JOB_QUEUE.cancel(job_id)
+    return progress
+
+
+@router.post(
+    "/{job_id}/resume",
+    status_code=202,
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+async def resume_job(job_id: UUID, session: SessionDep) -> JobProgress:
+    def reset() -> JobProgress:
+        job = _get_job_or_404(session, job_id)
+        if job.status not in (JobStatus.FAILED, JobStatus.CANCELLED):
+            raise HTTPException(
+                status_code=409, detail=f"Job [{job_id}] is {job.status.value.lower()}."
+            )
+        reset_job(session=session, job=job)
+        return get_job_progress(session=session, job=job)
+
+    progress = await asyncio.to_thread(reset)
+    JOB_QUEUE.enqueue(job_id)
+    return progress
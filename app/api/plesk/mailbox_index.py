@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Dict
+
+from fastapi_utils.tasks import repeat_every
+
+from app.api.plesk.plesk_db import PLESK_DB
+from app.core.config import settings
+from app.scheduler_lock import SchedulerLock
+from app.schemas import PLESK_SERVER_LIST
+
+MAILBOX_INDEX_QUERY = (
+    "SELECT LOWER(CONCAT(m.mail_name, '@', d.name)) FROM mail m "
+    "JOIN domains d ON d.id = m.dom_id WHERE m.postbox = 'true'"
+)
+MAILBOX_INDEX_PATH = os.path.join(tempfile.gettempdir(), "mailbox-index.json")
+MAILBOX_INDEX_LOCK_PATH = os.path.join(tempfile.gettempdir(), "mailbox-index.lock")
+
+logger = logging.getLogger(__name__)
+
+
+class MailboxIndex:
+    """
+    Per Plesk server set of existing mailbox addresses. Only existence is
+    indexed, passwords are fetched from the server when needed.
+
+    Only the worker holding the lock file queries the servers, it writes
+    the index to a file shared by every worker of the container. The others
+    reload that file whenever it changes.
+    """
+
+    def __init__(
+        self,
+        path: str = MAILBOX_INDEX_PATH,
+        lock_path: str = MAILBOX_INDEX_LOCK_PATH,
+    ):
+        self.path = path
+        self._lock = SchedulerLock(lock_path)
+        self._mailboxes: Dict[str, set[str]] = {}
+        self._loaded_mtime: float | None = None
+
+    def _load(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._loaded_mtime:
+                return
+            with open(self.path) as index_file:
+                mailboxes = json.load(index_file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Mailbox index {self.path} can't be read: {e}")
+            return
+        self._mailboxes = {
+            host: set(addresses) for host, addresses in mailboxes.items()
+        }
+        self._loaded_mtime = mtime
+
+    def _save(self) -> None:
+        # Written aside and renamed so readers never see a partial file
+        temp_path = f"{self.path}.{os.getpid()}"
+        with open(temp_path, "w") as index_file:
+            json.dump(
+                {
+                    host: sorted(addresses)
+                    for host, addresses in self._mailboxes.items()
+                },
+                index_file,
+            )
+        os.replace(temp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def has_mailbox(self, host: str, address: str) -> bool | None:
+        """Return None when the server hasn't been indexed yet."""
+        self._load()
+        if host not in self._mailboxes:
+            return None
+        return address.lower() in self._mailboxes[host]
+
+    def add_mailbox(self, host: str, address: str) -> None:
+        if host in self._mailboxes:
+            self._mailboxes[host].add(address.lower())
+
+    def discard_mailbox(self, host: str, address: str) -> None:
+        if host in self._mailboxes:
+            self._mailboxes[host].discard(address.lower())
+
+    async def refresh(self) -> None:
+        if not self._lock.try_acquire():
+            self._load()
+            return
+        # Hosts failing this time keep their last indexed mailboxes
+        self._load()
+        results = await PLESK_DB.query_in_batch(
+            PLESK_SERVER_LIST, MAILBOX_INDEX_QUERY, verbose=False
+        )
+        for result in results:
+            if result.returncode != 0:
+                logger.warning(
+                    f"{result.host} mailbox index refresh failed: {result.stderr}"
+                )
+                continue
+            self._mailboxes[result.host] = set((result.stdout or "").split())
+        self._save()
+
+
+MAILBOX_INDEX = MailboxIndex()
+
+
+@repeat_every(seconds=settings.MAILBOX_INDEX_REFRESH_SECONDS)
+async def refresh_mailbox_index() -> None:
+    await MAILBOX_INDEX.refresh()
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Sequence
+
+import pymysql
+from pymysql.converters import escape_item
+
+from app.AsyncSSHandler import (
+    execute_ssh_command,
+    execute_ssh_commands_in_batch,
+)
+from app.core.config import settings
+from app.ssh_result import SSHResult, SSHResultSet
+
+PLESK_DB_RUN_CMD_TEMPLATE = 'plesk db -Ne \\"{}\\"'
+PLESK_DB_SCRIPT_CMD_TEMPLATE = 'plesk db -Ne "{}"'
+PLESK_DB_PASSWORD_CMD = "cat /etc/psa/.psa.shadow"
+PLESK_DB_NULL = "NULL"
+TUNNEL_OPEN_TIMEOUT_SECONDS = 5
+TUNNEL_POLL_INTERVAL_SECONDS = 0.05
+SHELL_UNSAFE_CHARS = {'"', "`", "$", "\\"}
+
+logger = logging.getLogger(__name__)
+
+
+class PleskDbError(Exception):
+    """Base exception for Plesk database access"""
+
+    pass
+
+
+class PleskDbTunnelError(PleskDbError):
+    """Raised when the SSH forward to the Plesk database can't be opened"""
+
+    pass
+
+
+def render_query(query: str, params: Sequence[Any] = ()) -> str:
+    """
+    Inline escaped parameters into a query for `plesk db` CLI execution.
+    The result is embedded in a double quoted remote shell command, so
+    values that would need shell escaping are rejected.
+    """
+    if not params:
+        return query
+    literals = tuple(escape_item(param, "utf8") for param in params)
+    for literal in literals:
+        if SHELL_UNSAFE_CHARS & set(literal):
+            raise ValueError(f"Unsafe value for CLI query parameter: {literal}")
+    return query % literals
+
+
+def build_plesk_db_script_command(query: str, params: Sequence[Any] = ()) -> str:
+    """Build a `plesk db` call to be used as a step of a remote shell script."""
+    return PLESK_DB_SCRIPT_CMD_TEMPLATE.format(render_query(query, params))
+
+
+def rows_to_tsv(rows: Sequence[Sequence[Any]]) -> str:
+    """Format rows the same way `mysql -N` batch output does."""
+    return "\n".join(
+        "\t".join(PLESK_DB_NULL if value is None else str(value) for value in row)
+        for row in rows
+    )
+
+
+class PleskDbTunnel:
+    """SSH stream-local forward of a Plesk server MySQL socket."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.socket_path = os.path.join(
+            tempfile.gettempdir(), f"plesk-db-{os.getpid()}-{host}.sock"
+        )
+        self._process: asyncio.subprocess.Process | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def open(self) -> str:
+        async with self._lock:
+            if self.is_open and os.path.exists(self.socket_path):
+                return self.socket_path
+            await self._terminate()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+            self._process = await asyncio.create_subprocess_exec(
+                "ssh",
+                "-q",
+                "-N",
+                "-o",
+                "ExitOnForwardFailure=yes",
+                "-o",
+                "ControlPath=none",
+                "-L",
+                f"{self.socket_path}:{settings.PLESK_DB_REMOTE_SOCKET}",
+                self.host,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            deadline = asyncio.get_running_loop().time() + TUNNEL_OPEN_TIMEOUT_SECONDS
+            while not os.path.exists(self.socket_path):
+                if (
+                    self._process.returncode is not None
+                    or asyncio.get_running_loop().time() > deadline
+                ):
+                    await self._terminate()
+                    raise PleskDbTunnelError(
+                        f"Failed to forward Plesk database socket of {self.host}"
+                    )
+                await asyncio.sleep(TUNNEL_POLL_INTERVAL_SECONDS)
+            return self.socket_path
+
+    async def _terminate(self) -> None:
+        if self.is_open:
+            self._process.terminate()
+            await self._process.wait()
+        self._process = None
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._terminate()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+class PleskDbPool:
+    """
+    Pool of MySQL connections to a single Plesk server database, opened
+    through an SSH tunnel. pymysql is blocking, so queries run in threads.
+    """
+
+    def __init__(self, host: str, size: int):
+        self.host = host
+        self.size = size
+        self.tunnel = PleskDbTunnel(host)
+        # Limits the connections checked out at once, connections are opened
+        # lazily when no idle one is left
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[pymysql.connections.Connection] = []
+        self._password: str | None = None
+
+    async def _get_password(self) -> str:
+        if self._password is None:
+            result = await execute_ssh_command(
+                self.host, PLESK_DB_PASSWORD_CMD, verbose=False
+            )
+            if result.returncode != 0 or not result.stdout:
+                raise PleskDbError(
+                    f"Failed to read Plesk database password on {self.host}"
+                )
+            self._password = result.stdout
+        return self._password
+
+    async def _connect(self) -> pymysql.connections.Connection:
+        socket_path = await self.tunnel.open()
+        password = await self._get_password()
+        return await asyncio.to_thread(
+            pymysql.connect,
+            unix_socket=socket_path,
+            user=settings.PLESK_DB_USER,
+            password=password,
+            database=settings.PLESK_DB_NAME,
+            autocommit=True,
+        )
+
+    def _discard(self, connection: pymysql.connections.Connection) -> None:
+        try:
+            connection.close()
+        except pymysql.err.Error:
+            pass
+
+    async def fetch_rows(
+        self, query: str, params: Sequence[Any] = ()
+    ) -> List[tuple[Any, ...]]:
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            try:
+                rows = await asyncio.to_thread(_run_query, connection, query, params)
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+                self._discard(connection)
+                raise
+            except Exception:
+                self._idle.append(connection)
+                raise
+            self._idle.append(connection)
+            return rows
+
+    async def close(self) -> None:
+        while self._idle:
+            self._discard(self._idle.pop())
+        await self.tunnel.close()
+
+
+def _run_query(
+    connection: pymysql.connections.Connection, query: str, params: Sequence[Any]
+) -> List[tuple[Any, ...]]:
+    with connection.cursor() as cursor:
+        cursor.execute(query, tuple(params) or None)
+        return list(cursor.fetchall())
+
+
+class PleskDb:
+    """
+    Plesk database access layer. In `tunnel` mode queries run on pooled
+    connections forwarded over SSH and fall back to `plesk db` on the remote
+    host when the tunnel is unavailable. In `cli` mode every query runs
+    through `plesk db`.
+    """
+
+    def __init__(self):
+        self._pools: Dict[str, PleskDbPool] = {}
+
+    @property
+    def is_tunnel_enabled(self) -> bool:
+        return settings.PLESK_DB_ACCESS_MODE == "tunnel"
+
+    def _get_pool(self, host: str) -> PleskDbPool:
+        if host not in self._pools:
+            self._pools[host] = PleskDbPool(host, settings.PLESK_DB_POOL_SIZE)
+        return self._pools[host]
+
+    async def _fetch_via_cli(
+        self, host: str, query: str, params: Sequence[Any]
+    ) -> SSHResult:
+        command = PLESK_DB_RUN_CMD_TEMPLATE.format(render_query(query, params))
+        return await execute_ssh_command(host, command)
+
+    async def _fetch_via_tunnel(
+        self, host: str, query: str, params: Sequence[Any]
+    ) -> SSHResult:
+        try:
+            rows = await self._get_pool(host).fetch_rows(query, params)
+        except (PleskDbError, pymysql.err.Error) as e:
+            logger.warning(f"{host} Plesk database tunnel failed, using CLI: {e}")
+            return await self._fetch_via_cli(host, query, params)
+        return SSHResult(host, rows_to_tsv(rows), None, 0)
+
+    async def query(
+        self, host: str, query: str, params: Sequence[Any] = ()
+    ) -> SSHResult:
+        """Run a query on a Plesk server and return its `mysql -N` like output."""
+        if self.is_tunnel_enabled:
+            return await self._fetch_via_tunnel(host, query, params)
+        return await self._fetch_via_cli(host, query, params)
+
+    async def query_in_batch(
+        self,
+        hosts: List[str],
+        query: str,
+        params: Sequence[Any] = (),
+        verbose: bool = True,
+    ) -> SSHResultSet:
+        if self.is_tunnel_enabled:
+            return SSHResultSet(
+                await asyncio.gather(
+                    *(self._fetch_via_tunnel(host, query, params) for host in hosts)
+                )
+            )
+        command = PLESK_DB_RUN_CMD_TEMPLATE.format(render_query(query, params))
+        return await execute_ssh_commands_in_batch(hosts, command, verbose=verbose)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(pool.close() for pool in self._pools.values()))
+        self._pools.clear()
+
+
+PLESK_DB = PleskDb()
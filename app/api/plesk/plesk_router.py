@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import (
     APIRouter,
     HTTPException,
@@ -7,16 +9,24 @@ from fastapi import (
     Request,
     Response,
 )
-from typing import Annotated
+from fastapi.responses import StreamingResponse
+from typing import Annotated, AsyncIterator, List
 
 from app.api.plesk.ssh_utils import (
+    SubscriptionDetails,
     plesk_fetch_subscription_info,
+    plesk_fetch_subscription_info_bulk,
+    plesk_iter_subscription_info_bulk,
 )
 from app.api.plesk.plesk_schemas import (
     SubscriptionListResponseModel,
     SubscriptionDetailsModel,
+    BulkSubscriptionInput,
+    BulkSubscriptionItemModel,
+    BulkSubscriptionResponseModel,
     SubscriptionLoginLinkInput,
     SetZonemasterInput,
+    ZoneMasterMigrationInput,
     TestMailCredentials,
     TestMailData,
 )
@@ -30,15 +40,22 @@ from app.schemas import (
     LinuxUsername,
     ValidatedDomainName,
     ValidatedPleskServerDomain,
+    JobType,
+    JobProgress,
 )
 from app.api.plesk.ssh_utils import (
     plesk_generate_subscription_login_link,
 )
-from app.api.dependencies import CurrentUser, SessionDep, RoleChecker
+from app.api.dependencies import (
+    CurrentUser,
+    SessionDep,
+    RoleChecker,
+)
 from app.api.plesk.ssh_utils import (
     is_domain_exist_on_server,
     restart_dns_service_for_domain,
     plesk_get_testmail_login_data,
+    DomainNotFoundError,
     get_public_key,
     sign,
 )
@@ -50,11 +67,33 @@ from app.db.crud import (
     log_dns_zone_master_set,
     log_db_plesk_login_link_get,
     log_plesk_mail_test_get,
+    create_job,
+    get_job_progress,
 )
+from app.api.plesk import zonemaster_migration  # noqa: F401 registers job handler
+from app.job_queue import JOB_QUEUE
 from app.logger import log_plesk_login_link_get
+from app.core.config import settings
+from app.workflow import Workflow, WorkflowStep
+
 router = APIRouter(tags=["plesk"], prefix="/plesk")
 
 
+def _to_subscription_model(sub: SubscriptionDetails) -> SubscriptionDetailsModel:
+    return SubscriptionDetailsModel(
+        host=sub["host"],
+        id=sub["id"],
+        name=sub["name"],
+        username=sub["username"],
+        userlogin=sub["userlogin"],
+        domains=[SubscriptionName(name=d) for d in sub["domains"]],
+        domain_states=sub["domain_states"],
+        is_space_overused=sub["is_space_overused"],
+        subscription_size_mb=sub["subscription_size_mb"],
+        subscription_status=sub["subscription_status"],
+    )
+
+
 @router.get("/get/subscription/", response_model=SubscriptionListResponseModel)
 async def find_plesk_subscription_by_domain(
     domain: Annotated[
@@ -68,25 +107,49 @@ async def find_plesk_subscription_by_domain(
             status_code=404,
             detail=f"Subscription with domain [{domain.name}] not found.",
         )
-    subscription_models = [
-        SubscriptionDetailsModel(
-            host=sub["host"],
-            id=sub["id"],
-            name=sub["name"],
-            username=sub["username"],
-            userlogin=sub["userlogin"],
-            domains=[SubscriptionName(name=d) for d in sub["domains"]],
-            domain_states=sub["domain_states"],
-            is_space_overused=sub["is_space_overused"],
-            subscription_size_mb=sub["subscription_size_mb"],
-            subscription_status=sub["subscription_status"],
-        )
-        for sub in subscriptions
-    ]
+    subscription_models = [_to_subscription_model(sub) for sub in subscriptions]
 
     return SubscriptionListResponseModel(root=subscription_models)
 
 
+async def _stream_bulk_subscriptions(
+    domains: List[SubscriptionName],
+) -> AsyncIterator[str]:
+    async for chunk_results in plesk_iter_subscription_info_bulk(domains):
+        for domain, subscriptions in chunk_results.items():
+            item = BulkSubscriptionItemModel(
+                domain=domain,
+                subscriptions=[_to_subscription_model(sub) for sub in subscriptions],
+            )
+            yield item.model_dump_json() + "\n"
+
+
+@router.post(
+    "/subscriptions/bulk",
+    dependencies=[
+        Depends(RoleChecker([UserRoles.USER, UserRoles.SUPERUSER, UserRoles.ADMIN]))
+    ],
+    response_model=BulkSubscriptionResponseModel,
+)
+async def find_plesk_subscriptions_bulk(
+    data: BulkSubscriptionInput,
+    stream: Annotated[bool, Query()] = False,
+):
+    domains = [SubscriptionName(name=domain) for domain in data.domains]
+    if stream:
+        return StreamingResponse(
+            _stream_bulk_subscriptions(domains), media_type="application/x-ndjson"
+        )
+
+    subscriptions = await plesk_fetch_subscription_info_bulk(domains)
+    return BulkSubscriptionResponseModel(
+        root={
+            domain: [_to_subscription_model(sub) for sub in domain_subscriptions]
+            for domain, domain_subscriptions in subscriptions.items()
+        }
+    )
+
+
 @router.post(
     "/subscription/login-link",
     dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
@@ -95,7 +158,6 @@ async def get_subscription_login_link(
     data: SubscriptionLoginLinkInput,
     current_user: CurrentUser,
     background_tasks: BackgroundTasks,
-    session: SessionDep,
     request: Request,
 ):
     if not current_user.ssh_username:
@@ -111,7 +173,6 @@ async def get_subscription_login_link(
     request_ip = IPv4Address(ip=request.client.host)
     background_tasks.add_task(
         log_db_plesk_login_link_get,
-        session=session,
         user=current_user,
         plesk_server=PleskServerDomain(name=data.host),
         subscription_id=data.subscription_id,
@@ -136,32 +197,51 @@ async def set_zonemaster(
     data: SetZonemasterInput,
     current_user: CurrentUser,
     background_tasks: BackgroundTasks,
-    session: SessionDep,
     request: Request,
+    response: Response,
 ) -> Message:
-    curr_zone_master: PleskServerDomain | str | None
-    if await is_domain_exist_on_server(
-        host=PleskServerDomain(name=data.target_plesk_server),
-        domain=SubscriptionName(name=data.domain),
-    ):
-        curr_zone_master = await dns_get_domain_zone_master(
-            SubscriptionName(name=data.domain)
-        )
+    target_server = PleskServerDomain(name=data.target_plesk_server)
+    domain = SubscriptionName(name=data.domain)
+
+    async def check_subscription_exists() -> None:
+        if not await is_domain_exist_on_server(host=target_server, domain=domain):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Subscription with domain [{data.domain}] not found.",
+            )
+
+    async def get_zone_master() -> PleskServerDomain | str | None:
+        return await dns_get_domain_zone_master(domain)
+
+    async def remove_zone_master(subscription_exists, zone_master) -> None:
+        await dns_remove_domain_zone_master(domain)
+
+    async def restart_dns_service(remove_zone_master) -> None:
+        await restart_dns_service_for_domain(host=target_server, domain=domain)
+
+    workflow_result = await Workflow(
+        [
+            WorkflowStep("subscription_exists", check_subscription_exists),
+            WorkflowStep("zone_master", get_zone_master),
+            WorkflowStep(
+                "remove_zone_master",
+                remove_zone_master,
+                depends_on=["subscription_exists", "zone_master"],
+            ),
+            WorkflowStep(
+                "restart_dns_service",
+                restart_dns_service,
+                depends_on=["remove_zone_master"],
+            ),
+        ]
+    ).run()
+    if settings.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = workflow_result.server_timing_header()
+    curr_zone_master = workflow_result.results["zone_master"]
 
-        await dns_remove_domain_zone_master(SubscriptionName(name=data.domain))
-        await restart_dns_service_for_domain(
-            host=PleskServerDomain(name=data.target_plesk_server),
-            domain=SubscriptionName(name=data.domain),
-        )
-    else:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Subscription with domain [{data.domain}] not found.",
-        )
     request_ip = IPv4Address(ip=request.client.host)
     background_tasks.add_task(
         log_dns_zone_master_set,
-        session=session,
         user=current_user,
         current_zone_master=curr_zone_master,
         target_zone_master=PleskServerDomain(name=data.target_plesk_server),
@@ -171,6 +251,39 @@ async def set_zonemaster(
     return Message(message="Zone master set successfully")
 
 
+@router.post(
+    "/zonemaster/migrations",
+    status_code=202,
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+async def create_zonemaster_migration(
+    data: ZoneMasterMigrationInput,
+    current_user: CurrentUser,
+    session: SessionDep,
+    request: Request,
+) -> JobProgress:
+    def create() -> JobProgress:
+        job = create_job(
+            session=session,
+            user=current_user,
+            ip=IPv4Address(ip=request.client.host),
+            job_type=JobType.ZONE_MASTER_MIGRATION,
+            items=[
+                (
+                    migration.domain.lower(),
+                    {"target_plesk_server": migration.target_plesk_server},
+                )
+                for migration in data.migrations
+            ],
+        )
+        return get_job_progress(session=session, job=job)
+
+    # The session is sync, keep its queries off the event loop
+    progress = await asyncio.to_thread(create)
+    JOB_QUEUE.enqueue(progress.id)
+    return progress
+
+
 @router.get(
     "/subscription/testmail",
     dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
@@ -181,21 +294,16 @@ async def create_testmail_for_domain(
     server: Annotated[ValidatedPleskServerDomain, Query()],
     current_user: CurrentUser,
     background_tasks: BackgroundTasks,
-    session: SessionDep,
     request: Request,
 ) -> TestMailCredentials:
     mail_host = PleskServerDomain(name=server)
     mail_domain = SubscriptionName(name=maildomain)
 
-    if await is_domain_exist_on_server(
-        host=mail_host,
-        domain=mail_domain,
-    ):
+    try:
         data: TestMailData = await plesk_get_testmail_login_data(
             mail_host, mail_domain=mail_domain
         )
-
-    else:
+    except DomainNotFoundError:
         raise HTTPException(
             status_code=404,
             detail=f"Subscription with domain [{mail_domain.name}] not found.",
@@ -203,7 +311,6 @@ async def create_testmail_for_domain(
     request_ip = IPv4Address(ip=request.client.host)
     background_tasks.add_task(
         log_plesk_mail_test_get,
-        session=session,
         ip=request_ip,
         user=current_user,
         plesk_server=mail_host,
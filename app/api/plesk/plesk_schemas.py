@@ -7,6 +7,7 @@ from pydantic import (
     StringConstraints,
     field_validator,
     ConfigDict,
+    Field,
 )
 
 from typing import List, Dict
@@ -25,6 +26,9 @@ WEBMAIL_LOGIN_LINK_PATTERN = r"^https:\/\/webmail\.(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{
 
 SPECIAL_CHARS = re.escape(string.punctuation)  # Escapes all special chars
 
+BULK_SUBSCRIPTION_MAX_DOMAINS = 10000
+ZONEMASTER_MIGRATION_MAX_DOMAINS = 10000
+
 EMAIL_PASSWORD_PATTERN = re.compile(
     rf"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)[A-Za-z\d{SPECIAL_CHARS}]*$"
 )
@@ -70,6 +74,34 @@ class SubscriptionListResponseModel(RootModel):
     root: List[SubscriptionDetailsModel]
 
 
+class BulkSubscriptionInput(BaseModel):
+    domains: Annotated[
+        List[
+            Annotated[
+                str,
+                StringConstraints(
+                    min_length=3,
+                    max_length=253,
+                    pattern=SUBSCRIPTION_NAME_PATTERN,
+                ),
+            ]
+        ],
+        Field(min_length=1, max_length=BULK_SUBSCRIPTION_MAX_DOMAINS),
+    ]
+    model_config = {
+        "json_schema_extra": {"examples": [{"domains": ["domain.kz", "domain.com"]}]}
+    }
+
+
+class BulkSubscriptionItemModel(BaseModel):
+    domain: str
+    subscriptions: List[SubscriptionDetailsModel]
+
+
+class BulkSubscriptionResponseModel(RootModel):
+    root: Dict[str, List[SubscriptionDetailsModel]]
+
+
 class SetZonemasterInput(BaseModel):
     target_plesk_server: Annotated[
         str,
@@ -102,6 +134,34 @@ class SetZonemasterInput(BaseModel):
         return v
 
 
+class ZoneMasterMigrationInput(BaseModel):
+    migrations: Annotated[
+        List[SetZonemasterInput],
+        Field(min_length=1, max_length=ZONEMASTER_MIGRATION_MAX_DOMAINS),
+    ]
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "migrations": [
+                        {
+                            "target_plesk_server": PLESK_SERVER_LIST[0],
+                            "domain": "domain.kz",
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+
+    @field_validator("migrations")
+    def validate_unique_domains(cls, v):
+        domains = [migration.domain.lower() for migration in v]
+        if len(domains) != len(set(domains)):
+            raise ValueError("Each domain can be migrated only once per job.")
+        return v
+
+
 class TestMailCredentials(BaseModel):
     model_config = ConfigDict(regex_engine="python-re")
     login_link: Annotated[
@@ -4,21 +4,39 @@ import string
 import random
 
 from fastapi import HTTPException
-from typing import TypedDict, List
+from typing import Any, TypedDict, List, Iterator, AsyncIterator, Dict, Sequence, Tuple
 from enum import IntEnum
 
 
 from app.AsyncSSHandler import execute_ssh_command, execute_ssh_commands_in_batch
+from app.ssh_result import SSHResult, SSHResultSet
 from app.schemas import PleskServerDomain, LinuxUsername, PLESK_SERVER_LIST
 from app.api.plesk.plesk_schemas import SubscriptionName, TestMailData
 from app.api.plesk.ssh_token_signer import SshToKenSigner
+from app.api.plesk.plesk_db import (
+    PLESK_DB,
+    PLESK_DB_RUN_CMD_TEMPLATE,
+    build_plesk_db_script_command,
+    render_query,
+)
+from app.composite_command import (
+    CompositeStep,
+    StepCondition,
+    StepExpectation,
+    execute_composite_command,
+    execute_composite_command_in_batch,
+)
+from app.api.plesk.mailbox_index import MAILBOX_INDEX
 from app.DomainMapper import HOSTS
 
 PLESK_LOGLINK_CMD = "plesk login"
 REDIRECTION_HEADER = r"&success_redirect_url=%2Fadmin%2Fsubscription%2Foverview%2Fid%2F"
-PLESK_DB_RUN_CMD_TEMPLATE = 'plesk db -Ne \\"{}\\"'
 TEST_MAIL_LOGIN = "testhoster"
 TEST_MAIL_PASSWORD_LENGTH = 14
+SUBSCRIPTION_QUERY_COLUMNS = 8
+SUBSCRIPTION_BULK_CHUNK_SIZE = 500
+SUBSCRIPTION_ID_BY_DOMAIN_QUERY = "SELECT CASE WHEN webspace_id = 0 THEN id ELSE webspace_id END AS result FROM domains WHERE name = %s"
+SUBSCRIPTION_NAME_BY_ID_QUERY = "SELECT name FROM domains WHERE webspace_id=0 AND id=%s"
 
 Signer = SshToKenSigner()
 
@@ -90,8 +108,8 @@ class CommandExecutionError(PleskServiceError):
         super().__init__(f"Command failed with return code {return_code}: {stderr}")
 
 
-async def build_plesk_db_command(query: str) -> str:
-    return PLESK_DB_RUN_CMD_TEMPLATE.format(query)
+async def build_plesk_db_command(query: str, params: Sequence[Any] = ()) -> str:
+    return PLESK_DB_RUN_CMD_TEMPLATE.format(render_query(query, params))
 
 
 async def build_restart_dns_service_command(domain: SubscriptionName) -> str:
@@ -104,15 +122,12 @@ async def build_restart_dns_service_command(domain: SubscriptionName) -> str:
 async def fetch_subscription_id_by_domain(
     host: PleskServerDomain, domain: SubscriptionName
 ) -> int | None:
-    query_subscription_id_by_domain = f"SELECT CASE WHEN webspace_id = 0 THEN id ELSE webspace_id END AS result FROM domains WHERE name LIKE '{domain.name}'"
-
-    fetch_subscription_id_by_domain_cmd = await build_plesk_db_command(
-        query_subscription_id_by_domain
+    result = await PLESK_DB.query(
+        host.name, SUBSCRIPTION_ID_BY_DOMAIN_QUERY, (domain.name,)
     )
-    result = await execute_ssh_command(host.name, fetch_subscription_id_by_domain_cmd)
 
-    if result["stdout"]:
-        subscription_id = int(result["stdout"])
+    if result.stdout:
+        subscription_id = int(result.stdout)
         return subscription_id
     else:
         return None
@@ -131,46 +146,134 @@ async def restart_dns_service_for_domain(
     result = await execute_ssh_command(
         host=host.name, command=restart_dns_cmd, verbose=True
     )
-    match result["returncode"]:
+    match result.returncode:
         case 4:
             raise DomainNotFoundError(f"Domain {domain} does not exist on server")
         case 0:
             pass
         case _:
             raise CommandExecutionError(
-                stderr=result["stderr"], return_code=result["returncode"]
+                stderr=result.stderr, return_code=result.returncode
+            )
+
+
+async def fetch_existing_domains(
+    host: PleskServerDomain, domains: List[SubscriptionName]
+) -> set[str]:
+    """Return the lowercased names of the given domains that exist on a server."""
+    placeholders = ", ".join(["%s"] * len(domains))
+    result = await PLESK_DB.query(
+        host.name,
+        f"SELECT name FROM domains WHERE name IN ({placeholders})",
+        [domain.name.lower() for domain in domains],
+    )
+    return {row[0].lower() for row in result.tsv_rows()}
+
+
+async def restart_dns_service_for_domains(
+    host: PleskServerDomain, domains: List[SubscriptionName]
+) -> Dict[str, str]:
+    """
+    Turn DNS off and on for several domains in one round trip.
+    Returns errors keyed by lowercased domain name.
+    """
+    steps = []
+    for i, domain in enumerate(domains):
+        escaped_domain = shlex.quote(domain.name.lower())
+        steps.append(
+            CompositeStep(
+                f"dns_{i}",
+                f"plesk bin dns --off {escaped_domain} && plesk bin dns --on {escaped_domain}",
             )
+        )
+    # Migration batches to the same target run concurrently, the batch
+    # limits keep them within the target's sessions
+    host_results = await execute_composite_command_in_batch([host.name], steps)
+    results = host_results[host.name]
+
+    errors: Dict[str, str] = {}
+    for step, domain in zip(steps, domains):
+        result = results[step.name]
+        match result["returncode"]:
+            case 0:
+                pass
+            case 4:
+                errors[domain.name.lower()] = (
+                    f"Domain {domain.name} does not exist on server"
+                )
+            case _:
+                errors[domain.name.lower()] = str(
+                    CommandExecutionError(
+                        stderr=result["stderr"], return_code=result["returncode"]
+                    )
+                )
+    return errors
+
+
+SUBSCRIPTION_INFO_QUERY_TEMPLATE = """
+    SELECT
+        {outer_key}s.id AS result,
+        s.name AS name,
+        c.pname AS username,
+        c.login AS userlogin,
+        CONCAT_WS(',',
+            CONCAT(s.name, ':', s.status),
+            GROUP_CONCAT(CONCAT(d.name, ':', d.status) ORDER BY d.id SEPARATOR ',')
+        ) AS domains,
+        s.overuse AS is_space_overused,
+        ROUND(s.real_size/1024/1024) AS subscription_size_mb,
+        s.status AS subscription_status
+    FROM (
+        SELECT {distinct}
+            {inner_key}CASE
+                WHEN webspace_id = 0 THEN id
+                ELSE webspace_id
+            END AS subscription_id
+        FROM domains
+        WHERE {condition}
+    ) AS base
+    JOIN domains s ON s.id = base.subscription_id
+    LEFT JOIN clients c ON c.id = s.cl_id
+    LEFT JOIN domains d ON d.webspace_id = s.id
+    GROUP BY {outer_key}s.id, s.name, c.pname, c.login, s.overuse, s.real_size, s.status
+    ORDER BY {outer_key}s.id;
+    """
 
 
 def build_subscription_info_query(domain_to_find: str) -> str:
     """
     Builds a SQL query string to search for domain information.
+    Every matched domain is collapsed to its subscription, which is then
+    joined once with its client and aggregated with its child domains,
+    so a single row is returned per subscription.
     Compatible with MySQL 5.7.
     """
-    return f"""
-    SELECT 
-        base.subscription_id AS result,
-        (SELECT name FROM domains WHERE id = base.subscription_id) AS name,
-        (SELECT pname FROM clients WHERE id = base.cl_id) AS username,
-        (SELECT login FROM clients WHERE id = base.cl_id) AS userlogin,
-        (SELECT GROUP_CONCAT(CONCAT(d2.name, ':', d2.status) SEPARATOR ',')
-        FROM domains d2 
-        WHERE base.subscription_id IN (d2.id, d2.webspace_id)) AS domains,
-        (SELECT overuse FROM domains WHERE id = base.subscription_id) as is_space_overused,
-        (SELECT ROUND(real_size/1024/1024) FROM domains WHERE id = base.subscription_id) as subscription_size_mb,
-        (SELECT status FROM domains WHERE id = base.subscription_id) as subscription_status
-    FROM (
-        SELECT 
-            CASE 
-                WHEN webspace_id = 0 THEN id 
-                ELSE webspace_id 
-            END AS subscription_id,
-            cl_id,
-            name
-        FROM domains 
-        WHERE name LIKE '{domain_to_find}'
-    ) AS base;
+    return SUBSCRIPTION_INFO_QUERY_TEMPLATE.format(
+        outer_key="",
+        inner_key="",
+        distinct="DISTINCT",
+        condition=f"name LIKE '{domain_to_find}'",
+    )
+
+
+def build_bulk_subscription_info_query(
+    domains_to_find: List[str],
+) -> Tuple[str, List[str]]:
     """
+    Builds a SQL query to search for information on several domains and its
+    parameters, the domains are bound rather than inlined.
+    Rows are prefixed with the matched domain name so results can be keyed
+    by the requested domain.
+    Compatible with MySQL 5.7.
+    """
+    placeholders = ", ".join(["%s"] * len(domains_to_find))
+    query = SUBSCRIPTION_INFO_QUERY_TEMPLATE.format(
+        outer_key="base.name, ",
+        inner_key="name, ",
+        distinct="",
+        condition=f"name IN ({placeholders})",
+    )
+    return query, list(domains_to_find)
 
 
 def get_domain_status_string(status_code: int) -> str:
@@ -200,31 +303,56 @@ def parse_domain_states(domain_states_str: str) -> List[DomainState]:
     return domain_states
 
 
-def extract_subscription_details(answer) -> SubscriptionDetails | None:
-    result_lines = answer["stdout"].strip().split("\n")[0].split("\t")
+def parse_subscription_row(host: str, row: List[str]) -> SubscriptionDetails | None:
+    """Convert a single subscription query row into subscription details."""
+    if len(row) < SUBSCRIPTION_QUERY_COLUMNS:
+        return None
+    try:
+        subscription_size_mb = int(row[6])
+        subscription_status_code = int(row[7])
+    except ValueError:
+        return None
 
-    domain_states = parse_domain_states(result_lines[4])
-    subscription_details = SubscriptionDetails(
-        host=HOSTS.resolve_domain(answer["host"]),
-        id=result_lines[0],
-        name=result_lines[1],
-        username=result_lines[2],
-        userlogin=result_lines[3],
+    domain_states = parse_domain_states(row[4])
+    return SubscriptionDetails(
+        host=HOSTS.resolve_domain(host),
+        id=row[0],
+        name=row[1],
+        username=row[2],
+        userlogin=row[3],
         domains=[state["domain"] for state in domain_states],
         domain_states=domain_states,
-        is_space_overused=result_lines[5].lower() == "true",
-        subscription_size_mb=int(result_lines[6]),
+        is_space_overused=row[5].lower() == "true",
+        subscription_size_mb=subscription_size_mb,
         subscription_status=(
             get_domain_status_string(DomainStatus.SUBSCRIPTION_DISABLED)
-            if int(result_lines[7]) == DomainStatus.SUBSCRIPTION_DISABLED
+            if subscription_status_code == DomainStatus.SUBSCRIPTION_DISABLED
             else get_domain_status_string(DomainStatus.ONLINE)
         ),
     )
 
-    return subscription_details
+
+def iter_subscription_details(answer: SSHResult) -> Iterator[SubscriptionDetails]:
+    """Yield details for every subscription row found in a host answer."""
+    for row in answer.tsv_rows():
+        if details := parse_subscription_row(answer.host, row):
+            yield details
 
 
-async def batch_ssh_execute(cmd: str):
+def extract_subscription_details(answer: SSHResult) -> List[SubscriptionDetails]:
+    return list(iter_subscription_details(answer))
+
+
+def iter_bulk_subscription_details(
+    answer: SSHResult,
+) -> Iterator[Tuple[str, SubscriptionDetails]]:
+    """Yield (matched domain, details) pairs from a bulk query host answer."""
+    for row in answer.tsv_rows():
+        if details := parse_subscription_row(answer.host, row[1:]):
+            yield row[0].lower(), details
+
+
+async def batch_ssh_execute(cmd: str) -> SSHResultSet:
     return await execute_ssh_commands_in_batch(
         server_list=PLESK_SERVER_LIST,
         command=cmd,
@@ -232,6 +360,13 @@ async def batch_ssh_execute(cmd: str):
     )
 
 
+async def batch_plesk_db_query(query: str, params: Sequence[Any] = ()) -> SSHResultSet:
+    if PLESK_DB.is_tunnel_enabled:
+        return await PLESK_DB.query_in_batch(PLESK_SERVER_LIST, query, params)
+    ssh_command = await build_plesk_db_command(query, params)
+    return await batch_ssh_execute(ssh_command)
+
+
 async def plesk_fetch_subscription_info(
     domain: SubscriptionName, partial_search=False
 ) -> List[SubscriptionDetails] | None:
@@ -240,29 +375,46 @@ async def plesk_fetch_subscription_info(
         lowercate_domain_name if not partial_search else lowercate_domain_name + "%"
     )
 
-    ssh_command = await build_plesk_db_command(query)
-
-    answers = await batch_ssh_execute(ssh_command)
+    answers = await batch_plesk_db_query(query)
 
     results = [
-        details
-        for answer in answers
-        if answer.get("stdout") and (details := extract_subscription_details(answer))
+        details for answer in answers for details in iter_subscription_details(answer)
     ]
     return results if results else None
 
 
-async def _build_plesk_login_command(ssh_username: LinuxUsername) -> str:
-    return f"{PLESK_LOGLINK_CMD} {ssh_username}"
+async def plesk_iter_subscription_info_bulk(
+    domains: List[SubscriptionName], chunk_size: int = SUBSCRIPTION_BULK_CHUNK_SIZE
+) -> AsyncIterator[Dict[str, List[SubscriptionDetails]]]:
+    """
+    Query every Plesk server with one IN (...) query per chunk of domains and
+    yield the chunk results keyed by requested domain as soon as they arrive.
+    Domains that were not found on any server are mapped to an empty list.
+    """
+    domain_names = list(dict.fromkeys(domain.name.lower() for domain in domains))
+    for chunk_start in range(0, len(domain_names), chunk_size):
+        chunk = domain_names[chunk_start : chunk_start + chunk_size]
+        query, params = build_bulk_subscription_info_query(chunk)
+        answers = await batch_plesk_db_query(query, params)
 
+        results: Dict[str, List[SubscriptionDetails]] = {name: [] for name in chunk}
+        for answer in answers:
+            for domain_name, details in iter_bulk_subscription_details(answer):
+                results.setdefault(domain_name, []).append(details)
+        yield results
 
-async def _is_subscription_id_exist(
-    host: PleskServerDomain, subscriptionId: int
-) -> bool:
-    get_subscription_name_cmd = f'plesk db -Ne "SELECT name FROM domains WHERE webspace_id=0 AND id={subscriptionId}"'
-    result = await execute_ssh_command(host.name, get_subscription_name_cmd)
-    subscription_name = result["stdout"]
-    return not subscription_name == ""
+
+async def plesk_fetch_subscription_info_bulk(
+    domains: List[SubscriptionName],
+) -> Dict[str, List[SubscriptionDetails]]:
+    results: Dict[str, List[SubscriptionDetails]] = {}
+    async for chunk_results in plesk_iter_subscription_info_bulk(domains):
+        results.update(chunk_results)
+    return results
+
+
+async def _build_plesk_login_command(ssh_username: LinuxUsername) -> str:
+    return f"{PLESK_LOGLINK_CMD} {ssh_username}"
 
 
 async def plesk_fetch_plesk_login_link(
@@ -270,27 +422,44 @@ async def plesk_fetch_plesk_login_link(
 ) -> str | None:
     cmd_to_run = await _build_plesk_login_command(ssh_username)
     result = await execute_ssh_command(host.name, cmd_to_run)
-    login_link = result["stdout"]
-    return login_link
+    return result.stdout
 
 
 async def plesk_generate_subscription_login_link(
     host: PleskServerDomain, subscription_id: int, ssh_username: LinuxUsername
 ) -> str:
-    if not await _is_subscription_id_exist(host, subscription_id):
+    subscription_exists = StepCondition("subscription", StepExpectation.OUTPUT)
+    steps = [
+        CompositeStep(
+            "subscription",
+            build_plesk_db_script_command(
+                SUBSCRIPTION_NAME_BY_ID_QUERY, (subscription_id,)
+            ),
+        ),
+        CompositeStep(
+            "login_link",
+            await _build_plesk_login_command(ssh_username),
+            run_if=[subscription_exists],
+        ),
+    ]
+    results = await execute_composite_command(host.name, steps)
+
+    if not results["subscription"]["stdout"]:
         raise HTTPException(
             status_code=404,
             detail=f"Subscription with {subscription_id} ID doesn't exist.",
         )
 
-    plesk_login_link = await plesk_fetch_plesk_login_link(host, ssh_username)
+    plesk_login_link = results["login_link"]["stdout"]
     subscription_login_link = f"{plesk_login_link}{REDIRECTION_HEADER}{subscription_id}"
 
     return subscription_login_link
 
 
 async def _build_fetch_testmail_password_command(domain: SubscriptionName) -> str:
-    return f"/usr/local/psa/admin/bin/mail_auth_view | grep -F '{TEST_MAIL_LOGIN}@{domain.name}' | tr -d '[:space:]' | cut -d '|' -f4- |sed 's/|$//'"
+    # mail_auth_view is the only Plesk tool printing decrypted mail passwords.
+    # grep -m1 exits on the first match, which ends the dump early.
+    return f"/usr/local/psa/admin/bin/mail_auth_view | grep -m1 -F '{TEST_MAIL_LOGIN}@{domain.name}' | tr -d '[:space:]' | cut -d '|' -f4- |sed 's/|$//'"
 
 
 async def _build_create_testmail_command(
@@ -320,37 +489,74 @@ async def _generate_password(password_length: int) -> str:
     return "".join(password_chars)
 
 
-async def _get_testmail_password(
-    host: PleskServerDomain, mail_domain: SubscriptionName
-) -> str | None:
-    command = await _build_fetch_testmail_password_command(mail_domain)
-    result = await execute_ssh_command(host=host.name, command=command)
-    password = result["stdout"]
-    return password if password else None
-
-
-async def _create_testmail(
-    host: PleskServerDomain, mail_domain: SubscriptionName, password: str
-) -> None:
-    command = await _build_create_testmail_command(mail_domain, password)
-    result = await execute_ssh_command(host=host.name, command=command)
-    if result["returncode"] != 0:
-        raise RuntimeError(
-            f"Test mail creation failed on Plesk server: {result['host']} "
-            f"with error: {result['stderr']}"
-        )
-
-
 async def plesk_get_testmail_login_data(
     host: PleskServerDomain, mail_domain: SubscriptionName
 ) -> TestMailData:
+    """
+    Fetch the test mailbox password, creating the mailbox when it doesn't
+    exist yet, in a single round trip to the Plesk server. Mailboxes known
+    to be missing are created without dumping the server's mail passwords.
+    """
     generated_login_link = f"https://webmail.{mail_domain.name}/roundcube/index.php?_user={TEST_MAIL_LOGIN}%40{mail_domain.name}"
+    new_password = await _generate_password(TEST_MAIL_PASSWORD_LENGTH)
+
+    testmail_address = f"{TEST_MAIL_LOGIN}@{mail_domain.name}"
+    subscription_step = CompositeStep(
+        "subscription",
+        build_plesk_db_script_command(
+            SUBSCRIPTION_ID_BY_DOMAIN_QUERY, (mail_domain.name,)
+        ),
+    )
+    password_command = await _build_fetch_testmail_password_command(mail_domain)
+    create_command = await _build_create_testmail_command(mail_domain, new_password)
+    subscription_exists = StepCondition("subscription", StepExpectation.OUTPUT)
+    # The mailbox index is only a hint, the step running second covers a
+    # mailbox created or removed since the last index refresh.
+    if MAILBOX_INDEX.has_mailbox(host.name, testmail_address) is False:
+        steps = [
+            subscription_step,
+            CompositeStep("create", create_command, run_if=[subscription_exists]),
+            CompositeStep(
+                "password",
+                password_command,
+                run_if=[
+                    subscription_exists,
+                    StepCondition("create", StepExpectation.FAILURE),
+                ],
+            ),
+        ]
+    else:
+        steps = [
+            subscription_step,
+            CompositeStep("password", password_command, run_if=[subscription_exists]),
+            CompositeStep(
+                "create",
+                create_command,
+                run_if=[
+                    subscription_exists,
+                    StepCondition("password", StepExpectation.NO_OUTPUT),
+                ],
+            ),
+        ]
+    results = await execute_composite_command(host.name, steps)
+
+    if not results["subscription"]["stdout"]:
+        raise DomainNotFoundError(
+            f"Subscription with domain [{mail_domain.name}] not found."
+        )
+
+    password = results["password"]["stdout"]
     new_email_created = False
-    password = await _get_testmail_password(host=host, mail_domain=mail_domain)
     if not password:
-        password = await _generate_password(TEST_MAIL_PASSWORD_LENGTH)
-        await _create_testmail(host=host, mail_domain=mail_domain, password=password)
+        create_result = results["create"]
+        if create_result["returncode"] != 0:
+            raise RuntimeError(
+                f"Test mail creation failed on Plesk server: {host.name} "
+                f"with error: {create_result['stderr']}"
+            )
+        password = new_password
         new_email_created = True
+    MAILBOX_INDEX.add_mailbox(host.name, testmail_address)
     return TestMailData(
         login_link=generated_login_link,
         password=password,
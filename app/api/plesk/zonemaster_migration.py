@@ -0,0 +1,91 @@
+import asyncio
+from typing import Dict, List
+
+from app.api.dns.ssh_utils import (
+    dns_query_zone_masters_bulk,
+    dns_remove_zone_masters_bulk,
+    resolve_zone_master_names,
+)
+from app.api.plesk.ssh_utils import (
+    fetch_existing_domains,
+    restart_dns_service_for_domains,
+)
+from app.core.config import settings
+from app.db.models import Job, JobItem, SetZoneMasterLog
+from app.job_queue import ItemOutcome, JobHandler, register_job_handler
+from app.schemas import JobType, PleskServerDomain, SubscriptionName
+
+
+async def migrate_zone_master_batch(
+    target: PleskServerDomain,
+    domains: List[SubscriptionName],
+    ptr_cache: Dict[str, List[str] | None],
+) -> tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Move a batch of domains to a target server: one existence query on the
+    target, one zone file read and one delzone script per DNS server, then
+    one DNS off/on script on the target.
+    Returns previous zone masters and errors, both keyed by domain name.
+    """
+    existing, zone_master_ips = await asyncio.gather(
+        fetch_existing_domains(target, domains),
+        dns_query_zone_masters_bulk(domains),
+    )
+    errors = {
+        domain.name.lower(): f"Subscription with domain [{domain.name}] not found."
+        for domain in domains
+        if domain.name.lower() not in existing
+    }
+    present = [domain for domain in domains if domain.name.lower() not in errors]
+    if present:
+        errors.update(await dns_remove_zone_masters_bulk(present))
+    removed = [domain for domain in present if domain.name.lower() not in errors]
+    if removed:
+        errors.update(await restart_dns_service_for_domains(target, removed))
+
+    zone_masters = {
+        domain_name: resolve_zone_master_names(ips, ptr_cache)
+        for domain_name, ips in zone_master_ips.items()
+    }
+    return zone_masters, errors
+
+
+def get_migration_target(item: JobItem) -> str:
+    return item.payload["target_plesk_server"]
+
+
+async def run_zonemaster_migration_batch(
+    job: Job, items: List[JobItem]
+) -> Dict[str, ItemOutcome]:
+    target_name = get_migration_target(items[0])
+    zone_masters, errors = await migrate_zone_master_batch(
+        PleskServerDomain(name=target_name),
+        [SubscriptionName(name=item.key) for item in items],
+        {},
+    )
+    outcomes = {}
+    for item in items:
+        current_zone_master = zone_masters.get(item.key)
+        outcomes[item.key] = ItemOutcome(
+            result={"current_zone_master": current_zone_master},
+            error=errors.get(item.key),
+            audit_log=SetZoneMasterLog(
+                user_id=job.user_id,
+                current_zone_master=current_zone_master,
+                target_zone_master=target_name,
+                domain=item.key,
+                ip=job.ip,
+            ),
+        )
+    return outcomes
+
+
+register_job_handler(
+    JobType.ZONE_MASTER_MIGRATION,
+    JobHandler(
+        run_batch=run_zonemaster_migration_batch,
+        group_by=get_migration_target,
+        batch_size=settings.ZONEMASTER_MIGRATION_BATCH_SIZE,
+        concurrency=settings.ZONEMASTER_MIGRATION_CONCURRENCY,
+    ),
+)
@@ -1,18 +1,30 @@
+import csv
+import io
+import json
 import uuid
+from datetime import date, datetime
+from enum import Enum
 
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import update, delete, select, func
+from typing import Annotated, Any, AsyncIterator, List, Mapping
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import update, delete, select
 
 
 from app.db import crud
+from app.db.activity_counts import get_activity_counts
+from app.db.counts import count_rows_sync
 from app.api.dependencies import (
+    AsyncSessionDep,
     CurrentUser,
     SessionDep,
     get_current_active_superuser,
     RoleChecker,
 )
 from app.core.config import settings
+from app.core.db import AsyncSessionLocal
 from app.core.security import get_password_hash, verify_password
 from app.schemas import (
     Message,
@@ -29,8 +41,17 @@ from app.schemas import (
     PaginatedUserLogListSchema,
     UserLogFilterSchema,
     SuperUserUpdateMe,
+    CountStrategy,
+    ExportFormat,
+    UserActionType,
+    ValidatedDomainName,
+    ValidatedPleskServerDomain,
+    ActivityAnalyticsSchema,
+    AnalyticsBucket,
+    AnalyticsGroupBy,
 )
 from app.db.models import UsersActivityLog, User
+from app.user_cache import USER_CACHE
 from app.utils import generate_new_account_email, send_email
 
 router = APIRouter(tags=["users"], prefix="/users")
@@ -41,18 +62,22 @@ router = APIRouter(tags=["users"], prefix="/users")
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    count_strategy: CountStrategy = CountStrategy.CACHED,
+) -> Any:
     """
     Retrieve users.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.execute(count_statement).scalar()
+    count, count_strategy = count_rows_sync(session, select(User.id), count_strategy)
 
     statement = select(User).offset(skip).limit(limit)
-    users = session.execute(statement).scalars()
+    users = session.execute(statement).scalars().all()
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=users, count=count, count_strategy=count_strategy)
 
 
 @router.post(
@@ -99,6 +124,7 @@ def update_user_me(
     user_data = user_in.model_dump(exclude_unset=True)
     stmt = update(User).where(User.id == current_user.id).values(user_data)
     session.execute(stmt)
+    USER_CACHE.invalidate(session, current_user.id)
     session.commit()
     updated_user = UserPublic.model_validate(
         session.execute(select(User).where(User.id == current_user.id)).scalar()
@@ -156,6 +182,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         )
     stmt = delete(User).where(User.id == current_user.id)
     session.execute(stmt)
+    USER_CACHE.invalidate(session, current_user.id)
     session.commit()
     return Message(message="User deleted successfully")
 
@@ -249,26 +276,165 @@ def delete_user(
         )
     stmt_delete = delete(User).where(User.id == user_id)
     session.execute(stmt_delete)
+    USER_CACHE.invalidate(session, user_id)
     session.commit()
     return Message(message="User deleted successfully")
 
 
 @router.post("/me/history", response_model=PaginatedUserLogListSchema)
 async def get_own_actions(
-    current_user: CurrentUser, session: SessionDep, input: UserLogSearchRequestSchema
+    current_user: CurrentUser,
+    session: AsyncSessionDep,
+    input: UserLogSearchRequestSchema,
 ):
     filters = UserLogFilterSchema.model_validate(input.filters.model_dump())
     filters.user_id = current_user.id
-    return await crud.get_user_log_entries_by_id(
-        session, filters=filters, page=input.page, page_size=input.page_size
+    try:
+        return await crud.get_user_log_entries_by_id(
+            session,
+            filters=filters,
+            page=input.page,
+            page_size=input.page_size,
+            cursor=input.cursor,
+            count_strategy=input.count_strategy,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    # UUID and IPv4Address
+    return str(value)
+
+
+def _format_export_rows(rows: List[Mapping[str, Any]], format: ExportFormat) -> str:
+    if format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [_export_value(value) for value in row.values()] for row in rows
+        )
+        return buffer.getvalue()
+    return "".join(
+        json.dumps({key: _export_value(value) for key, value in row.items()}) + "\n"
+        for row in rows
+    )
+
+
+async def _stream_log_export(
+    filters: UserLogFilterSchema, format: ExportFormat
+) -> AsyncIterator[str]:
+    if format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(column.name for column in crud.LOG_EXPORT_COLUMNS)
+        yield buffer.getvalue()
+    # The request's session is closed before the response body is sent
+    async with AsyncSessionLocal() as session:
+        async for rows in crud.iter_user_log_export(session, filters=filters):
+            yield _format_export_rows(rows, format)
+
+
+def get_log_export_filters(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    log_type: UserActionType | None = None,
+    domain: Annotated[ValidatedDomainName | None, Query()] = None,
+    plesk_server: Annotated[ValidatedPleskServerDomain | None, Query()] = None,
+) -> UserLogFilterSchema:
+    try:
+        return UserLogFilterSchema(
+            since=since,
+            until=until,
+            log_type=log_type,
+            domain=domain,
+            plesk_server=plesk_server,
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+def _log_export_response(
+    filters: UserLogFilterSchema, format: ExportFormat
+) -> StreamingResponse:
+    media_type = "text/csv" if format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_log_export(filters, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="history.{format.value}"'
+        },
+    )
+
+
+@router.get("/me/history/export")
+async def export_own_actions(
+    current_user: CurrentUser,
+    filters: Annotated[UserLogFilterSchema, Depends(get_log_export_filters)],
+    format: ExportFormat = ExportFormat.NDJSON,
+) -> StreamingResponse:
+    """
+    Stream own logs from `since` up to `until`, oldest first.
+    """
+    filters.user_id = current_user.id
+    return _log_export_response(filters, format)
+
+
+@router.get(
+    "/{user_id}/history/export",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+async def export_user_actions(
+    user_id: uuid.UUID,
+    filters: Annotated[UserLogFilterSchema, Depends(get_log_export_filters)],
+    format: ExportFormat = ExportFormat.NDJSON,
+) -> StreamingResponse:
+    """
+    Stream a user's logs from `since` up to `until`, oldest first.
+    """
+    filters.user_id = user_id
+    return _log_export_response(filters, format)
+
+
+@router.get(
+    "/history/analytics",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+    response_model=ActivityAnalyticsSchema,
+)
+async def get_activity_analytics(
+    session: AsyncSessionDep,
+    since: date,
+    until: date,
+    bucket: AnalyticsBucket = AnalyticsBucket.DAY,
+    group_by: Annotated[List[AnalyticsGroupBy] | None, Query()] = None,
+    log_type: UserActionType | None = None,
+) -> Any:
+    """
+    Count logs per day, week or month from `since` up to `until`,
+    optionally per user and Plesk server. Read from the daily counts, not
+    the logs.
+    """
+    return await get_activity_counts(
+        session,
+        since=since,
+        until=until,
+        bucket=bucket,
+        group_by=group_by or [],
+        log_type=log_type,
     )
 
 
 @router.get("/{user_id}/history")
-async def get_user_actions(user_id: uuid.UUID, session: SessionDep):
+async def get_user_actions(user_id: uuid.UUID, session: AsyncSessionDep):
     actions = (
-        session.execute(
-            select(UsersActivityLog).where(UsersActivityLog.user_id == user_id)
+        (
+            await session.execute(
+                select(UsersActivityLog).where(UsersActivityLog.user_id == user_id)
+            )
         )
         .scalars()
         .all()
@@ -298,6 +464,7 @@ def update_superuser_me(
     user_data = user_in.model_dump(exclude_unset=True)
     stmt = update(User).where(User.id == current_user.id).values(user_data)
     session.execute(stmt)
+    USER_CACHE.invalidate(session, current_user.id)
     session.commit()
     updated_user = UserPublic.model_validate(
         session.execute(select(User).where(User.id == current_user.id)).scalar()
@@ -1,8 +1,47 @@
-from fastapi import APIRouter
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends
+
+from app.api.dependencies import RoleChecker
+from app.host_health import HOST_HEALTH
+from app.ssh_broker_client import SSH_BROKER_CLIENT, SshBrokerError
+from app.schemas import UserRoles, HostHealthPublic
 
 router = APIRouter(tags=["utils"], prefix="/utils")
 
 
+def _to_datetime(timestamp: float | None) -> datetime | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/host-health/",
+    dependencies=[Depends(RoleChecker([UserRoles.SUPERUSER, UserRoles.ADMIN]))],
+)
+async def get_host_health() -> List[HostHealthPublic]:
+    summaries = None
+    if SSH_BROKER_CLIENT.is_enabled:
+        try:
+            summaries = await SSH_BROKER_CLIENT.request("health")
+        except SshBrokerError:
+            pass
+    if summaries is None:
+        summaries = [health.summary() for health in HOST_HEALTH.snapshot()]
+    return [
+        HostHealthPublic(
+            **{
+                **summary,
+                "last_success": _to_datetime(summary["last_success"]),
+                "last_failure": _to_datetime(summary["last_failure"]),
+            }
+        )
+        for summary in summaries
+    ]
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import List
+
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.db.activity_counts import activity_count_upsert
+from app.db.models import UsersActivityLog
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _describe(record: UsersActivityLog) -> str:
+    columns = inspect(record).mapper.column_attrs
+    return ", ".join(
+        f"{column.key}={getattr(record, column.key)}" for column in columns
+    )
+
+
+class AuditLogWriter:
+    """
+    Buffers audit log records and writes them in batches through its own
+    session. A batch is written once AUDIT_LOG_BATCH_SIZE records are
+    queued or AUDIT_LOG_FLUSH_INTERVAL_SECONDS after its first record.
+    Producers wait when AUDIT_LOG_QUEUE_SIZE records are already queued.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue[UsersActivityLog] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    async def enqueue(self, record: UsersActivityLog) -> None:
+        if self._task is None:
+            # Scripts and tests without the app lifespan write directly
+            await self._write_batch([record])
+            return
+        await self._queue.put(record)
+
+    async def _write_batch(self, records: List[UsersActivityLog]) -> None:
+        # The session inserts the parent and child rows of each log type
+        # with one multi-row statement per table
+        from app.core.db import AsyncSessionLocal  # app.core.db imports crud
+
+        async with AsyncSessionLocal() as session:
+            session.add_all(records)
+            # The daily counts need the timestamps set on flush
+            await session.flush()
+            await session.execute(activity_count_upsert(records))
+            await session.commit()
+
+    async def _next_batch(self) -> tuple[List[UsersActivityLog], bool]:
+        """Collect records until a batch is full or its interval is over."""
+        batch = []
+        deadline = None
+        while len(batch) < settings.AUDIT_LOG_BATCH_SIZE:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                record = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+            if deadline is None:
+                deadline = time.monotonic() + settings.AUDIT_LOG_FLUSH_INTERVAL_SECONDS
+        return batch, False
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if not batch:
+                continue
+            await self._write(batch)
+
+    async def _write(self, batch: List[UsersActivityLog]) -> None:
+        delay = settings.AUDIT_LOG_RETRY_DELAY_SECONDS
+        for attempt in range(1, settings.AUDIT_LOG_WRITE_ATTEMPTS + 1):
+            try:
+                await self._write_batch(batch)
+                return
+            except Exception:
+                logger.warning(
+                    f"Failed to write {len(batch)} audit log records, "
+                    f"attempt {attempt}",
+                    exc_info=True,
+                )
+            if attempt < settings.AUDIT_LOG_WRITE_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        # Only the records that fail on their own are lost
+        for record in batch:
+            try:
+                await self._write_batch([record])
+            except Exception:
+                logger.exception(f"Dropped audit log record: {_describe(record)}")
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=settings.AUDIT_LOG_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write what is still queued and stop the writer."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        await self._queue.put(_STOP)
+        await task
+
+
+AUDIT_LOG_WRITER = AuditLogWriter()
@@ -0,0 +1,189 @@
+import base64
+import re
+import secrets
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, TypedDict
+
+from app.AsyncSSHandler import execute_ssh_command, execute_ssh_commands_per_host
+
+STEP_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]*$")
+FRAME_MARKER = "__COMPOSITE_STEP_{nonce}__"
+
+
+class StepExpectation(str, Enum):
+    SUCCESS = "success"
+    FAILURE = "failure"
+    OUTPUT = "output"
+    NO_OUTPUT = "no_output"
+
+
+@dataclass
+class StepCondition:
+    step: str
+    expect: StepExpectation
+
+
+@dataclass
+class CompositeStep:
+    name: str
+    command: str
+    run_if: List[StepCondition] = field(default_factory=list)
+
+
+class StepResult(TypedDict):
+    name: str
+    stdout: str | None
+    stderr: str | None
+    returncode: int | None
+    skipped: bool
+
+
+class CompositeCommandError(Exception):
+    """Raised when a composite command can't be built"""
+
+    pass
+
+
+def _build_condition(condition: StepCondition, step_index: Dict[str, int]) -> str:
+    if condition.step not in step_index:
+        raise CompositeCommandError(
+            f"Condition refers to unknown or later step {condition.step}"
+        )
+    i = step_index[condition.step]
+    ran = f'[ -n "$__rc_{i}" ]'
+    has_output = f'[ -n "$(tr -d \'[:space:]\' < "$__d/{i}.out")" ]'
+    match condition.expect:
+        case StepExpectation.SUCCESS:
+            return f'[ "$__rc_{i}" = 0 ]'
+        case StepExpectation.FAILURE:
+            return f'{ran} && [ "$__rc_{i}" != 0 ]'
+        case StepExpectation.OUTPUT:
+            return f"{ran} && {has_output}"
+        case StepExpectation.NO_OUTPUT:
+            return f"{ran} && ! {has_output}"
+
+
+def build_composite_script(steps: List[CompositeStep], nonce: str) -> str:
+    """
+    Build a POSIX shell script running the steps in order. Each step output is
+    framed with marker lines carrying the step name and exit code, steps whose
+    conditions are not met are reported as skipped.
+    """
+    marker = FRAME_MARKER.format(nonce=nonce)
+    step_index: Dict[str, int] = {}
+    lines = ["__d=$(mktemp -d)", "trap 'rm -rf \"$__d\"' EXIT"]
+    for i, step in enumerate(steps):
+        if not STEP_NAME_PATTERN.match(step.name) or step.name in step_index:
+            raise CompositeCommandError(f"Invalid step name {step.name}")
+        conditions = " && ".join(
+            f"{{ {_build_condition(condition, step_index)}; }}"
+            for condition in step.run_if
+        )
+        run = "\n".join(
+            [
+                f'( {step.command}\n) > "$__d/{i}.out" 2> "$__d/{i}.err"',
+                f"__rc_{i}=$?",
+                f"printf '%s\\n' '{marker} BEGIN {step.name}'",
+                f'cat "$__d/{i}.out"',
+                f"printf '\\n%s\\n' '{marker} STDERR {step.name}'",
+                f'cat "$__d/{i}.err"',
+                f"printf '\\n%s %s\\n' '{marker} END {step.name}' \"$__rc_{i}\"",
+            ]
+        )
+        lines.append(f': > "$__d/{i}.out"')
+        if conditions:
+            skip = f"printf '%s\\n' '{marker} SKIP {step.name}'"
+            lines.append(f"if {conditions}; then\n{run}\nelse\n{skip}\nfi")
+        else:
+            lines.append(run)
+        step_index[step.name] = i
+    return "\n".join(lines) + "\n"
+
+
+def build_composite_command(steps: List[CompositeStep], nonce: str) -> str:
+    """Wrap the script so it survives the double quoted ssh command line."""
+    script = build_composite_script(steps, nonce)
+    encoded_script = base64.b64encode(script.encode()).decode()
+    return f"echo {encoded_script} | base64 -d | sh"
+
+
+def _strip_output(lines: List[str]) -> str | None:
+    output = "\n".join(lines).strip()
+    return output if output else None
+
+
+def parse_composite_output(
+    steps: List[CompositeStep], stdout: str | None, nonce: str
+) -> Dict[str, StepResult]:
+    """
+    Split framed composite command output into per step results. Steps with
+    no frame, for example when the connection dropped, are reported skipped.
+    """
+    marker = FRAME_MARKER.format(nonce=nonce)
+    results: Dict[str, StepResult] = {
+        step.name: StepResult(
+            name=step.name, stdout=None, stderr=None, returncode=None, skipped=True
+        )
+        for step in steps
+    }
+    current: str | None = None
+    stdout_lines: List[str] = []
+    stderr_lines: List[str] = []
+    target = stdout_lines
+    for line in (stdout or "").splitlines():
+        if not line.startswith(marker + " "):
+            if current is not None:
+                target.append(line)
+            continue
+        kind, _, rest = line[len(marker) + 1 :].partition(" ")
+        name, _, returncode = rest.partition(" ")
+        if name not in results:
+            continue
+        match kind:
+            case "BEGIN":
+                current = name
+                stdout_lines, stderr_lines = [], []
+                target = stdout_lines
+            case "STDERR":
+                target = stderr_lines
+            case "END" if current == name:
+                results[name] = StepResult(
+                    name=name,
+                    stdout=_strip_output(stdout_lines),
+                    stderr=_strip_output(stderr_lines),
+                    returncode=int(returncode) if returncode.isdigit() else None,
+                    skipped=False,
+                )
+                current = None
+            case "SKIP":
+                current = None
+    return results
+
+
+async def execute_composite_command(
+    host: str, steps: List[CompositeStep], verbose: bool = True
+) -> Dict[str, StepResult]:
+    """Run dependent steps on a host in a single SSH round trip."""
+    nonce = secrets.token_hex(8)
+    command = build_composite_command(steps, nonce)
+    result = await execute_ssh_command(host=host, command=command, verbose=verbose)
+    return parse_composite_output(steps, result.stdout, nonce)
+
+
+async def execute_composite_command_in_batch(
+    hosts: List[str], steps: List[CompositeStep], verbose: bool = True
+) -> Dict[str, Dict[str, StepResult]]:
+    """
+    Run the same steps on several hosts, one round trip each within the
+    shared limits of execute_ssh_commands_per_host.
+    """
+    nonce = secrets.token_hex(8)
+    command = build_composite_command(steps, nonce)
+    results = await execute_ssh_commands_per_host(
+        {host: [command] for host in hosts}, verbose=verbose
+    )
+    return {
+        host: parse_composite_output(steps, host_results[0].stdout, nonce)
+        for host, host_results in results.items()
+    }
@@ -102,6 +102,80 @@ class Settings(BaseSettings):
     DNS_SLAVE_SERVERS: dict[str, list[str]] = {}
     ADDITIONAL_HOSTS: dict[str, list[str]] = {}
 
+    PLESK_DB_ACCESS_MODE: Literal["cli", "tunnel"] = "cli"
+    PLESK_DB_POOL_SIZE: int = 2
+    PLESK_DB_REMOTE_SOCKET: str = "/var/run/mysqld/mysqld.sock"
+    PLESK_DB_USER: str = "admin"
+    PLESK_DB_NAME: str = "psa"
+
+    SSH_KEEPALIVE_TICK_SECONDS: int = 10
+    SSH_KEEPALIVE_REFRESH_MARGIN_SECONDS: int = 60
+    SSH_KEEPALIVE_JITTER_SECONDS: int = 30
+
+    HOST_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    HOST_CIRCUIT_COOLDOWN_SECONDS: int = 60
+    HOST_HEALTH_LATENCY_WINDOW: int = 20
+
+    # Unix socket of the SSH broker shared by all API workers, unset runs
+    # SSH commands in each worker
+    SSH_BROKER_SOCKET: str | None = None
+
+    # Run commands in long-lived remote bash sessions instead of a new ssh
+    # process each
+    SSH_PERSISTENT_SESSIONS: bool = False
+    SSH_SESSIONS_PER_HOST: int = 2
+
+    # Limits shared by all execute_ssh_commands_per_host calls of a worker,
+    # sshd allows 10 sessions per connection by default
+    SSH_BATCH_MAX_CONCURRENCY: int = 32
+    SSH_BATCH_MAX_PER_HOST: int = 4
+
+    # Audit logs are queued and written in batches of up to
+    # AUDIT_LOG_BATCH_SIZE records, at least every flush interval
+    AUDIT_LOG_BATCH_SIZE: int = 100
+    AUDIT_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_LOG_QUEUE_SIZE: int = 10000
+    # A failing batch is retried with a doubling delay, then written record
+    # by record so only the failing records are dropped
+    AUDIT_LOG_WRITE_ATTEMPTS: int = 3
+    AUDIT_LOG_RETRY_DELAY_SECONDS: float = 0.5
+
+    # Totals of paginated listings, see CountStrategy
+    COUNT_CACHE_TTL_SECONDS: float = 30.0
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+    COUNT_ESTIMATE_MIN_ROWS: int = 10000
+
+    # Rows fetched from the server-side cursor per chunk of a log export
+    LOG_EXPORT_FETCH_SIZE: int = 1000
+
+    # The activity log tables are partitioned by month. Partitions are
+    # created LOG_PARTITION_MONTHS_AHEAD, months older than
+    # LOG_RETENTION_MONTHS are archived to LOG_ARCHIVE_DIR and dropped, logs
+    # are kept forever when it's unset.
+    LOG_PARTITION_MONTHS_AHEAD: int = 3
+    LOG_RETENTION_MONTHS: int | None = None
+    LOG_ARCHIVE_DIR: str = "log_archive"
+    LOG_PARTITION_MAINTENANCE_SECONDS: int = 60 * 60 * 6
+
+    # Authenticated users are cached per worker for USER_CACHE_TTL_SECONDS,
+    # changes made through other workers are noticed within
+    # USER_CACHE_VERSION_CHECK_SECONDS
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_VERSION_CHECK_SECONDS: float = 1.0
+
+    MAILBOX_INDEX_REFRESH_SECONDS: int = 60 * 10
+
+    # Add the workflow step timings of zone master endpoints to their
+    # responses as a Server-Timing header, for debugging
+    SERVER_TIMING_ENABLED: bool = False
+
+    ZONEMASTER_MIGRATION_BATCH_SIZE: int = 50
+    ZONEMASTER_MIGRATION_CONCURRENCY: int = 4
+    JOB_WORKERS: int = 2
+    JOB_HEARTBEAT_INTERVAL_SECONDS: int = 30
+    JOB_HEARTBEAT_TIMEOUT_SECONDS: int = 300
+
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         if value == "changethis":
             message = (
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session
 
 from app.db import crud
@@ -7,6 +8,10 @@ from app.schemas import UserCreate, UserRoles
 from app.db.models import User, Base
 
 engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), echo=False)
+# psycopg 3 drives both engines, the async one serves the async routes and
+# audit logging so database I/O doesn't block the event loop
+async_engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI), echo=False)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
 
 def init_db(session: Session) -> None:
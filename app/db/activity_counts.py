@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import date, timezone
+from typing import List, Sequence
+
+from sqlalchemy import Date, Insert, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ActivityDailyCount, UsersActivityLog
+from app.schemas import (
+    ActivityAnalyticsSchema,
+    ActivityCountSchema,
+    AnalyticsBucket,
+    AnalyticsGroupBy,
+    UserActionType,
+)
+
+
+def activity_count_upsert(logs: Sequence[UsersActivityLog]) -> Insert | None:
+    """
+    Statement adding flushed logs to their daily counts, None without logs.
+    Rows are sorted so concurrent writers lock them in the same order.
+    """
+    counts = Counter(
+        (
+            log.timestamp.astimezone(timezone.utc).date(),
+            log.user_id,
+            log.log_type,
+            getattr(log, "plesk_server", None) or "",
+        )
+        for log in logs
+    )
+    if not counts:
+        return None
+    statement = insert(ActivityDailyCount).values(
+        [
+            {
+                "day": day,
+                "user_id": user_id,
+                "log_type": log_type,
+                "plesk_server": plesk_server,
+                "count": count,
+            }
+            for (day, user_id, log_type, plesk_server), count in sorted(
+                counts.items(), key=str
+            )
+        ]
+    )
+    return statement.on_conflict_do_update(
+        index_elements=["day", "user_id", "log_type", "plesk_server"],
+        set_={"count": ActivityDailyCount.count + statement.excluded.count},
+    )
+
+
+async def get_activity_counts(
+    session: AsyncSession,
+    *,
+    since: date,
+    until: date,
+    bucket: AnalyticsBucket,
+    group_by: List[AnalyticsGroupBy],
+    log_type: UserActionType | None = None,
+) -> ActivityAnalyticsSchema:
+    """Log counts per bucket from `since` up to, not including, `until`."""
+    bucket_start = cast(func.date_trunc(bucket.value, ActivityDailyCount.day), Date)
+    columns = [bucket_start.label("bucket"), ActivityDailyCount.log_type]
+    if AnalyticsGroupBy.USER in group_by:
+        columns.append(ActivityDailyCount.user_id)
+    if AnalyticsGroupBy.SERVER in group_by:
+        columns.append(ActivityDailyCount.plesk_server)
+
+    query = select(*columns, func.sum(ActivityDailyCount.count).label("count")).where(
+        ActivityDailyCount.day >= since, ActivityDailyCount.day < until
+    )
+    if log_type is not None:
+        query = query.where(ActivityDailyCount.log_type == log_type)
+    query = query.group_by(*columns).order_by(*columns)
+
+    rows = (await session.execute(query)).mappings().all()
+    data = [
+        ActivityCountSchema(
+            **{
+                **row,
+                # Stored empty for log types without a server
+                "plesk_server": row.get("plesk_server") or None,
+            }
+        )
+        for row in rows
+    ]
+    return ActivityAnalyticsSchema(bucket=bucket, data=data)
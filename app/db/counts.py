@@ -0,0 +1,111 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from sqlalchemy import Select, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.config import settings
+from app.schemas import CountStrategy
+
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON)` of a statement, its binds are processed as usual."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class CountCache:
+    """
+    Row counts by query signature, kept for COUNT_CACHE_TTL_SECONDS. The
+    signature is the SQL with its parameters, so each filter combination
+    gets its own entry.
+    """
+
+    def __init__(self):
+        self._counts: OrderedDict[str, Tuple[float, int]] = OrderedDict()
+
+    @staticmethod
+    def signature(query: Select) -> str:
+        compiled = query.compile()
+        return f"{compiled}|{sorted(compiled.params.items(), key=str)!r}"
+
+    def get(self, key: str) -> int | None:
+        entry = self._counts.get(key)
+        if entry is None:
+            return None
+        stored_at, count = entry
+        if time.monotonic() - stored_at > settings.COUNT_CACHE_TTL_SECONDS:
+            del self._counts[key]
+            return None
+        return count
+
+    def set(self, key: str, count: int) -> None:
+        self._counts[key] = (time.monotonic(), count)
+        self._counts.move_to_end(key)
+        while len(self._counts) > settings.COUNT_CACHE_MAX_ENTRIES:
+            self._counts.popitem(last=False)
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+
+COUNT_CACHE = CountCache()
+
+
+def _plan_rows(plan: list | str) -> int:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _exact_count(session: Session, query: Select) -> int:
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return session.execute(count_query).scalar()
+
+
+def count_rows_sync(
+    session: Session, query: Select, strategy: CountStrategy
+) -> Tuple[int, CountStrategy]:
+    """
+    Count the rows of a query with the given strategy, return the count and
+    the strategy that was used. An estimate below COUNT_ESTIMATE_MIN_ROWS
+    is replaced by an exact count, the planner is too far off for small
+    results.
+    """
+    if strategy == CountStrategy.CACHED:
+        key = CountCache.signature(query)
+        count = COUNT_CACHE.get(key)
+        if count is None:
+            count = _exact_count(session, query)
+            COUNT_CACHE.set(key, count)
+        return count, CountStrategy.CACHED
+
+    if strategy == CountStrategy.ESTIMATED:
+        plan_query = query.order_by(None).with_only_columns(
+            literal_column("1"), maintain_column_froms=True
+        )
+        estimate = _plan_rows(session.execute(Explain(plan_query)).scalar())
+        if estimate >= settings.COUNT_ESTIMATE_MIN_ROWS:
+            return estimate, CountStrategy.ESTIMATED
+
+    return _exact_count(session, query), CountStrategy.EXACT
+
+
+async def count_rows(
+    session: AsyncSession, query: Select, strategy: CountStrategy
+) -> Tuple[int, CountStrategy]:
+    """`count_rows_sync` for async sessions."""
+    return await session.run_sync(count_rows_sync, query, strategy)
@@ -1,12 +1,31 @@
-from typing import Any
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Sequence
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import update, select, and_, func
-from sqlalchemy.orm import with_polymorphic
-from sqlalchemy.inspection import inspect
+from sqlalchemy import (
+    Column,
+    ColumnElement,
+    RowMapping,
+    Select,
+    Table,
+    update,
+    select,
+    and_,
+    or_,
+    func,
+    tuple_,
+)
+from sqlalchemy.orm import selectin_polymorphic
 from fastapi.encoders import jsonable_encoder
 
 
+from app.audit_log_writer import AUDIT_LOG_WRITER
+from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
+from app.user_cache import USER_CACHE
 from app.schemas import (
     DomainName,
     SubscriptionName,
@@ -17,7 +36,17 @@ from app.schemas import (
     IPv4Address,
     UserLogFilterSchema,
     PaginatedUserLogListSchema,
+    CountStrategy,
+    JobType,
+    JobStatus,
+    JobItemStatus,
+    JobItemFailure,
+    JobProgress,
+    JobItemPublic,
+    PaginatedJobItemListSchema,
 )
+from app.db.activity_counts import activity_count_upsert
+from app.db.counts import count_rows
 from app.db.models import (
     User,
     DeleteZonemasterLog,
@@ -26,6 +55,8 @@ from app.db.models import (
     GetPleskLoginLinkLog,
     UsersActivityLog,
     PleskMailGetTestMailLog,
+    Job,
+    JobItem,
 )
 
 
@@ -36,7 +67,7 @@ def create_user(*, session: Session, user_create: UserCreate) -> User:
         full_name=user_create.full_name,
         role=user_create.role,
         hashed_password=get_password_hash(user_create.password),
-        ssh_username=user_create.ssh_username
+        ssh_username=user_create.ssh_username,
     )
     session.add(db_obj)
     session.commit()
@@ -52,6 +83,7 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
         user_data["hashed_password"] = hashed_password
     stmt = update(User).where(User.id == db_user.id).values(user_data)
     session.execute(stmt)
+    USER_CACHE.invalidate(session, db_user.id)
     session.commit()
     session.refresh(db_user)
     return db_user
@@ -73,51 +105,47 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
 
 
 async def log_dns_zone_master_removal(
-    session: Session,
     user: UserPublic,
-    current_zone_master: PleskServerDomain,
+    current_zone_master: str | None,
     domain: DomainName,
     ip: IPv4Address,
 ) -> None:
     user_action = DeleteZonemasterLog(
         user_id=user.id,
-        current_zone_master=current_zone_master.name,
-        domain=domain,
+        current_zone_master=current_zone_master,
+        domain=domain.name,
         ip=ip,
     )
-    session.add(user_action)
-    session.commit()
+    await AUDIT_LOG_WRITER.enqueue(user_action)
 
 
 async def log_dns_zone_master_fetch(
-    session: Session, user: UserPublic, domain: SubscriptionName, ip: IPv4Address
+    user: UserPublic,
+    domain: SubscriptionName,
+    ip: IPv4Address,
 ) -> None:
     user_action = GetZoneMasterLog(user_id=user.id, domain=domain.name, ip=ip)
-    session.add(user_action)
-    session.commit()
+    await AUDIT_LOG_WRITER.enqueue(user_action)
 
 
 async def log_dns_zone_master_set(
-    session: Session,
     user: UserPublic,
-    current_zone_master: PleskServerDomain | None,
+    current_zone_master: str | None,
     target_zone_master: PleskServerDomain,
     domain: DomainName,
     ip: IPv4Address,
 ) -> None:
     user_action = SetZoneMasterLog(
         user_id=user.id,
-        current_zone_master=str(current_zone_master),
+        current_zone_master=current_zone_master,
         target_zone_master=target_zone_master.name,
         domain=domain.name,
         ip=ip,
     )
-    session.add(user_action)
-    session.commit()
+    await AUDIT_LOG_WRITER.enqueue(user_action)
 
 
 async def log_db_plesk_login_link_get(
-    session: Session,
     user: UserPublic,
     plesk_server: PleskServerDomain,
     subscription_id: int,
@@ -130,32 +158,178 @@ async def log_db_plesk_login_link_get(
         ssh_username=user.ssh_username,
         ip=ip,
     )
-    session.add(user_action)
-    session.commit()
+    await AUDIT_LOG_WRITER.enqueue(user_action)
 
 
-async def get_user_log_entries_by_id(
-    session: Session, filters: UserLogFilterSchema, page: int = 1, page_size: int = 10
-) -> PaginatedUserLogListSchema | None:
-    polymorphic_log = with_polymorphic(UsersActivityLog, "*")
+def encode_log_cursor(log: UsersActivityLog) -> str:
+    return urlsafe_b64encode(f"{log.timestamp.isoformat()}|{log.id}".encode()).decode()
+
+
+def decode_log_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Raises ValueError when the cursor wasn't made by encode_log_cursor."""
+    try:
+        timestamp, log_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), UUID(log_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+LOG_CLASSES = UsersActivityLog.__subclasses__()
+
+
+# Filters on a timestamp range rather than a column value
+LOG_RANGE_FILTERS = {"since", "until"}
+
+
+def _build_log_filter_columns() -> Dict[str, Dict[type, Column]]:
+    """Filter name -> {log class: column}, base columns are under UsersActivityLog."""
+    base_columns = UsersActivityLog.__table__.c
+    filter_columns = {}
+    for filter in UserLogFilterSchema.model_fields:
+        if filter in LOG_RANGE_FILTERS:
+            continue
+        if filter in base_columns:
+            filter_columns[filter] = {UsersActivityLog: base_columns[filter]}
+            continue
+        filter_columns[filter] = {
+            log_class: log_class.__table__.c[filter]
+            for log_class in LOG_CLASSES
+            if filter in log_class.__table__.c
+        }
+    return filter_columns
+
+
+LOG_FILTER_COLUMNS = _build_log_filter_columns()
+_LOG_DETAILS_LOADER = selectin_polymorphic(UsersActivityLog, LOG_CLASSES)
+
+
+def _timestamp_range(table: Table, filters: UserLogFilterSchema) -> List[ColumnElement]:
     conditions = []
+    if filters.since is not None:
+        conditions.append(table.c.timestamp >= filters.since)
+    if filters.until is not None:
+        conditions.append(table.c.timestamp < filters.until)
+    return conditions
+
+
+def _join_log_details(
+    query: Select, log_classes: List[type], filters: UserLogFilterSchema
+) -> Select:
+    log_table = UsersActivityLog.__table__
+    for log_class in log_classes:
+        table = log_class.__table__
+        query = query.outerjoin(
+            table,
+            and_(
+                table.c.id == log_table.c.id,
+                table.c.timestamp == log_table.c.timestamp,
+                # Repeated for the details table so its partitions are
+                # pruned as well
+                *_timestamp_range(table, filters),
+            ),
+        )
+    return query
+
 
+def _log_search_conditions(
+    filters: UserLogFilterSchema,
+) -> tuple[List[ColumnElement], List[type]] | None:
+    """
+    WHERE conditions of a log search and the log classes whose subtables
+    they need, None when no log type has all the filtered columns.
+    """
+    conditions = _timestamp_range(UsersActivityLog.__table__, filters)
+    detail_filters = []
+    log_classes = set(LOG_CLASSES)
     for filter, value in filters.model_dump(exclude_none=True).items():
-        for subclass in UsersActivityLog.__subclasses__():
-            mapper = inspect(subclass)
-            if filter in {column.key for column in mapper.column_attrs}:
-                subclass_entity = getattr(polymorphic_log, subclass.__name__)
-                conditions.append(getattr(subclass_entity, filter) == value)
-    query = select(polymorphic_log, User).join(User, polymorphic_log.user_id == User.id)
-    query = query.where(and_(*conditions))
-
-    count_query = select(func.count()).select_from(query.subquery())
-    total_count = session.execute(count_query).scalar()
+        if isinstance(value, dict):
+            # PleskServerDomain dumps as {"name": ...}
+            value = value["name"]
+        if filter in LOG_RANGE_FILTERS:
+            continue
+        columns = LOG_FILTER_COLUMNS[filter]
+        if UsersActivityLog in columns:
+            conditions.append(columns[UsersActivityLog] == value)
+        else:
+            detail_filters.append((columns, value))
+            log_classes &= columns.keys()
+
+    # Only the subtables holding every filtered detail column can match,
+    # the others are left out of the join
+    if not detail_filters:
+        log_classes = set()
+    elif not log_classes:
+        return None
+    # In declaration order, so equal filters give the same SQL and hit the
+    # statement and count caches
+    log_classes = [log_class for log_class in LOG_CLASSES if log_class in log_classes]
+    for columns, value in detail_filters:
+        conditions.append(
+            or_(*(columns[log_class] == value for log_class in log_classes))
+        )
+    return conditions, log_classes
+
+
+def build_user_log_search(filters: UserLogFilterSchema) -> tuple[Select, Select] | None:
+    """
+    The page and count queries of a log search, None when no log type has
+    all the filtered columns.
+    """
+    search = _log_search_conditions(filters)
+    if search is None:
+        return None
+    conditions, log_classes = search
+
+    query = select(UsersActivityLog, User).join(
+        User, UsersActivityLog.user_id == User.id
+    )
+    # Counted without the user join
+    count_query = _join_log_details(select(UsersActivityLog.id), log_classes, filters)
+    query = _join_log_details(query, log_classes, filters)
+    query = query.where(*conditions).order_by(
+        UsersActivityLog.timestamp.desc(), UsersActivityLog.id.desc()
+    )
+    # Details of the page's logs are loaded with one query per log type
+    query = query.options(_LOG_DETAILS_LOADER)
+    return query, count_query.where(*conditions)
+
+
+async def get_user_log_entries_by_id(
+    session: AsyncSession,
+    filters: UserLogFilterSchema,
+    page: int = 1,
+    page_size: int = 10,
+    cursor: str | None = None,
+    count_strategy: CountStrategy = CountStrategy.EXACT,
+) -> PaginatedUserLogListSchema | None:
+    """
+    Logs newest first. With a cursor from a previous page, the page starts
+    right after that page's last log instead of at an offset.
+    """
+    search = build_user_log_search(filters)
+    if search is None:
+        return None
+    query, count_query = search
+
+    total_count, count_strategy = await count_rows(session, count_query, count_strategy)
     if not total_count:
         return None
 
-    query = query.limit(page_size).offset((page - 1) * page_size)
-    actions = session.execute(query).all()
+    if cursor is not None:
+        timestamp, log_id = decode_log_cursor(cursor)
+        query = query.where(
+            tuple_(UsersActivityLog.timestamp, UsersActivityLog.id)
+            < tuple_(timestamp, log_id),
+            # Lets the partitions of later months be pruned
+            UsersActivityLog.timestamp <= timestamp,
+        )
+    else:
+        query = query.offset((page - 1) * page_size)
+    actions = (await session.execute(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(actions) > page_size:
+        actions = actions[:page_size]
+        next_cursor = encode_log_cursor(actions[-1][0])
     results = [
         jsonable_encoder({**user.__dict__, "details": {**log_details.__dict__}})
         for log_details, user in actions
@@ -167,11 +341,59 @@ async def get_user_log_entries_by_id(
         page_size=page_size,
         total_pages=(total_count + page_size - 1) // page_size,
         data=results,
+        next_cursor=next_cursor,
+        count_strategy=count_strategy,
     )
 
 
+def _build_log_export_columns() -> List[ColumnElement]:
+    """
+    The base columns, then each detail column once, read from the subtable
+    the log lives in.
+    """
+    columns = list(UsersActivityLog.__table__.c)
+    detail_columns: Dict[str, List[Column]] = {}
+    for log_class in LOG_CLASSES:
+        for column in log_class.__table__.c:
+            if not column.primary_key:
+                detail_columns.setdefault(column.name, []).append(column)
+    for name, same_name_columns in detail_columns.items():
+        if len(same_name_columns) == 1:
+            columns.append(same_name_columns[0])
+        else:
+            columns.append(func.coalesce(*same_name_columns).label(name))
+    return columns
+
+
+LOG_EXPORT_COLUMNS = _build_log_export_columns()
+
+
+async def iter_user_log_export(
+    session: AsyncSession, filters: UserLogFilterSchema
+) -> AsyncIterator[Sequence[RowMapping]]:
+    """
+    Logs oldest first, as flat rows of LOG_EXPORT_COLUMNS, in partitions of
+    LOG_EXPORT_FETCH_SIZE rows read through a server-side cursor.
+    """
+    search = _log_search_conditions(filters)
+    if search is None:
+        return
+    conditions, _ = search
+    log_table = UsersActivityLog.__table__
+    query = _join_log_details(
+        select(*LOG_EXPORT_COLUMNS).select_from(log_table), LOG_CLASSES, filters
+    )
+    query = (
+        query.where(*conditions)
+        .order_by(log_table.c.timestamp, log_table.c.id)
+        .execution_options(yield_per=settings.LOG_EXPORT_FETCH_SIZE)
+    )
+    result = await session.stream(query)
+    async for partition in result.mappings().partitions():
+        yield partition
+
+
 async def log_plesk_mail_test_get(
-    session: Session,
     user: UserPublic,
     ip: IPv4Address,
     plesk_server: PleskServerDomain,
@@ -185,5 +407,240 @@ async def log_plesk_mail_test_get(
         domain=domain.name,
         new_email_created=new_email_created,
     )
-    session.add(user_action)
+    await AUDIT_LOG_WRITER.enqueue(user_action)
+
+
+JOB_PROGRESS_FAILURES_LIMIT = 100
+
+
+def create_job(
+    *,
+    session: Session,
+    user: UserPublic,
+    ip: IPv4Address,
+    job_type: JobType,
+    items: List[tuple[str, dict]],
+) -> Job:
+    job = Job(user_id=user.id, ip=ip, job_type=job_type)
+    session.add(job)
+    session.flush()
+    session.add_all(
+        JobItem(job_id=job.id, key=key, payload=payload) for key, payload in items
+    )
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def get_job(*, session: Session, job_id: UUID) -> Job | None:
+    return session.get(Job, job_id)
+
+
+def get_pending_job_items(*, session: Session, job_id: UUID) -> List[JobItem]:
+    statement = select(JobItem).where(
+        JobItem.job_id == job_id, JobItem.status == JobItemStatus.PENDING
+    )
+    return list(session.execute(statement).scalars())
+
+
+def _claimable_job_condition(stale_before: datetime):
+    return or_(
+        Job.status == JobStatus.PENDING,
+        and_(
+            Job.status == JobStatus.RUNNING,
+            or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale_before),
+        ),
+    )
+
+
+def claim_job(*, session: Session, job_id: UUID, stale_before: datetime) -> Job | None:
+    """
+    Mark a pending job, or a running job whose heartbeat is older than
+    `stale_before`, as running. The update is conditional so only one
+    worker process can claim a job.
+    """
+    now = datetime.now(timezone.utc)
+    claimed = session.execute(
+        update(Job)
+        .where(Job.id == job_id, _claimable_job_condition(stale_before))
+        .values(
+            status=JobStatus.RUNNING, started_at=now, heartbeat_at=now, finished_at=None
+        )
+    ).rowcount
+    session.commit()
+    return session.get(Job, job_id) if claimed else None
+
+
+def get_claimable_job_ids(*, session: Session, stale_before: datetime) -> List[UUID]:
+    statement = (
+        select(Job.id)
+        .where(_claimable_job_condition(stale_before))
+        .order_by(Job.created_at)
+    )
+    return list(session.execute(statement).scalars())
+
+
+def heartbeat_job(*, session: Session, job_id: UUID) -> JobStatus | None:
+    """Refresh the heartbeat of a running job and return its current status."""
+    session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING)
+        .values(heartbeat_at=datetime.now(timezone.utc))
+    )
+    session.commit()
+    return session.execute(select(Job.status).where(Job.id == job_id)).scalar()
+
+
+def release_job(*, session: Session, job_id: UUID) -> None:
+    """Return a running job to the pending state so any worker can claim it."""
+    session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING)
+        .values(status=JobStatus.PENDING)
+    )
+    session.commit()
+
+
+def finish_job(*, session: Session, job_id: UUID, status: JobStatus) -> None:
+    """Set the final status of a running job, a cancelled job stays cancelled."""
+    session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING)
+        .values(status=status, finished_at=datetime.now(timezone.utc))
+    )
+    session.commit()
+
+
+def cancel_job(*, session: Session, job: Job) -> None:
+    session.execute(
+        update(JobItem)
+        .where(JobItem.job_id == job.id, JobItem.status == JobItemStatus.PENDING)
+        .values(status=JobItemStatus.CANCELLED)
+    )
+    job.status = JobStatus.CANCELLED
+    job.finished_at = datetime.now(timezone.utc)
+    session.commit()
+
+
+def reset_job(*, session: Session, job: Job) -> None:
+    """Return a stopped job and its cancelled items to the pending state."""
+    session.execute(
+        update(JobItem)
+        .where(JobItem.job_id == job.id, JobItem.status == JobItemStatus.CANCELLED)
+        .values(status=JobItemStatus.PENDING)
+    )
+    job.status = JobStatus.PENDING
+    job.finished_at = None
+    session.commit()
+
+
+def checkpoint_job_items(
+    *,
+    session: Session,
+    job_id: UUID,
+    items: List[JobItem],
+    audit_logs: Sequence[UsersActivityLog] = (),
+) -> None:
+    """
+    Persist finished items with their audit log entries in one commit. The
+    items may come from another session, they are added to this one.
+    """
+    now = datetime.now(timezone.utc)
+    for item in items:
+        item.finished_at = now
+    session.add_all(items)
+    session.execute(update(Job).where(Job.id == job_id).values(heartbeat_at=now))
+    if audit_logs:
+        session.add_all(audit_logs)
+        session.flush()
+        session.execute(activity_count_upsert(audit_logs))
     session.commit()
+
+
+def get_job_progress(*, session: Session, job: Job) -> JobProgress:
+    counts = dict(
+        session.execute(
+            select(JobItem.status, func.count())
+            .where(JobItem.job_id == job.id)
+            .group_by(JobItem.status)
+        ).all()
+    )
+    failures = session.execute(
+        select(JobItem.key, JobItem.error)
+        .where(JobItem.job_id == job.id, JobItem.status == JobItemStatus.FAILED)
+        .order_by(JobItem.finished_at)
+        .limit(JOB_PROGRESS_FAILURES_LIMIT)
+    ).all()
+
+    items_per_minute = None
+    if job.started_at:
+        # started_at is reset on resume, so only items finished by the
+        # current run are counted.
+        finished_count = session.execute(
+            select(func.count()).where(
+                JobItem.job_id == job.id, JobItem.finished_at >= job.started_at
+            )
+        ).scalar()
+        finished_at = job.finished_at or datetime.now(timezone.utc)
+        elapsed_minutes = (finished_at - job.started_at).total_seconds() / 60
+        if elapsed_minutes > 0:
+            items_per_minute = round(finished_count / elapsed_minutes, 2)
+
+    items_done = counts.get(JobItemStatus.DONE, 0)
+    items_failed = counts.get(JobItemStatus.FAILED, 0)
+    items_pending = counts.get(JobItemStatus.PENDING, 0)
+    items_cancelled = counts.get(JobItemStatus.CANCELLED, 0)
+    return JobProgress(
+        id=job.id,
+        job_type=job.job_type,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        items_total=items_done + items_failed + items_pending + items_cancelled,
+        items_done=items_done,
+        items_failed=items_failed,
+        items_pending=items_pending,
+        items_cancelled=items_cancelled,
+        items_per_minute=items_per_minute,
+        failures=[JobItemFailure(key=key, error=error) for key, error in failures],
+    )
+
+
+def get_job_items(
+    *,
+    session: Session,
+    job_id: UUID,
+    status: JobItemStatus | None = None,
+    page: int = 1,
+    page_size: int = 10,
+) -> PaginatedJobItemListSchema:
+    conditions = [JobItem.job_id == job_id]
+    if status:
+        conditions.append(JobItem.status == status)
+    total_count = session.execute(
+        select(func.count()).select_from(JobItem).where(*conditions)
+    ).scalar()
+    items = session.execute(
+        select(JobItem)
+        .where(*conditions)
+        .order_by(JobItem.key)
+        .limit(page_size)
+        .offset((page - 1) * page_size)
+    ).scalars()
+    return PaginatedJobItemListSchema(
+        total_count=total_count,
+        page=page,
+        page_size=page_size,
+        total_pages=(total_count + page_size - 1) // page_size,
+        data=[
+            JobItemPublic(
+                key=item.key,
+                status=item.status,
+                result=item.result,
+                error=item.error,
+                finished_at=item.finished_at,
+            )
+            for item in items
+        ],
+    )
@@ -3,6 +3,7 @@ import logging
 from sqlalchemy.orm import Session
 
 from app.core.db import engine, init_db
+from app.db.log_partitions import ensure_log_partitions
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,6 +12,8 @@ logger = logging.getLogger(__name__)
 def init() -> None:
     with Session(engine) as session:
         init_db(session)
+    with engine.begin() as connection:
+        ensure_log_partitions(connection)
 
 
 def main() -> None:
@@ -0,0 +1,168 @@
+import asyncio
+import gzip
+import logging
+import os
+from datetime import date, datetime, timezone
+from typing import List
+
+from fastapi_utils.tasks import repeat_every
+from sqlalchemy import Connection, text
+
+from app.core.config import settings
+from app.core.db import engine
+from app.db.models import UsersActivityLog
+
+# The activity log and its details tables are partitioned by the month of
+# the log timestamp. Partitions of a month are created for every table
+# together and archived together, details before the log they reference.
+LOG_TABLE = UsersActivityLog.__tablename__
+LOG_TABLES = [LOG_TABLE] + [
+    subclass.__tablename__ for subclass in UsersActivityLog.__subclasses__()
+]
+
+# Key of the advisory lock that keeps concurrent maintenance runs, one per
+# worker process, from racing each other
+LOG_PARTITIONS_LOCK_ID = 4700
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(moment: datetime | date) -> date:
+    if isinstance(moment, datetime):
+        moment = moment.astimezone(timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def create_log_partitions(
+    connection: Connection, first_month: date, last_month: date
+) -> None:
+    """Create the missing partitions of every log table from first to last month."""
+    month = month_start(first_month)
+    while month <= last_month:
+        for table in LOG_TABLES:
+            connection.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+                    f"PARTITION OF {table} FOR VALUES "
+                    f"FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+                )
+            )
+        month = add_months(month, 1)
+
+
+def get_log_partition_months(connection: Connection) -> List[date]:
+    names = connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": LOG_TABLE},
+    ).scalars()
+    prefix = f"{LOG_TABLE}_p"
+    return sorted(
+        date(int(name[-6:-2]), int(name[-2:]), 1)
+        for name in names
+        if name.startswith(prefix) and name[len(prefix) :].isdigit()
+    )
+
+
+def _copy_partition(connection: Connection, partition: str, file) -> None:
+    driver_connection = connection.connection.driver_connection
+    with (
+        driver_connection.cursor() as cursor,
+        cursor.copy(f"COPY {partition} TO STDOUT WITH (FORMAT csv, HEADER)") as copy,
+    ):
+        for data in copy:
+            file.write(data)
+
+
+def archive_log_partition(
+    connection: Connection, month: date, archive_dir: str
+) -> None:
+    """
+    Export the partitions of a month to gzipped CSV files in archive_dir,
+    then detach and drop them. Details partitions go first, they reference
+    the log partition.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    tables = LOG_TABLES[1:] + LOG_TABLES[:1]
+    for table in tables:
+        partition = partition_name(table, month)
+        path = os.path.join(archive_dir, f"{partition}.csv.gz")
+        with gzip.open(f"{path}.part", "wb") as file:
+            _copy_partition(connection, partition, file)
+        os.replace(f"{path}.part", path)
+
+    for table in tables:
+        partition = partition_name(table, month)
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+        connection.execute(text(f"DROP TABLE {partition}"))
+
+
+def ensure_log_partitions(connection: Connection, now: datetime | None = None) -> None:
+    """Create the partitions of the current month and LOG_PARTITION_MONTHS_AHEAD."""
+    current_month = month_start(now or datetime.now(timezone.utc))
+    create_log_partitions(
+        connection,
+        current_month,
+        add_months(current_month, settings.LOG_PARTITION_MONTHS_AHEAD),
+    )
+
+
+def _try_lock(connection: Connection) -> bool:
+    return connection.execute(
+        text("SELECT pg_try_advisory_xact_lock(:id)"),
+        {"id": LOG_PARTITIONS_LOCK_ID},
+    ).scalar()
+
+
+def maintain_log_partitions(now: datetime | None = None) -> None:
+    """
+    Create the upcoming partitions and, when LOG_RETENTION_MONTHS is set,
+    archive the months before the retention window, each in a transaction
+    of its own. Skipped while another process holds the maintenance lock.
+    """
+    now = now or datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        if not _try_lock(connection):
+            return
+        ensure_log_partitions(connection, now)
+        months = get_log_partition_months(connection)
+
+    if settings.LOG_RETENTION_MONTHS is None:
+        return
+    oldest_kept = add_months(month_start(now), -settings.LOG_RETENTION_MONTHS)
+    for month in months:
+        if month >= oldest_kept:
+            continue
+        # A failed month doesn't roll back the ones archived before it
+        try:
+            with engine.begin() as connection:
+                if not _try_lock(connection):
+                    return
+                if month not in get_log_partition_months(connection):
+                    continue
+                logger.info(f"Archiving activity logs of {month:%Y-%m}")
+                archive_log_partition(connection, month, settings.LOG_ARCHIVE_DIR)
+        except Exception:
+            logger.exception(f"Failed to archive activity logs of {month:%Y-%m}")
+
+
+@repeat_every(seconds=settings.LOG_PARTITION_MAINTENANCE_SECONDS, logger=logger)
+async def run_log_partition_maintenance() -> None:
+    await asyncio.to_thread(maintain_log_partitions)
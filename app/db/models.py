@@ -1,11 +1,32 @@
 import uuid
 
-from sqlalchemy import ForeignKey, String, UUID, Boolean, Enum, DateTime, func, Integer
+from sqlalchemy import (
+    BigInteger,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Index,
+    String,
+    UUID,
+    Boolean,
+    Enum,
+    Date,
+    DateTime,
+    func,
+    Integer,
+    JSON,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 import sqlalchemy.types as types
-from datetime import datetime
+from datetime import date, datetime, timezone
 
-from app.schemas import UserRoles, UserActionType, IPv4Address
+from app.schemas import (
+    UserRoles,
+    UserActionType,
+    IPv4Address,
+    JobType,
+    JobStatus,
+    JobItemStatus,
+)
 
 
 class Base(DeclarativeBase):
@@ -30,6 +51,18 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String, nullable=False)
 
 
+class UserVersion(Base):
+    """
+    Single row counter bumped with every change to users, workers drop
+    their cached users when it moves.
+    """
+
+    __tablename__ = "user_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
 class IPv4AddressType(types.TypeDecorator):
     """Custom SQLAlchemy type to store IPv4Address as a string."""
 
@@ -49,6 +82,22 @@ class IPv4AddressType(types.TypeDecorator):
         return value
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _log_details_table_args() -> tuple:
+    """Details rows reference their log by its whole key and are partitioned like it."""
+    return (
+        ForeignKeyConstraint(
+            ["id", "timestamp"],
+            ["log_user_activity.id", "log_user_activity.timestamp"],
+            ondelete="CASCADE",
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+
 class UsersActivityLog(Base):
     __tablename__ = "log_user_activity"
 
@@ -60,14 +109,36 @@ class UsersActivityLog(Base):
     )
     ip: Mapped[IPv4AddressType] = mapped_column(IPv4AddressType, nullable=False)
 
+    # Part of the key as the log tables are partitioned by its month. Set
+    # on insert so the log and details rows get the same value.
     timestamp: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True),
+        primary_key=True,
+        default=_utcnow,
+        server_default=func.now(),
     )
 
     log_type: Mapped[UserActionType] = mapped_column(
         Enum(UserActionType), nullable=False
     )
 
+    # Domain of the log types that have one, kept here rather than in each
+    # details table so a domain's history is read from one index
+    domain: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    # Log searches are paged by (timestamp, id), newest first
+    __table_args__ = (
+        Index("ix_log_user_activity_timestamp_id", "timestamp", "id"),
+        Index(
+            "ix_log_user_activity_user_id_timestamp_id", "user_id", "timestamp", "id"
+        ),
+        Index(
+            "ix_log_user_activity_log_type_timestamp_id", "log_type", "timestamp", "id"
+        ),
+        Index("ix_log_user_activity_ip", "ip"),
+        Index("ix_log_user_activity_domain_timestamp_id", "domain", "timestamp", "id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
     __mapper_args__ = {
         "polymorphic_identity": "activity_log",
         "polymorphic_on": "log_type",
@@ -77,57 +148,55 @@ class UsersActivityLog(Base):
 class DeleteZonemasterLog(UsersActivityLog):
     __tablename__ = "log_zone_master_delete"
 
-    id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
-        ForeignKey("log_user_activity.id", ondelete="CASCADE"),
-        primary_key=True,
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
-    domain: Mapped[str] = mapped_column(String, nullable=False)
-    current_zone_master: Mapped[str] = mapped_column(String, nullable=False)
+    # Empty when the domain had no zone to delete
+    current_zone_master: Mapped[str | None] = mapped_column(String, nullable=True)
 
+    __table_args__ = _log_details_table_args()
     __mapper_args__ = {"polymorphic_identity": UserActionType.DELETE_ZONE_MASTER}
 
 
 class SetZoneMasterLog(UsersActivityLog):
     __tablename__ = "log_zone_master_set"
 
-    id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
-        ForeignKey("log_user_activity.id", ondelete="CASCADE"),
-        primary_key=True,
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
     current_zone_master: Mapped[str | None] = mapped_column(String, nullable=True)
     target_zone_master: Mapped[str] = mapped_column(String, nullable=False)
-    domain: Mapped[str] = mapped_column(String, nullable=False)
 
+    __table_args__ = _log_details_table_args()
     __mapper_args__ = {"polymorphic_identity": UserActionType.SET_ZONE_MASTER}
 
 
 class GetZoneMasterLog(UsersActivityLog):
     __tablename__ = "log_zone_master_get"
 
-    id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
-        ForeignKey("log_user_activity.id", ondelete="CASCADE"),
-        primary_key=True,
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
-    domain: Mapped[str] = mapped_column(String, nullable=False)
 
+    __table_args__ = _log_details_table_args()
     __mapper_args__ = {"polymorphic_identity": UserActionType.GET_ZONE_MASTER}
 
 
 class GetPleskLoginLinkLog(UsersActivityLog):
     __tablename__ = "log_plesk_subscription_login"
 
-    id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
-        ForeignKey("log_user_activity.id", ondelete="CASCADE"),
-        primary_key=True,
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
-    plesk_server: Mapped[str] = mapped_column(String, nullable=False)
-    ssh_username: Mapped[str] = mapped_column(String, nullable=False)
-    subscription_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    plesk_server: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    ssh_username: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    subscription_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
 
+    __table_args__ = _log_details_table_args()
     __mapper_args__ = {
         "polymorphic_identity": UserActionType.GET_SUBSCRIPTION_LOGIN_LINK
     }
@@ -136,14 +205,87 @@ class GetPleskLoginLinkLog(UsersActivityLog):
 class PleskMailGetTestMailLog(UsersActivityLog):
     __tablename__ = "log_plesk_mail_get_test_mail"
 
-    id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
-        ForeignKey("log_user_activity.id", ondelete="CASCADE"),
-        primary_key=True,
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
-    plesk_server: Mapped[str] = mapped_column(String, nullable=False)
-    domain: Mapped[str] = mapped_column(String, nullable=False)
+    plesk_server: Mapped[str] = mapped_column(String, nullable=False, index=True)
     new_email_created: Mapped[Boolean] = mapped_column(
         Boolean, default=True, nullable=False
     )
+    __table_args__ = _log_details_table_args()
     __mapper_args__ = {"polymorphic_identity": UserActionType.PLESK_MAIL_GET_TEST_MAIL}
+
+
+class ActivityDailyCount(Base):
+    """
+    Number of activity logs per UTC day, user, log type and Plesk server,
+    kept up to date by the log write paths. Outlives archived log partitions.
+    """
+
+    __tablename__ = "log_activity_daily_count"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("user.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    log_type: Mapped[UserActionType] = mapped_column(
+        Enum(UserActionType), primary_key=True
+    )
+    # Empty for log types without a server
+    plesk_server: Mapped[str] = mapped_column(String, primary_key=True, default="")
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class Job(Base):
+    __tablename__ = "job"
+
+    id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    user_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+    )
+    ip: Mapped[IPv4AddressType] = mapped_column(IPv4AddressType, nullable=False)
+    job_type: Mapped[JobType] = mapped_column(Enum(JobType), nullable=False)
+    status: Mapped[JobStatus] = mapped_column(
+        Enum(JobStatus), default=JobStatus.PENDING, nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    started_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    heartbeat_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+
+class JobItem(Base):
+    __tablename__ = "job_item"
+
+    id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    job_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("job.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    key: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    status: Mapped[JobItemStatus] = mapped_column(
+        Enum(JobItemStatus), default=JobItemStatus.PENDING, nullable=False
+    )
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
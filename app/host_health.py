@@ -0,0 +1,163 @@
+import os
+import statistics
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, List
+
+from app.core.config import settings
+
+SSH_CONNECTION_ERROR_CODE = 255
+HOST_CIRCUIT_DIR = os.path.join(tempfile.gettempdir(), "ssh-host-circuits")
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class HostHealth:
+    host: str
+    state: CircuitState = CircuitState.CLOSED
+    consecutive_failures: int = 0
+    last_success: float | None = None
+    last_failure: float | None = None
+    opened_at: float | None = None
+    latencies_ms: deque[float] = field(
+        default_factory=lambda: deque(maxlen=settings.HOST_HEALTH_LATENCY_WINDOW)
+    )
+
+    @property
+    def rolling_latency_ms(self) -> float | None:
+        return statistics.median(self.latencies_ms) if self.latencies_ms else None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "last_success": self.last_success,
+            "last_failure": self.last_failure,
+            "rolling_latency_ms": self.rolling_latency_ms,
+        }
+
+
+class HostHealthRegistry:
+    """
+    Per host SSH health with a circuit breaker. After
+    HOST_CIRCUIT_FAILURE_THRESHOLD consecutive connection failures a host's
+    circuit opens and requests to it are refused. Every
+    HOST_CIRCUIT_COOLDOWN_SECONDS one request is let through as a half-open
+    probe, its success closes the circuit again.
+
+    With a `circuit_dir` open circuits are shared by every worker of the
+    container: a marker file per host is created when its circuit opens,
+    touched when a probe is let through and removed when it closes.
+    """
+
+    def __init__(self, circuit_dir: str | None = None):
+        self.circuit_dir = circuit_dir
+        self._hosts: Dict[str, HostHealth] = {}
+
+    def _get(self, host: str) -> HostHealth:
+        if host not in self._hosts:
+            self._hosts[host] = HostHealth(host)
+        return self._hosts[host]
+
+    def _circuit_marker(self, host: str) -> str:
+        return os.path.join(self.circuit_dir, host)
+
+    def _share_open(self, health: HostHealth) -> None:
+        if self.circuit_dir is None:
+            return
+        marker = self._circuit_marker(health.host)
+        try:
+            open(marker, "a").close()
+        except FileNotFoundError:
+            os.makedirs(self.circuit_dir, exist_ok=True)
+            open(marker, "a").close()
+        os.utime(marker, (health.opened_at, health.opened_at))
+        # Read back, the file system may round the time
+        health.opened_at = os.path.getmtime(marker)
+
+    def _share_closed(self, host: str) -> None:
+        if self.circuit_dir is None:
+            return
+        try:
+            os.unlink(self._circuit_marker(host))
+        except FileNotFoundError:
+            pass
+
+    def _sync(self, health: HostHealth) -> None:
+        """Take over circuit changes made by other workers."""
+        if self.circuit_dir is None:
+            return
+        try:
+            opened_at = os.path.getmtime(self._circuit_marker(health.host))
+        except FileNotFoundError:
+            opened_at = None
+        if opened_at is None and health.state != CircuitState.CLOSED:
+            health.state = CircuitState.CLOSED
+            health.consecutive_failures = 0
+            health.opened_at = None
+        elif opened_at is not None and opened_at != health.opened_at:
+            health.state = CircuitState.OPEN
+            health.opened_at = opened_at
+
+    def allow_request(self, host: str) -> bool:
+        health = self._get(host)
+        self._sync(health)
+        if health.state == CircuitState.CLOSED:
+            return True
+        if time.time() - health.opened_at < settings.HOST_CIRCUIT_COOLDOWN_SECONDS:
+            return False
+        # Re-armed so a probe that never reports back doesn't block the host,
+        # and so the other workers wait for this probe
+        health.state = CircuitState.HALF_OPEN
+        health.opened_at = time.time()
+        self._share_open(health)
+        return True
+
+    def record_success(self, host: str, latency_ms: float) -> None:
+        health = self._get(host)
+        # Also closes a circuit another worker opened meanwhile
+        self._share_closed(host)
+        health.state = CircuitState.CLOSED
+        health.consecutive_failures = 0
+        health.opened_at = None
+        health.last_success = time.time()
+        health.latencies_ms.append(latency_ms)
+
+    def record_failure(self, host: str) -> None:
+        health = self._get(host)
+        health.consecutive_failures += 1
+        health.last_failure = time.time()
+        if (
+            health.state == CircuitState.HALF_OPEN
+            or health.consecutive_failures >= settings.HOST_CIRCUIT_FAILURE_THRESHOLD
+        ):
+            health.state = CircuitState.OPEN
+            health.opened_at = time.time()
+            self._share_open(health)
+
+    def record_result(
+        self, host: str, returncode: int | None, latency_ms: float
+    ) -> None:
+        """
+        Record a command outcome. Only ssh's own exit code counts as a host
+        failure, remote commands failing on a reachable host don't.
+        """
+        if returncode == SSH_CONNECTION_ERROR_CODE:
+            self.record_failure(host)
+        else:
+            self.record_success(host, latency_ms)
+
+    def snapshot(self) -> List[HostHealth]:
+        return list(self._hosts.values())
+
+
+HOST_HEALTH = HostHealthRegistry(HOST_CIRCUIT_DIR)
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from typing import Awaitable, Callable, Dict, List, TypeVar
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.db.crud import (
+    checkpoint_job_items,
+    claim_job,
+    finish_job,
+    get_claimable_job_ids,
+    get_pending_job_items,
+    heartbeat_job,
+    release_job,
+)
+from app.db.models import Job, JobItem, UsersActivityLog
+from app.schemas import JobItemStatus, JobStatus, JobType
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class ItemOutcome:
+    """Result of a job item. Items with an error are marked failed."""
+
+    result: dict | None = None
+    error: str | None = None
+    audit_log: UsersActivityLog | None = None
+
+
+@dataclass
+class JobHandler:
+    """
+    Processes the items of a job type. Items are grouped by `group_by` and
+    passed to `run_batch` in batches of up to `batch_size`, at most
+    `concurrency` batches of a job run at the same time.
+    """
+
+    run_batch: Callable[[Job, List[JobItem]], Awaitable[Dict[str, ItemOutcome]]]
+    group_by: Callable[[JobItem], str] = lambda item: ""
+    batch_size: int = 1
+    concurrency: int = 1
+
+
+JOB_HANDLERS: Dict[JobType, JobHandler] = {}
+
+
+def register_job_handler(job_type: JobType, handler: JobHandler) -> None:
+    JOB_HANDLERS[job_type] = handler
+
+
+def _heartbeat_deadline() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(
+        seconds=settings.JOB_HEARTBEAT_TIMEOUT_SECONDS
+    )
+
+
+def _batch_job_items(handler: JobHandler, items: List[JobItem]) -> List[List[JobItem]]:
+    batches = []
+    for _, group_items in groupby(
+        sorted(items, key=handler.group_by), key=handler.group_by
+    ):
+        group_items = list(group_items)
+        for i in range(0, len(group_items), handler.batch_size):
+            batches.append(group_items[i : i + handler.batch_size])
+    return batches
+
+
+def _in_session(function: Callable[..., T], **kwargs) -> Awaitable[T]:
+    """
+    Run a crud function with its own session in a worker thread, so
+    concurrent batches don't share a session or block the event loop.
+    """
+
+    def call() -> T:
+        with Session(engine, expire_on_commit=False) as session:
+            return function(session=session, **kwargs)
+
+    return asyncio.to_thread(call)
+
+
+async def _run_batch(job: Job, handler: JobHandler, items: List[JobItem]) -> None:
+    try:
+        outcomes = await handler.run_batch(job, items)
+    except Exception as e:
+        logger.exception(f"Job {job.id} batch failed")
+        outcomes = {item.key: ItemOutcome(error=str(e)) for item in items}
+
+    audit_logs = []
+    for item in items:
+        outcome = outcomes.get(item.key) or ItemOutcome(error="No result")
+        item.result = outcome.result
+        item.error = outcome.error
+        item.status = JobItemStatus.FAILED if outcome.error else JobItemStatus.DONE
+        if outcome.audit_log is not None and not outcome.error:
+            audit_logs.append(outcome.audit_log)
+    await _in_session(
+        checkpoint_job_items, job_id=job.id, items=items, audit_logs=audit_logs
+    )
+
+
+async def run_job(job: Job, stop: asyncio.Event) -> None:
+    """
+    Run the pending items of a claimed job. Every finished batch is
+    committed, so an interrupted job resumes with the remaining items.
+    Once `stop` is set no further batch starts, the ones already started
+    run to completion and are committed.
+    """
+    handler = JOB_HANDLERS[job.job_type]
+    semaphore = asyncio.Semaphore(handler.concurrency)
+
+    async def run_limited(items: List[JobItem]) -> None:
+        async with semaphore:
+            if stop.is_set():
+                return
+            await _run_batch(job, handler, items)
+
+    pending_items = await _in_session(get_pending_job_items, job_id=job.id)
+    await asyncio.gather(
+        *(run_limited(items) for items in _batch_job_items(handler, pending_items))
+    )
+
+
+class JobQueue:
+    """
+    In-process worker pool for jobs persisted in the job table. Each API
+    worker process runs its own pool, a job is run by the process that
+    claims it first. Jobs released by a stopping process, or abandoned by a
+    crashed one once their heartbeat expires, are picked up by the periodic
+    recovery of any process.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue[UUID] = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[UUID, asyncio.Event] = {}
+        self._stopping = False
+
+    async def start(self, workers: int) -> None:
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._work()) for _ in range(workers)]
+        self._workers.append(asyncio.create_task(self._recover()))
+
+    async def stop(self) -> None:
+        """
+        Let the running jobs finish their started batches and hand the rest
+        over to the other processes.
+        """
+        self._stopping = True
+        for stop in self._running.values():
+            stop.set()
+        while self._running:
+            await asyncio.sleep(0.01)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, job_id: UUID) -> None:
+        self._queue.put_nowait(job_id)
+
+    def is_running(self, job_id: UUID) -> bool:
+        return job_id in self._running
+
+    def cancel(self, job_id: UUID) -> None:
+        """
+        Stop a job running in this process once its started batches are
+        done. Processes running other jobs notice the cancelled status on
+        their next heartbeat.
+        """
+        if job_id in self._running:
+            self._running[job_id].set()
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception(f"Job {job_id} failed")
+
+    async def _run(self, job_id: UUID) -> None:
+        if self._stopping or job_id in self._running:
+            return
+        job = await _in_session(
+            claim_job, job_id=job_id, stale_before=_heartbeat_deadline()
+        )
+        if job is None:
+            return
+        stop = asyncio.Event()
+        self._running[job_id] = stop
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, stop))
+        try:
+            await run_job(job, stop)
+        except Exception:
+            await _in_session(finish_job, job_id=job_id, status=JobStatus.FAILED)
+            raise
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+        if self._stopping:
+            # The remaining items are picked up by the other processes
+            await _in_session(release_job, job_id=job_id)
+        else:
+            # A cancelled job stays cancelled
+            await _in_session(finish_job, job_id=job_id, status=JobStatus.COMPLETED)
+
+    async def _recover(self) -> None:
+        while True:
+            job_ids = await _in_session(
+                get_claimable_job_ids, stale_before=_heartbeat_deadline()
+            )
+            for job_id in job_ids:
+                if not self.is_running(job_id):
+                    self.enqueue(job_id)
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL_SECONDS)
+
+    async def _heartbeat(self, job_id: UUID, stop: asyncio.Event) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL_SECONDS)
+            status = await _in_session(heartbeat_job, job_id=job_id)
+            if status != JobStatus.RUNNING:
+                stop.set()
+                return
+
+
+JOB_QUEUE = JobQueue()
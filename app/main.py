@@ -6,12 +6,22 @@ from starlette.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.ssh_warmup import ssh_warmup
+from app.core.db import async_engine
+from app.audit_log_writer import AUDIT_LOG_WRITER
+from app.ssh_warmup import SSH_KEEPALIVE
+from app.ssh_broker_client import SSH_BROKER_CLIENT
+from app.ssh_sessions import SSH_SESSIONS
 from app.api.users import users_router as users
 from app.api.auth import password_reset, auth_router as login
 from app.api.dns import dns_router as dns
+from app.api.domains import domains_router as domains
 from app.api.plesk import plesk_router as plesk
+from app.api.jobs import jobs_router as jobs
 from app.api import utils_router as utils
+from app.api.plesk.plesk_db import PLESK_DB
+from app.api.plesk.mailbox_index import refresh_mailbox_index
+from app.db.log_partitions import run_log_partition_maintenance
+from app.job_queue import JOB_QUEUE
 from app.logger import setup_uvicorn_logger, setup_actios_logger
 
 
@@ -27,10 +37,21 @@ if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
 async def lifespan(app: FastAPI):
     setup_uvicorn_logger()
     setup_actios_logger()
-    await ssh_warmup()
+    await run_log_partition_maintenance()
+    AUDIT_LOG_WRITER.start()
+    if not SSH_BROKER_CLIENT.is_enabled:
+        # Otherwise the broker keeps its own sockets alive
+        SSH_KEEPALIVE.start()
+    await refresh_mailbox_index()
+    await JOB_QUEUE.start(settings.JOB_WORKERS)
     yield
-
-
+    await JOB_QUEUE.stop()
+    await SSH_KEEPALIVE.stop()
+    await SSH_BROKER_CLIENT.close()
+    await SSH_SESSIONS.close()
+    await PLESK_DB.close()
+    await AUDIT_LOG_WRITER.stop()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -54,8 +75,10 @@ if settings.all_cors_origins:
 api_router = APIRouter(prefix=settings.API_V1_STR)
 
 api_router.include_router(dns.router)
+api_router.include_router(domains.router)
 api_router.include_router(users.router)
 api_router.include_router(plesk.router)
+api_router.include_router(jobs.router)
 api_router.include_router(utils.router)
 api_router.include_router(password_reset.router)
 api_router.include_router(login.router)
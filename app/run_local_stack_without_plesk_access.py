@@ -8,7 +8,6 @@ from app.main import api_router
 from app.core.config import settings
 from tests.utils.container_db_utils import TestMariadb, TEST_DB_CMD
 from tests.utils.container_unix_utils import UnixContainer
-from app.schemas import PleskServerDomain
 from app.logger import setup_uvicorn_logger, setup_actios_logger
 
 TEST_SSH_HOST = "plesk.example.com"
@@ -59,7 +58,7 @@ def mock_batch_ssh(command: str):
     return [{"host": TEST_SSH_HOST, "stdout": stdout}]
 
 
-def mock_batch_ssh_ns(command: str):
+def mock_batch_ssh_ns(command: str, max_lines: int | None = None):
     stdout = linux_container.run_cmd(command)
     return [{"host": TEST_SSH_HOST, "stdout": stdout}]
 
@@ -69,7 +68,7 @@ def mock_get_plesk_subscription_login_link_by_id(arg1, arg2, arg3):
 
 
 def mock_dns_get_domain_zone_master(domain: str):
-    return PleskServerDomain(name=TEST_SSH_HOST)
+    return TEST_SSH_HOST
 
 
 get_zone_master_patches = [
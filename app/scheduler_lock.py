@@ -0,0 +1,33 @@
+import fcntl
+
+
+class SchedulerLock:
+    """
+    Non-blocking exclusive file lock electing the one API worker that runs a
+    periodic job. The lock is held until released or until the process
+    exits, the other workers retry taking it in case the holder goes away.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @property
+    def is_held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        if self._file is None:
+            lock_file = open(self.path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._file = lock_file
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
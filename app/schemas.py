@@ -15,7 +15,7 @@ from pydantic.json_schema import SkipJsonSchema
 from enum import Enum
 from typing import List, Literal, Any
 from typing_extensions import Annotated
-from datetime import datetime
+from datetime import date, datetime
 from pydantic.networks import IPvAnyAddress
 from app.core.config import settings
 
@@ -112,9 +112,24 @@ class UserPublic(UserBase):
     id: uuid.UUID
 
 
+class CountStrategy(str, Enum):
+    # COUNT over the matching rows
+    EXACT = "exact"
+    # Exact count kept per filter combination for COUNT_CACHE_TTL_SECONDS
+    CACHED = "cached"
+    # Planner row estimate, exact below COUNT_ESTIMATE_MIN_ROWS
+    ESTIMATED = "estimated"
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
 class UsersPublic(BaseModel):
     data: list[UserPublic]
     count: int
+    count_strategy: CountStrategy = CountStrategy.EXACT
 
 
 class UpdatePassword(BaseModel):
@@ -151,7 +166,7 @@ class DomainName(BaseModel):
     def validate_ip_input(cls, data: Any) -> Any:
         """Convert string inputs to proper dict structure."""
         if isinstance(data, str):
-            return {"domain": data}
+            return {"name": data}
         return data
 
     @model_serializer(mode="wrap")
@@ -266,6 +281,67 @@ class UserActionType(str, Enum):
     PLESK_MAIL_GET_TEST_MAIL = "PLESK_MAIL_GET_TEST_MAIL"
 
 
+class JobType(str, Enum):
+    ZONE_MASTER_MIGRATION = "ZONE_MASTER_MIGRATION"
+    ZONE_MASTER_REMOVAL = "ZONE_MASTER_REMOVAL"
+
+
+class JobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+class JobItemStatus(str, Enum):
+    PENDING = "PENDING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+class JobItemFailure(BaseModel):
+    key: str
+    error: str
+
+
+class JobProgress(BaseModel):
+    id: uuid.UUID
+    job_type: JobType
+    status: JobStatus
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+    items_total: int
+    items_done: int
+    items_failed: int
+    items_pending: int
+    items_cancelled: int
+    items_per_minute: float | None
+    failures: List[JobItemFailure]
+
+
+class ZoneMasterRemovalInput(BaseModel):
+    domains: Annotated[List[ValidatedDomainName], Field(min_length=1, max_length=10000)]
+
+
+class JobItemPublic(BaseModel):
+    key: str
+    status: JobItemStatus
+    result: dict | None
+    error: str | None
+    finished_at: datetime | None
+
+
+class PaginatedJobItemListSchema(BaseModel):
+    total_count: int
+    page: int
+    page_size: int = Field(default=10, ge=1, le=100)
+    total_pages: int
+    data: List[JobItemPublic]
+
+
 class UserLogBaseSchema(BaseModel):
     ip: IPv4Address
     timestamp: datetime
@@ -273,7 +349,7 @@ class UserLogBaseSchema(BaseModel):
 
 class DeleteZonemasterLogSchema(UserLogBaseSchema):
     domain: DomainName
-    current_zone_master: str
+    current_zone_master: str | None
     log_type: Literal[UserActionType.DELETE_ZONE_MASTER]
 
 
@@ -296,6 +372,13 @@ class GetPleskLoginLinkLogSchema(UserLogBaseSchema):
     ssh_username: LinuxUsername
 
 
+class PleskMailGetTestMailLogSchema(UserLogBaseSchema):
+    plesk_server: PleskServerDomain
+    domain: DomainName
+    new_email_created: bool
+    log_type: Literal[UserActionType.PLESK_MAIL_GET_TEST_MAIL]
+
+
 class UserLogPublic(UserPublic):
     email: SkipJsonSchema[EmailStr] = Field(exclude=True)
     is_active: SkipJsonSchema[bool] = Field(default=False, exclude=True)
@@ -305,12 +388,16 @@ class UserLogPublic(UserPublic):
         | SetZoneMasterLogSchema
         | GetZoneMasterLogSchema
         | GetPleskLoginLinkLogSchema
+        | PleskMailGetTestMailLogSchema
     ) = Field(discriminator="log_type")
 
 
 class UserActivityLogFilterSchema(BaseModel):
     ip: IPv4Address | None = None
     timestamp: datetime | None = None
+    # Logs from `since` up to, not including, `until`
+    since: datetime | None = None
+    until: datetime | None = None
     log_type: UserActionType | None = None
     domain: DomainName | None = None
     plesk_server: PleskServerDomain | None = None
@@ -328,20 +415,62 @@ class PaginatedUserLogListSchema(BaseModel):
     page_size: int = Field(default=10, ge=1, le=100)
     total_pages: int
     data: List[UserLogPublic]
+    # Pass as `cursor` to get the next page, None on the last page
+    next_cursor: str | None = None
+    count_strategy: CountStrategy = CountStrategy.EXACT
 
 
 class UserLogSearchRequestSchema(BaseModel):
     page: int = Field(default=1)
     page_size: int = Field(default=10, ge=1, le=100)
+    # next_cursor of the previous page, `page` is not used for the offset
+    # when it is set
+    cursor: str | None = None
+    count_strategy: CountStrategy = CountStrategy.CACHED
     filters: UserActivityLogFilterSchema
 
 
+class AnalyticsBucket(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class AnalyticsGroupBy(str, Enum):
+    USER = "user"
+    SERVER = "server"
+
+
+class ActivityCountSchema(BaseModel):
+    # First day of the bucket
+    bucket: date
+    log_type: UserActionType
+    # Set when grouped by them
+    user_id: uuid.UUID | None = None
+    plesk_server: str | None = None
+    count: int
+
+
+class ActivityAnalyticsSchema(BaseModel):
+    bucket: AnalyticsBucket
+    data: List[ActivityCountSchema]
+
+
 class SuperUserUpdateMe(BaseModel):
     full_name: str | None = Field(default=None, max_length=255)
     email: EmailStr | None = Field(default=None, max_length=255)
     ssh_username: str | None = Field(default=None, max_length=33)
 
 
+class HostHealthPublic(BaseModel):
+    host: str
+    state: str
+    consecutive_failures: int
+    last_success: datetime | None
+    last_failure: datetime | None
+    rolling_latency_ms: float | None
+
+
 class HostIpData(BaseModel):
     name: ValidatedDomainName
     ips: List[IPv4Address]
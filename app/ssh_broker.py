@@ -0,0 +1,133 @@
+"""
+SSH broker shared by the API workers. It owns the ControlMaster sockets,
+the host health registry and the keep-alive scheduler, so the fleet sees
+one set of connections no matter how many workers run.
+
+Run with `python -m app.ssh_broker`, workers reach it over SSH_BROKER_SOCKET.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict
+
+from app.AsyncSSHandler import _execute_with_circuit_breaker
+from app.core.config import settings
+from app.host_health import HOST_HEALTH
+from app.ssh_broker_client import (
+    SSH_BROKER_CLIENT,
+    SshBrokerError,
+    read_frame,
+    write_frame,
+)
+from app.ssh_sessions import SSH_SESSIONS
+from app.ssh_warmup import SSH_KEEPALIVE
+
+
+class SshBrokerServer:
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.commands_executed = 0
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._server: asyncio.AbstractServer | None = None
+
+    async def _exec(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.commands_executed += 1
+        result = await _execute_with_circuit_breaker(
+            request["host"],
+            request["command"],
+            request.get("verbose", False),
+            request.get("max_lines"),
+            request.get("max_bytes"),
+        )
+        return {**result.to_dict(), "truncated": result.truncated}
+
+    async def _handle_request(self, request: Dict[str, Any]) -> Any:
+        op = request.get("op")
+        if op == "exec":
+            return await self._exec(request)
+        if op == "health":
+            return [health.summary() for health in HOST_HEALTH.snapshot()]
+        if op == "stats":
+            return {
+                "commands_executed": self.commands_executed,
+                "clients": len(self._writers),
+            }
+        raise SshBrokerError(f"Unknown operation: {op}")
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, lock: asyncio.Lock, request: Dict[str, Any]
+    ) -> None:
+        try:
+            response = {
+                "id": request["id"],
+                "result": await self._handle_request(request),
+            }
+        except Exception as e:
+            response = {"id": request["id"], "error": f"{type(e).__name__}: {e}"}
+        try:
+            await write_frame(writer, lock, response)
+        except ConnectionError:
+            pass
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                request = await read_frame(reader)
+                task = asyncio.create_task(self._respond(writer, lock, request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, SshBrokerError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def start(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path
+        )
+        os.chmod(self.socket_path, 0o600)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+async def serve_forever(socket_path: str) -> None:
+    server = SshBrokerServer(socket_path)
+    await server.start()
+    SSH_KEEPALIVE.start()
+    print(f"SSH broker listening on {socket_path}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await SSH_KEEPALIVE.stop()
+        await server.stop()
+        await SSH_SESSIONS.close()
+
+
+def main() -> None:
+    if settings.SSH_BROKER_SOCKET is None:
+        raise SystemExit("SSH_BROKER_SOCKET is not set")
+    # The broker runs the commands its clients send, never forwards them
+    SSH_BROKER_CLIENT.disable()
+    asyncio.run(serve_forever(settings.SSH_BROKER_SOCKET))
+
+
+if __name__ == "__main__":
+    main()
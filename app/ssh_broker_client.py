@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import json
+import struct
+from typing import Any, Dict
+
+from app.core.config import settings
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class SshBrokerError(Exception):
+    """Raised when the SSH broker can't be reached or rejects a request"""
+
+    pass
+
+
+class SshBrokerResponseError(SshBrokerError):
+    """
+    Raised when a request reached the SSH broker but no result came back,
+    the command may have run and must not be retried blindly
+    """
+
+    pass
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """Read a frame: a 4 byte big endian payload length and a JSON payload."""
+    (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise SshBrokerError(f"Frame of {length} bytes exceeds the size limit")
+    return json.loads(await reader.readexactly(length))
+
+
+async def write_frame(
+    writer: asyncio.StreamWriter, lock: asyncio.Lock, message: Dict[str, Any]
+) -> None:
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    async with lock:
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        await writer.drain()
+
+
+class SshBrokerClient:
+    """
+    Worker side of the SSH broker. Requests are multiplexed over a single
+    Unix socket connection and matched to responses by id.
+    """
+
+    def __init__(self):
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._write_lock: asyncio.Lock | None = None
+        self._connect_lock = asyncio.Lock()
+        self._reader_task: asyncio.Task | None = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._disabled = False
+
+    @property
+    def is_enabled(self) -> bool:
+        return not self._disabled and settings.SSH_BROKER_SOCKET is not None
+
+    def disable(self) -> None:
+        """Used by the broker itself, which runs commands directly."""
+        self._disabled = True
+
+    async def _connect(self) -> tuple[asyncio.StreamWriter, asyncio.Lock]:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                try:
+                    self._reader, self._writer = await asyncio.open_unix_connection(
+                        settings.SSH_BROKER_SOCKET
+                    )
+                except OSError as e:
+                    raise SshBrokerError(f"SSH broker is unavailable: {e}") from e
+                self._write_lock = asyncio.Lock()
+                self._reader_task = asyncio.create_task(
+                    self._read_responses(self._reader)
+                )
+            return self._writer, self._write_lock
+
+    async def _read_responses(self, reader: asyncio.StreamReader) -> None:
+        error = SshBrokerResponseError("SSH broker connection closed")
+        try:
+            while True:
+                response = await read_frame(reader)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(SshBrokerResponseError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        except (asyncio.IncompleteReadError, ConnectionError, SshBrokerError) as e:
+            error = SshBrokerResponseError(f"SSH broker connection lost: {e}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def request(self, op: str, **params: Any) -> Any:
+        writer, write_lock = await self._connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await write_frame(
+                writer, write_lock, {"id": request_id, "op": op, **params}
+            )
+        except ConnectionError as e:
+            self._pending.pop(request_id, None)
+            raise SshBrokerError(f"SSH broker connection lost: {e}") from e
+        return await future
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+
+SSH_BROKER_CLIENT = SshBrokerClient()
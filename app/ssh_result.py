@@ -0,0 +1,170 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, TypedDict
+
+_UNDECODED = object()
+_FIELDS = ("host", "stdout", "stderr", "returncode")
+
+
+class SSHCommandResult(TypedDict):
+    host: str
+    stdout: str | None
+    stderr: str | None
+    returncode: int | None
+
+
+def _decode(output: bytes | str | None) -> str | None:
+    if output is None:
+        return None
+    if isinstance(output, bytes):
+        output = output.decode()
+    output = output.strip()
+    return output if output else None
+
+
+class SSHResult:
+    """
+    Outcome of a command on a host. Output is kept as received and decoded
+    and stripped once, on first access.
+    """
+
+    __slots__ = (
+        "host",
+        "returncode",
+        "elapsed",
+        "truncated",
+        "_raw_stdout",
+        "_raw_stderr",
+        "_stdout",
+        "_stderr",
+    )
+
+    def __init__(
+        self,
+        host: str,
+        stdout: bytes | str | None,
+        stderr: bytes | str | None,
+        returncode: int | None,
+        elapsed: float | None = None,
+        truncated: bool = False,
+    ):
+        self.host = host
+        self.returncode = returncode
+        self.elapsed = elapsed
+        self.truncated = truncated
+        self._raw_stdout = stdout
+        self._raw_stderr = stderr
+        self._stdout = _UNDECODED
+        self._stderr = _UNDECODED
+
+    @classmethod
+    def coerce(cls, result: "SSHResult | Mapping[str, Any]") -> "SSHResult":
+        """Wrap a dict result, its output is taken as already decoded."""
+        if isinstance(result, SSHResult):
+            return result
+        coerced = cls(
+            result["host"],
+            None,
+            None,
+            result.get("returncode"),
+            truncated=result.get("truncated", False),
+        )
+        coerced._stdout = result.get("stdout")
+        coerced._stderr = result.get("stderr")
+        return coerced
+
+    @property
+    def stdout(self) -> str | None:
+        if self._stdout is _UNDECODED:
+            self._stdout = _decode(self._raw_stdout)
+            self._raw_stdout = None
+        return self._stdout
+
+    @property
+    def stderr(self) -> str | None:
+        if self._stderr is _UNDECODED:
+            self._stderr = _decode(self._raw_stderr)
+            self._raw_stderr = None
+        return self._stderr
+
+    def _raw_lines(self) -> Iterator[str]:
+        output = self.stdout or ""
+        start = 0
+        length = len(output)
+        while start < length:
+            end = output.find("\n", start)
+            if end == -1:
+                end = length
+            yield output[start:end]
+            start = end + 1
+
+    def lines(self) -> Iterator[str]:
+        """Lazily yield the non blank stdout lines, stripped."""
+        for line in self._raw_lines():
+            if line := line.strip():
+                yield line
+
+    def tsv_rows(self) -> Iterator[List[str]]:
+        """Lazily yield tab separated rows of a query output, skipping blank lines."""
+        for line in self._raw_lines():
+            line = line.rstrip("\r")
+            if line.strip():
+                yield line.split("\t")
+
+    def first_match(self, pattern: re.Pattern | str) -> re.Match | None:
+        """First match of a pattern in stdout, searched line by line."""
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        for line in self.lines():
+            if match := pattern.search(line):
+                return match
+        return None
+
+    def to_dict(self) -> SSHCommandResult:
+        return {
+            "host": self.host,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "returncode": self.returncode,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SSHResult):
+            other = other.to_dict()
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return all(getattr(self, key) == other.get(key) for key in _FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (
+            f"SSHResult(host={self.host!r}, returncode={self.returncode!r}, "
+            f"stdout={self.stdout!r}, stderr={self.stderr!r})"
+        )
+
+
+class SSHResultSet(list):
+    """Results of a fan-out, in the order of the hosts it was sent to."""
+
+    __slots__ = ()
+
+    def __init__(self, results: Iterable[SSHResult] = ()):
+        super().__init__(SSHResult.coerce(result) for result in results)
+
+    def answered(self) -> "SSHResultSet":
+        """Results with output, hosts that printed nothing are left out."""
+        return SSHResultSet(result for result in self if result.stdout)
+
+    def group_by_output(self) -> Dict[str | None, List[str]]:
+        """Hosts grouped by identical stdout."""
+        groups: Dict[str | None, List[str]] = {}
+        for result in self:
+            groups.setdefault(result.stdout, []).append(result.host)
+        return groups
+
+    def by_host(self) -> Dict[str, SSHResult]:
+        return {result.host: result for result in self}
+
+    def timings(self) -> Dict[str, float | None]:
+        """Seconds each host took to answer."""
+        return {result.host: result.elapsed for result in self}
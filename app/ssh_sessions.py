@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import uuid
+from collections import deque
+from typing import Deque, Dict, List
+
+from app.core.config import settings
+from app.host_health import SSH_CONNECTION_ERROR_CODE
+
+SESSION_READ_LIMIT = 64 * 1024 * 1024
+
+
+class SshSessionError(Exception):
+    """Raised when a command can't be written to a remote shell session"""
+
+    pass
+
+
+def _build_session_command(host: str) -> str:
+    return f"ssh -q -T {host} bash"
+
+
+def _wrap_command(command: str, token: str) -> bytes:
+    # The command is double quoted as in `ssh host "cmd"` and evaluated by
+    # the remote shell, so it is expanded exactly like a one-shot command.
+    # A subshell keeps `exit`, `cd` and variables from leaking into the
+    # session. Its stderr goes to a file and comes back base64 encoded in
+    # the end sentinel together with the exit code.
+    return (
+        f"echo {token}-start\n"
+        f'(eval "{command}") </dev/null 2>"$__session_err"\n'
+        f'__rc=$?; echo; echo "{token}-end $__rc $(base64 -w0 <"$__session_err")"\n'
+    ).encode()
+
+
+class _PendingCommand:
+    __slots__ = ("token", "future", "started", "lines")
+
+    def __init__(self, token: str):
+        self.token = token
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.started = False
+        self.lines: List[bytes] = []
+
+
+class RemoteShellSession:
+    """
+    A long-lived `bash` on a host. Commands are written to its stdin one
+    after another without waiting for the previous answers, and are told
+    apart in stdout by start and end sentinels unique to each command.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self._process: asyncio.subprocess.Process | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: Deque[_PendingCommand] = deque()
+        self._closed = False
+
+    @property
+    def is_alive(self) -> bool:
+        return (
+            self._process is not None
+            and self._process.returncode is None
+            and not self._closed
+        )
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> None:
+        self._process = await asyncio.create_subprocess_shell(
+            _build_session_command(self.host),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=SESSION_READ_LIMIT,
+        )
+        self._process.stdin.write(
+            b"__session_err=$(mktemp); trap 'rm -f \"$__session_err\"' EXIT\n"
+        )
+        self._reader_task = asyncio.create_task(self._read_output(self._process))
+
+    async def _read_output(self, process: asyncio.subprocess.Process) -> None:
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                if not self._pending:
+                    continue
+                command = self._pending[0]
+                text = line.rstrip(b"\n").decode(errors="replace")
+                if not command.started:
+                    command.started = text == f"{command.token}-start"
+                elif text.startswith(f"{command.token}-end "):
+                    self._pending.popleft()
+                    _, returncode, stderr = (text.split(" ", 2) + [""])[:3]
+                    if not command.future.done():
+                        command.future.set_result(
+                            (
+                                b"".join(command.lines),
+                                base64.b64decode(stderr),
+                                int(returncode),
+                            )
+                        )
+                else:
+                    command.lines.append(line)
+        finally:
+            self._closed = True
+            # Whatever was still queued lost its connection with the session
+            while self._pending:
+                command = self._pending.popleft()
+                if not command.future.done():
+                    command.future.set_result(
+                        (b"".join(command.lines), b"", SSH_CONNECTION_ERROR_CODE)
+                    )
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+
+    async def run(self, command: str) -> tuple[bytes, bytes, int]:
+        """Return stdout, stderr and the exit code of the command."""
+        if not self.is_alive:
+            raise SshSessionError(f"{self.host} session is not running")
+        pending = _PendingCommand(uuid.uuid4().hex)
+        self._pending.append(pending)
+        try:
+            self._process.stdin.write(_wrap_command(command, pending.token))
+            await self._process.stdin.drain()
+        except ConnectionError as e:
+            self._pending.remove(pending)
+            raise SshSessionError(f"{self.host} session closed: {e}") from e
+        return await pending.future
+
+    async def close(self) -> None:
+        if self._process is not None and self._process.returncode is None:
+            self._process.stdin.close()
+            self._process.kill()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+
+class RemoteShellSessionPool:
+    """
+    Up to SSH_SESSIONS_PER_HOST sessions per host. A command goes to the
+    session with the fewest queued commands, a new session is started only
+    when all of them are busy. Dead sessions are replaced on the next
+    command.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, List[RemoteShellSession]] = {}
+        self._lock = asyncio.Lock()
+
+    async def _get_session(self, host: str) -> RemoteShellSession:
+        async with self._lock:
+            sessions = [
+                session for session in self._sessions.get(host, []) if session.is_alive
+            ]
+            idle = [session for session in sessions if session.pending_count == 0]
+            if idle:
+                session = idle[0]
+            elif len(sessions) < settings.SSH_SESSIONS_PER_HOST:
+                session = RemoteShellSession(host)
+                await session.start()
+                sessions.append(session)
+            else:
+                session = min(sessions, key=lambda session: session.pending_count)
+            self._sessions[host] = sessions
+            return session
+
+    async def run(self, host: str, command: str) -> tuple[bytes, bytes, int]:
+        session = await self._get_session(host)
+        return await session.run(command)
+
+    async def close(self) -> None:
+        sessions = [
+            session for sessions in self._sessions.values() for session in sessions
+        ]
+        self._sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions))
+
+
+SSH_SESSIONS = RemoteShellSessionPool()
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+SSH_SOCKET_USAGE_DIR = os.path.join(tempfile.gettempdir(), "ssh-socket-usage")
+
+
+def _usage_marker(host: str) -> str:
+    return os.path.join(SSH_SOCKET_USAGE_DIR, host)
+
+
+def mark_host_used(host: str) -> None:
+    """
+    Record that the host's ControlMaster socket was just used. The marker
+    file mtime is shared by every worker process of the container.
+    """
+    marker = _usage_marker(host)
+    try:
+        os.utime(marker)
+    except FileNotFoundError:
+        os.makedirs(SSH_SOCKET_USAGE_DIR, exist_ok=True)
+        open(marker, "a").close()
+
+
+def get_host_last_used(host: str) -> float | None:
+    try:
+        return os.path.getmtime(_usage_marker(host))
+    except FileNotFoundError:
+        return None
@@ -1,12 +1,87 @@
-from fastapi_utils.tasks import repeat_every
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
 from app.AsyncSSHandler import execute_ssh_commands_in_batch
+from app.core.config import settings
+from app.create_ssh_config import SSH_SOCKETS_LIVETIME_MIN
+from app.scheduler_lock import SchedulerLock
 from app.schemas import PLESK_SERVER_LIST, DNS_SERVER_LIST
+from app.ssh_socket_usage import get_host_last_used
+
+SSH_KEEPALIVE_LOCK_PATH = os.path.join(tempfile.gettempdir(), "ssh-keepalive.lock")
+SSH_KEEPALIVE_COMMAND = "echo online"
+
+
+class SshKeepAlive:
+    """
+    Keeps ControlMaster sockets from expiring. A socket is refreshed only
+    when it hasn't been used for almost ControlPersist, each refresh is
+    delayed by a random jitter. All API workers share the sockets, so only
+    the worker holding the file lock runs the scheduler, the others retry
+    taking the lock in case the holder exits.
+    """
+
+    def __init__(self, hosts: List[str], lock_path: str = SSH_KEEPALIVE_LOCK_PATH):
+        self.hosts = hosts
+        self._lock = SchedulerLock(lock_path)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_scheduler(self) -> bool:
+        return self._lock.is_held
+
+    def try_acquire_lock(self) -> bool:
+        return self._lock.try_acquire()
+
+    def release_lock(self) -> None:
+        self._lock.release()
+
+    def hosts_to_refresh(self, now: float) -> List[str]:
+        expires_after = SSH_SOCKETS_LIVETIME_MIN * 60
+        refresh_after = expires_after - settings.SSH_KEEPALIVE_REFRESH_MARGIN_SECONDS
+        return [
+            host
+            for host in self.hosts
+            if host not in self._refreshing
+            and now - (get_host_last_used(host) or 0) >= refresh_after
+        ]
+
+    async def _refresh(self, host: str) -> None:
+        try:
+            await asyncio.sleep(
+                random.uniform(0, settings.SSH_KEEPALIVE_JITTER_SECONDS)
+            )
+            # Hosts with an open circuit are skipped until their half-open probe
+            await execute_ssh_commands_in_batch(
+                server_list=[host], command=SSH_KEEPALIVE_COMMAND, verbose=False
+            )
+        finally:
+            self._refreshing.pop(host, None)
+
+    async def _run(self) -> None:
+        while True:
+            if self.try_acquire_lock():
+                for host in self.hosts_to_refresh(time.time()):
+                    self._refreshing[host] = asyncio.create_task(self._refresh(host))
+            await asyncio.sleep(settings.SSH_KEEPALIVE_TICK_SECONDS)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._refreshing.values())
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.release_lock()
 
 
-@repeat_every(seconds=60 * 5)
-async def ssh_warmup() -> None:
-    await execute_ssh_commands_in_batch(
-        server_list=PLESK_SERVER_LIST + DNS_SERVER_LIST,
-        command="echo online",
-        verbose=True,
-    )
+SSH_KEEPALIVE = SshKeepAlive(PLESK_SERVER_LIST + DNS_SERVER_LIST)
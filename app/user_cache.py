@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import UserVersion
+from app.schemas import UserPublic
+
+_USER_VERSION_ID = 1
+
+
+class UserCache:
+    """
+    Validated users by id, kept for USER_CACHE_TTL_SECONDS. Changes made
+    through this worker evict the user right away. Each change also bumps
+    the user version row in its transaction. Every worker reads the
+    version at most once per USER_CACHE_VERSION_CHECK_SECONDS and drops all
+    its users when it has moved.
+    """
+
+    def __init__(self):
+        # By str(id), the token subject is a string
+        self._users: OrderedDict[str, Tuple[float, UserPublic]] = OrderedDict()
+        # get_current_user runs in the threadpool
+        self._lock = threading.Lock()
+        self._version: int | None = None
+        self._checked_at = float("-inf")
+
+    def _check_version(self, session: Session) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < settings.USER_CACHE_VERSION_CHECK_SECONDS:
+            return
+        version = session.execute(
+            select(UserVersion.version).where(UserVersion.id == _USER_VERSION_ID)
+        ).scalar()
+        with self._lock:
+            if version != self._version:
+                self._users.clear()
+                self._version = version
+            self._checked_at = now
+
+    def get(self, session: Session, user_id: UUID | str) -> UserPublic | None:
+        self._check_version(session)
+        key = str(user_id)
+        with self._lock:
+            entry = self._users.get(key)
+            if entry is None:
+                return None
+            stored_at, user = entry
+            if time.monotonic() - stored_at > settings.USER_CACHE_TTL_SECONDS:
+                del self._users[key]
+                return None
+            return user
+
+    def set(self, user: UserPublic) -> None:
+        key = str(user.id)
+        with self._lock:
+            self._users[key] = (time.monotonic(), user)
+            self._users.move_to_end(key)
+            while len(self._users) > settings.USER_CACHE_MAX_ENTRIES:
+                self._users.popitem(last=False)
+
+    def invalidate(self, session: Session, user_id: UUID | str) -> None:
+        """
+        Evict a user and bump the version in the session's transaction, call
+        before committing a change to the user.
+        """
+        statement = insert(UserVersion).values(id=_USER_VERSION_ID, version=1)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[UserVersion.id],
+                set_={"version": UserVersion.version + 1},
+            )
+        )
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._version = None
+            self._checked_at = float("-inf")
+
+
+USER_CACHE = UserCache()
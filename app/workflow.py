@@ -0,0 +1,109 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+@dataclass
+class WorkflowStep:
+    """
+    A unit of work of a workflow. `action` is called with the results of the
+    steps it depends on as keyword arguments named after those steps.
+    """
+
+    name: str
+    action: Callable[..., Awaitable[Any]]
+    depends_on: List[str] = field(default_factory=list)
+
+
+@dataclass
+class StepTiming:
+    started_ms: float
+    duration_ms: float
+
+
+@dataclass
+class WorkflowResult:
+    results: Dict[str, Any]
+    timings: Dict[str, StepTiming]
+
+    def server_timing_header(self) -> str:
+        """Render step timings as a `Server-Timing` header value."""
+        return ", ".join(
+            f'{name};dur={timing.duration_ms:.1f};desc="start {timing.started_ms:.1f}ms"'
+            for name, timing in self.timings.items()
+        )
+
+
+class WorkflowError(Exception):
+    """Raised when a workflow graph is invalid"""
+
+    pass
+
+
+class Workflow:
+    """
+    Runs steps as a dependency graph: every step starts as soon as the steps
+    it depends on have finished, so independent steps run concurrently.
+    The first failing step cancels the steps still running and its
+    exception is raised.
+    """
+
+    def __init__(self, steps: List[WorkflowStep]):
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise WorkflowError("Workflow step names must be unique")
+        self._check_graph()
+
+    def _check_graph(self) -> None:
+        visiting: set[str] = set()
+        visited: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise WorkflowError(f"Workflow has a dependency cycle at {name}")
+            if name not in self.steps:
+                raise WorkflowError(f"Workflow step {name} is not defined")
+            visiting.add(name)
+            for dependency in self.steps[name].depends_on:
+                visit(dependency)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+    async def run(self) -> WorkflowResult:
+        start_time = time.perf_counter()
+        timings: Dict[str, StepTiming] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step: WorkflowStep) -> Any:
+            dependencies = {
+                dependency: await tasks[dependency] for dependency in step.depends_on
+            }
+            step_start = time.perf_counter()
+            try:
+                return await step.action(**dependencies)
+            finally:
+                timings[step.name] = StepTiming(
+                    started_ms=(step_start - start_time) * 1000,
+                    duration_ms=(time.perf_counter() - step_start) * 1000,
+                )
+
+        for step in self.steps.values():
+            tasks[step.name] = asyncio.ensure_future(run_step(step))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return WorkflowResult(
+            results={name: task.result() for name, task in tasks.items()},
+            timings=timings,
+        )
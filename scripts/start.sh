@@ -0,0 +1,9 @@
+#! /usr/bin/env bash
+
+set -e
+
+# One SSH broker owns the connections for all API workers
+export SSH_BROKER_SOCKET="${SSH_BROKER_SOCKET:-/tmp/ssh-broker.sock}"
+python -m app.ssh_broker &
+
+exec fastapi run --workers 4 app/main.py
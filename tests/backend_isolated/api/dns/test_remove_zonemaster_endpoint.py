@@ -5,6 +5,7 @@ from unittest.mock import AsyncMock, patch, MagicMock
 
 from app.api.dns.dns_router import delete_zone_file_for_domain
 from app.schemas import SubscriptionName, Message, DomainName
+from app.ssh_result import SSHResultSet
 from app.api.dns.ssh_utils import (
     build_remove_zone_master_command,
     dns_remove_domain_zone_master,
@@ -113,7 +114,7 @@ async def test_build_remove_zone_master_command():
 @pytest.mark.asyncio
 async def test_dns_remove_domain_zone_master_success():
     domain = SubscriptionName(name="test.com")
-    mock_response = [{"host": "dns1", "stderr": ""}]
+    mock_response = SSHResultSet([{"host": "dns1", "stderr": ""}])
 
     with patch(
         "app.api.dns.ssh_utils.batch_ssh_execute", new_callable=AsyncMock
@@ -126,7 +127,7 @@ async def test_dns_remove_domain_zone_master_success():
 @pytest.mark.asyncio
 async def test_dns_remove_domain_zone_master_error():
     domain = SubscriptionName(name="test.com")
-    mock_response = [{"host": "dns1", "stderr": "error occurred"}]
+    mock_response = SSHResultSet([{"host": "dns1", "stderr": "error occurred"}])
 
     with patch(
         "app.api.dns.ssh_utils.batch_ssh_execute", new_callable=AsyncMock
@@ -8,6 +8,7 @@ from app.api.dns.ssh_utils import (
 )
 from tests.test_data.hosts import HostList
 from app.schemas import SubscriptionName
+from app.ssh_result import SSHResultSet
 
 invalid_domains = [
     "ex",  # Too short
@@ -28,11 +29,13 @@ invalid_domains = [
 async def test_dns_get_domain_zone_master_with_correct_domain_existing_zone_master(
     domain=HostList.CORRECT_EXISTING_DOMAIN,
 ):
-    mock_response = [
-        {"host": "ns1.internal.kz.", "stdout": "IP_PLACEHOLDER"},
-        {"host": "ns2.internal.kz.", "stdout": "IP_PLACEHOLDER"},
-        {"host": "ns3.internal.kz.", "stdout": "IP_PLACEHOLDER"},
-    ]
+    mock_response = SSHResultSet(
+        [
+            {"host": "ns1.internal.kz.", "stdout": "IP_PLACEHOLDER"},
+            {"host": "ns2.internal.kz.", "stdout": "IP_PLACEHOLDER"},
+            {"host": "ns3.internal.kz.", "stdout": "IP_PLACEHOLDER"},
+        ]
+    )
 
     with patch(
         "app.api.dns.ssh_utils.batch_ssh_execute", new_callable=AsyncMock
@@ -57,11 +60,13 @@ async def test_dns_get_domain_zone_master_with_correct_domain_existing_zone_mast
 async def test_dns_get_domain_zone_master_with_correct_domain_nonexisting_zone_master(
     domain=HostList.DOMAIN_WITHOUT_ZONE_MASTER,
 ):
-    mock_response = [
-        {"host": "ns1.internal.kz.", "stdout": ""},
-        {"host": "ns2.internal.kz.", "stdout": ""},
-        {"host": "ns3.internal.kz.", "stdout": ""},
-    ]
+    mock_response = SSHResultSet(
+        [
+            {"host": "ns1.internal.kz.", "stdout": ""},
+            {"host": "ns2.internal.kz.", "stdout": ""},
+            {"host": "ns3.internal.kz.", "stdout": ""},
+        ]
+    )
 
     with patch(
         "app.api.dns.ssh_utils.batch_ssh_execute", new_callable=AsyncMock
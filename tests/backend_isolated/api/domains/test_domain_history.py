@@ -0,0 +1,93 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api.domains import domains_router
+from app.db.models import PleskMailGetTestMailLog, User
+from app.schemas import CountStrategy, UserActionType
+
+
+class RecordingSession:
+    def __init__(self, total_count, rows):
+        self.total_count = total_count
+        self.rows = rows
+        self.statements = []
+
+    def record(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        result.scalar.return_value = self.total_count
+        result.all.return_value = self.rows
+        return result
+
+    async def execute(self, statement):
+        return self.record(statement)
+
+    async def run_sync(self, fn, *args):
+        return fn(MagicMock(execute=self.record), *args)
+
+
+def make_row():
+    log = PleskMailGetTestMailLog(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        ip="127.0.0.1",
+        domain="a.kz",
+        plesk_server="plesk.example.com",
+        new_email_created=True,
+        timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    user = User(id=log.user_id, email="a@example.com", full_name="A")
+    return log, user
+
+
+@pytest.mark.asyncio
+async def test_history_is_read_by_domain_newest_first():
+    session = RecordingSession(total_count=1, rows=[make_row()])
+
+    history = await domains_router.get_domain_history(
+        name="a.kz", session=session, count_strategy=CountStrategy.EXACT
+    )
+
+    statement = session.statements[1]
+    assert "log_user_activity.domain = %(domain_1)s" in statement
+    assert "JOIN log_" not in statement
+    assert statement.split("ORDER BY ")[1].startswith(
+        "log_user_activity.timestamp DESC, log_user_activity.id DESC"
+    )
+    details = history.data[0].details
+    assert details.log_type == UserActionType.PLESK_MAIL_GET_TEST_MAIL
+    assert details.domain.name == "a.kz"
+
+
+@pytest.mark.asyncio
+async def test_domain_without_history_gets_an_empty_page():
+    session = RecordingSession(total_count=0, rows=[])
+
+    history = await domains_router.get_domain_history(
+        name="a.kz", session=session, page_size=20, count_strategy=CountStrategy.EXACT
+    )
+
+    assert history.total_count == 0
+    assert history.data == []
+    assert history.page_size == 20
+    assert history.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_a_bad_request():
+    session = RecordingSession(total_count=1, rows=[])
+
+    with pytest.raises(HTTPException) as error:
+        await domains_router.get_domain_history(
+            name="a.kz",
+            session=session,
+            cursor="not base64!",
+            count_strategy=CountStrategy.EXACT,
+        )
+
+    assert error.value.status_code == 400
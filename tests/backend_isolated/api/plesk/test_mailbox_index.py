@@ -0,0 +1,139 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.api.plesk.mailbox_index import MailboxIndex
+from app.api.plesk.ssh_utils import plesk_get_testmail_login_data
+from app.composite_command import StepResult
+from app.schemas import PleskServerDomain, SubscriptionName
+from app.ssh_result import SSHResultSet
+
+
+@pytest.fixture
+def make_index(tmp_path):
+    def make_index():
+        return MailboxIndex(
+            path=str(tmp_path / "mailbox-index.json"),
+            lock_path=str(tmp_path / "mailbox-index.lock"),
+        )
+
+    return make_index
+
+
+def step_result(name, stdout=None, returncode=0, skipped=False):
+    return StepResult(
+        name=name, stdout=stdout, stderr=None, returncode=returncode, skipped=skipped
+    )
+
+
+@pytest.mark.asyncio
+async def test_mailbox_index_refresh_keeps_failed_hosts_unindexed(make_index):
+    index = make_index()
+    results = SSHResultSet(
+        [
+            {
+                "host": "plesk.example.com",
+                "stdout": "testhoster@example.kz\ninfo@example.kz",
+                "stderr": None,
+                "returncode": 0,
+            },
+            {
+                "host": "plesk2.example.com",
+                "stdout": None,
+                "stderr": "Connection refused",
+                "returncode": 255,
+            },
+        ]
+    )
+    with patch(
+        "app.api.plesk.mailbox_index.PLESK_DB.query_in_batch",
+        new_callable=AsyncMock,
+        return_value=results,
+    ):
+        await index.refresh()
+
+    assert index.has_mailbox("plesk.example.com", "TestHoster@example.kz") is True
+    assert index.has_mailbox("plesk.example.com", "missing@example.kz") is False
+    assert index.has_mailbox("plesk2.example.com", "testhoster@example.kz") is None
+
+
+@pytest.mark.asyncio
+async def test_only_the_lock_holder_queries_the_servers(make_index):
+    scheduler, worker = make_index(), make_index()
+    results = SSHResultSet(
+        [
+            {
+                "host": "plesk.example.com",
+                "stdout": "testhoster@example.kz",
+                "stderr": None,
+                "returncode": 0,
+            }
+        ]
+    )
+    with patch(
+        "app.api.plesk.mailbox_index.PLESK_DB.query_in_batch",
+        new_callable=AsyncMock,
+        return_value=results,
+    ) as mock_query:
+        await scheduler.refresh()
+        await worker.refresh()
+
+    assert mock_query.await_count == 1
+    assert worker.has_mailbox("plesk.example.com", "testhoster@example.kz") is True
+
+
+@pytest.mark.asyncio
+async def test_testmail_creates_indexed_missing_mailbox_before_password_lookup(
+    make_index,
+):
+    host = PleskServerDomain(name="plesk.example.com")
+    index = make_index()
+    index._mailboxes[host.name] = set()
+    results = {
+        "subscription": step_result("subscription", stdout="42"),
+        "create": step_result("create"),
+        "password": step_result("password", returncode=None, skipped=True),
+    }
+
+    with (
+        patch("app.api.plesk.ssh_utils.MAILBOX_INDEX", index),
+        patch(
+            "app.api.plesk.ssh_utils.execute_composite_command",
+            new_callable=AsyncMock,
+            return_value=results,
+        ) as mock_composite,
+    ):
+        data = await plesk_get_testmail_login_data(
+            host, SubscriptionName(name="example.kz")
+        )
+
+    steps = mock_composite.await_args.args[1]
+    assert [step.name for step in steps] == ["subscription", "create", "password"]
+    assert data.new_email_created is True
+    assert index.has_mailbox(host.name, "testhoster@example.kz") is True
+
+
+@pytest.mark.asyncio
+async def test_testmail_looks_up_password_first_when_index_is_unknown(make_index):
+    host = PleskServerDomain(name="plesk.example.com")
+    results = {
+        "subscription": step_result("subscription", stdout="42"),
+        "password": step_result("password", stdout="Secret-Pass123"),
+        "create": step_result("create", returncode=None, skipped=True),
+    }
+
+    with (
+        patch("app.api.plesk.ssh_utils.MAILBOX_INDEX", make_index()),
+        patch(
+            "app.api.plesk.ssh_utils.execute_composite_command",
+            new_callable=AsyncMock,
+            return_value=results,
+        ) as mock_composite,
+    ):
+        data = await plesk_get_testmail_login_data(
+            host, SubscriptionName(name="example.kz")
+        )
+
+    steps = mock_composite.await_args.args[1]
+    assert [step.name for step in steps] == ["subscription", "password", "create"]
+    assert data.password == "Secret-Pass123"
+    assert data.new_email_created is False
@@ -13,3 +13,17 @@ async def test_subscription_query_with_malformed_domain_name(
         f"/plesk/get/subscription/?domain={domain}", headers=superuser_token_headers
     )
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_bulk_subscription_query_with_malformed_domain_name(
+    client: AsyncClient,
+    superuser_token_headers: dict[str, str],
+    domain=HostList.MALFORMED_DOMAIN,
+):
+    response = await client.post(
+        "/plesk/subscriptions/bulk",
+        json={"domains": [HostList.CORRECT_EXISTING_DOMAIN, domain]},
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 422
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import pymysql
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.api.plesk.plesk_db import (
+    PleskDb,
+    PleskDbPool,
+    PleskDbTunnelError,
+    render_query,
+    rows_to_tsv,
+)
+from app.core.config import settings
+
+
+def test_render_query_escapes_parameters():
+    query = "SELECT id FROM domains WHERE name = %s AND id = %s"
+
+    assert (
+        render_query(query, ("google.com", 1184))
+        == "SELECT id FROM domains WHERE name = 'google.com' AND id = 1184"
+    )
+
+
+@pytest.mark.parametrize("value", ['google.com"; rm -rf', "$(id)", "`id`", "a'b"])
+def test_render_query_rejects_shell_unsafe_parameters(value):
+    with pytest.raises(ValueError):
+        render_query("SELECT id FROM domains WHERE name = %s", (value,))
+
+
+def test_rows_to_tsv_matches_mysql_batch_output():
+    assert rows_to_tsv([(1184, "google.com", None), (1185, "a.google.com", 0)]) == (
+        "1184\tgoogle.com\tNULL\n1185\ta.google.com\t0"
+    )
+
+
+@pytest.mark.asyncio
+async def test_tunnel_failure_falls_back_to_cli(monkeypatch):
+    monkeypatch.setattr(settings, "PLESK_DB_ACCESS_MODE", "tunnel")
+    plesk_db = PleskDb()
+    cli_result = {"host": "test", "stdout": "1184", "stderr": None, "returncode": 0}
+
+    with (
+        patch.object(plesk_db, "_get_pool", side_effect=lambda host: _failing_pool()),
+        patch(
+            "app.api.plesk.plesk_db.execute_ssh_command",
+            new_callable=AsyncMock,
+            return_value=cli_result,
+        ) as mock_ssh,
+    ):
+        result = await plesk_db.query(
+            "test", "SELECT id FROM domains WHERE name = %s", ("google.com",)
+        )
+
+    assert result == cli_result
+    assert "name = 'google.com'" in mock_ssh.call_args.args[1]
+
+
+@pytest.mark.asyncio
+async def test_pool_waiter_gets_a_connection_after_a_broken_one_is_discarded():
+    loop = asyncio.get_running_loop()
+    pool = PleskDbPool("test", size=1)
+    broken, healthy = MagicMock(), MagicMock()
+    broken_query_started = asyncio.Event()
+    # Queries run in a thread
+    fail_broken_query = threading.Event()
+
+    def run_query(connection, query, params):
+        if connection is broken:
+            loop.call_soon_threadsafe(broken_query_started.set)
+            fail_broken_query.wait(1)
+            raise pymysql.err.OperationalError("server has gone away")
+        return [(1184,)]
+
+    with (
+        patch.object(pool, "_connect", side_effect=[broken, healthy]),
+        patch("app.api.plesk.plesk_db._run_query", side_effect=run_query),
+    ):
+        first = asyncio.create_task(pool.fetch_rows("SELECT 1"))
+        await broken_query_started.wait()
+        second = asyncio.create_task(pool.fetch_rows("SELECT 1"))
+        await asyncio.sleep(0)
+        fail_broken_query.set()
+
+        with pytest.raises(pymysql.err.OperationalError):
+            await first
+        assert await asyncio.wait_for(second, 1) == [(1184,)]
+    broken.close.assert_called_once()
+
+
+def _failing_pool():
+    pool = AsyncMock()
+    pool.fetch_rows.side_effect = PleskDbTunnelError("tunnel is down")
+    return pool
@@ -6,6 +6,7 @@ from unittest.mock import patch
 
 from app.core.config import settings
 from app.main import app
+from app.ssh_result import SSHResult, SSHResultSet
 from tests.test_data.hosts import HostList
 from tests.utils.container_db_utils import TestMariadb, TEST_DB_CMD
 
@@ -25,7 +26,7 @@ async def test_container():
 
     def mock_batch_ssh(command: str):
         stdout = testdb.run_cmd(command)
-        return [{"host": TEST_HOSTS[0], "stdout": stdout}]
+        return SSHResultSet([SSHResult(TEST_HOSTS[0], stdout, None, 0)])
 
     with patch("app.api.plesk.ssh_utils.PLESK_DB_RUN_CMD_TEMPLATE", TEST_DB_CMD):
         with patch(
@@ -36,32 +37,28 @@ async def test_container():
 
 
 def test_subscription_info_retrieval_with_existing_domain(
-    domain=HostList.CORRECT_EXISTING_DOMAIN,
+    domain=HostList.DOMAIN_WITH_EXISTING_MX_RECORD,
 ):
-    expected_result = [
-        {
-            "host": TEST_HOSTS[0],
-            "id": "1184",
-google.com
-            "username": "FIO",
-            "userlogin": "p-2342343",
-            "domains": [
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-            ],
-        }
-    ]
     response = client.get(f"/plesk/get/subscription/?domain={domain}")
     assert response.status_code == 200
-    assert response.json() == expected_result
+    result = response.json()
+    assert len(result) == 1
+    assert result[0]["id"] == "1184"
+    assert result[0]["name"] == "google.com"
+    assert result[0]["username"] == "USER_NAME"
+    assert result[0]["userlogin"] == "p-341161"
+    assert result[0]["domains"] == [
+        "google.com",
+        "test.google.com",
+        "mx.google.com",
+        "zless.zlessgoogle.com",
+        "1.google.com",
+        "gog.google.com",
+        "asd.google.com",
+        "oht.google.com",
+        "ts.google.com",
+        "lkok.google.com",
+    ]
 
 
 @pytest.mark.asyncio
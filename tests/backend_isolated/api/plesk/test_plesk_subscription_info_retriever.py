@@ -1,7 +1,14 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
 from app.api.plesk.ssh_utils import (
+    batch_plesk_db_query,
+    build_bulk_subscription_info_query,
     build_subscription_info_query,
     extract_subscription_details,
 )
+from app.core.config import settings
+from app.ssh_result import SSHResult, SSHResultSet
 from tests.test_data.hosts import HostList
 
 
@@ -20,32 +27,76 @@ invalid_domains = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def resolve_host_to_name(monkeypatch):
+    monkeypatch.setattr(
+        "app.api.plesk.ssh_utils.HOSTS.resolve_domain", lambda host: host
+    )
+
+
 def test_query_builder(domain=HostList.CORRECT_EXISTING_DOMAIN):
-    correct_query = (
-        "SELECT CASE WHEN webspace_id = 0 THEN id ELSE webspace_id END AS result "
-        "FROM domains WHERE name LIKE '{0}'; "
-        "SELECT name FROM domains WHERE id=(SELECT CASE WHEN webspace_id = 0 THEN id ELSE webspace_id END AS result FROM domains WHERE name LIKE '{0}'); "
-        "SELECT pname, login FROM clients WHERE id=(SELECT cl_id FROM domains WHERE name LIKE '{0}'); "
-        "SELECT name FROM domains WHERE webspace_id=(SELECT CASE WHEN webspace_id = 0 THEN id ELSE webspace_id END AS result FROM domains WHERE name LIKE '{0}');"
-    ).format(domain)
+    query = build_subscription_info_query(domain)
+
+    assert f"WHERE name LIKE '{domain}'" in query
+    assert "GROUP BY s.id," in query
+
+
+def test_bulk_query_binds_domains():
+    query, params = build_bulk_subscription_info_query(["google.com", "google.kz"])
+
+    assert "WHERE name IN (%s, %s)" in query
+    assert "google" not in query
+    assert params == ["google.com", "google.kz"]
+
+
+@pytest.mark.asyncio
+async def test_cli_query_inlines_escaped_domains(monkeypatch):
+    monkeypatch.setattr(settings, "PLESK_DB_ACCESS_MODE", "cli")
+
+    with patch(
+        "app.api.plesk.ssh_utils.batch_ssh_execute",
+        new_callable=AsyncMock,
+        return_value=SSHResultSet([]),
+    ) as mock_execute:
+        await batch_plesk_db_query(
+            *build_bulk_subscription_info_query(["google.com", "google.kz"])
+        )
+        with pytest.raises(ValueError):
+            await batch_plesk_db_query(
+                *build_bulk_subscription_info_query(["x') OR (1=1"])
+            )
 
-    assert build_subscription_info_query(domain) == correct_query
+    mock_execute.assert_awaited_once()
+    assert "name IN ('google.com', 'google.kz')" in mock_execute.await_args.args[0]
 
 
 def test_extract_subscription_details():
-    sample_input = {
-        "host": "example.com",
-        "stdout": "12345\nTest Name\nuser1\tlogin1\ndomain1.com\ndomain2.com",
-    }
-
-    expected_output = {
-        "host": "example.com",
-        "id": "12345",
-        "name": "Test Name",
-        "username": "user1",
-        "userlogin": "login1",
-        "domains": ["Test Name", "domain1.com", "domain2.com"],
-    }
+    sample_input = SSHResult(
+        "example.com",
+        "12345\tTest Name\tuser1\tlogin1\tTest Name:0,domain1.com:0,domain2.com:0"
+        "\tfalse\t100\t0",
+        None,
+        0,
+    )
+
+    expected_output = [
+        {
+            "host": "example.com",
+            "id": "12345",
+            "name": "Test Name",
+            "username": "user1",
+            "userlogin": "login1",
+            "domains": ["Test Name", "domain1.com", "domain2.com"],
+            "domain_states": [
+                {"domain": "Test Name", "status": "online"},
+                {"domain": "domain1.com", "status": "online"},
+                {"domain": "domain2.com", "status": "online"},
+            ],
+            "is_space_overused": False,
+            "subscription_size_mb": 100,
+            "subscription_status": "online",
+        }
+    ]
 
     result = extract_subscription_details(sample_input)
 
@@ -53,38 +104,64 @@ def test_extract_subscription_details():
 
 
 def test_extract_subscription_details_empty_stdout():
-    sample_input = {"host": "example.com", "stdout": "\n\n\n\n"}
+    sample_input = SSHResult("example.com", "\n\n\n\n", None, 0)
 
     result = extract_subscription_details(sample_input)
-    assert result is None
+    assert result == []
 
 
 def test_parse_correct_answer():
-    sample_input = {
-        "host": "pleskserver.",
-google.com
-    }
-
-    expected_output = {
-        "host": "pleskserver.",
-        "id": "1184",
-google.com
-        "username": "FIO",
-        "userlogin": "p-2342343",
-        "domains": [
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-        ],
-    }
+    domains = ["google.com", "mx.google.com", "mail.google.com", "www.google.com"]
+    sample_input = SSHResult(
+        "pleskserver.",
+        "1184\tgoogle.com\tFIO\tp-2342343\t"
+        + ",".join(f"{domain}:0" for domain in domains)
+        + "\tfalse\t317\t0\n",
+        None,
+        0,
+    )
 
     result = extract_subscription_details(sample_input)
 
-    assert result == expected_output
+    assert len(result) == 1
+    assert result[0]["host"] == "pleskserver."
+    assert result[0]["id"] == "1184"
+    assert result[0]["name"] == "google.com"
+    assert result[0]["username"] == "FIO"
+    assert result[0]["userlogin"] == "p-2342343"
+    assert result[0]["domains"] == domains
+
+
+def test_extract_subscription_details_returns_every_row():
+    sample_input = SSHResult(
+        "example.com",
+        "1184\tgoogle.com\tFIO\tp-2342343\tgoogle.com:0,mx.google.com:16\tfalse\t317\t0\n"
+        "\n"
+        "1200\tgoogle.kz\tFIO\tp-2342343\tgoogle.kz:2\ttrue\t12\t2\n",
+        None,
+        0,
+    )
+
+    result = extract_subscription_details(sample_input)
+
+    assert [details["id"] for details in result] == ["1184", "1200"]
+    assert result[0]["domains"] == ["google.com", "mx.google.com"]
+    assert result[0]["domain_states"] == [
+        {"domain": "google.com", "status": "online"},
+        {"domain": "mx.google.com", "status": "domain_disabled_by_admin"},
+    ]
+    assert result[1]["is_space_overused"] is True
+    assert result[1]["subscription_status"] == "subscription_is_disabled"
+
+
+def test_extract_subscription_details_skips_malformed_rows():
+    sample_input = SSHResult(
+        "example.com",
+        "1184\tgoogle.com\tFIO\n1200\tgoogle.kz\tFIO\tp-1\tgoogle.kz:0\tfalse\t12\t0",
+        None,
+        0,
+    )
+
+    result = extract_subscription_details(sample_input)
+
+    assert [details["id"] for details in result] == ["1200"]
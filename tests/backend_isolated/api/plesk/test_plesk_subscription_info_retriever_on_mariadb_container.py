@@ -1,11 +1,13 @@
 import pytest
 from app.api.plesk.ssh_utils import (
     plesk_fetch_subscription_info,
+    plesk_fetch_subscription_info_bulk,
 )
 from tests.utils.container_db_utils import TestMariadb, TEST_DB_CMD
 from tests.test_data.hosts import HostList
 from unittest.mock import patch
 from app.schemas import SubscriptionName
+from app.ssh_result import SSHResult, SSHResultSet
 
 @pytest.fixture(scope="module")
 def init_test_db():
@@ -13,7 +15,7 @@ def init_test_db():
 
     def mock_batch_ssh(command: str):
         stdout = testdb.run_cmd(command)
-        return [{"host": "test", "stdout": stdout}]
+        return SSHResultSet([SSHResult("test", stdout, None, 0)])
 
     with patch("app.api.plesk.ssh_utils.PLESK_DB_RUN_CMD_TEMPLATE", TEST_DB_CMD):
         with patch(
@@ -25,34 +27,54 @@ def init_test_db():
 
 @pytest.mark.asyncio
 async def test_get_existing_subscription_info(init_test_db):
-    result = await plesk_fetch_subscription_info(SubscriptionName(name=HostList.CORRECT_EXISTING_DOMAIN))
-
-    expected_output = [
-        {
-            "host": "test",
-            "id": "1184",
-google.com
-            "username": "FIO",
-            "userlogin": "p-2342343",
-            "domains": [
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-google.com
-            ],
-        }
-    ]
+    result = await plesk_fetch_subscription_info(SubscriptionName(name=HostList.DOMAIN_WITH_EXISTING_MX_RECORD))
 
-    assert result == expected_output
+    assert len(result) == 1
+    assert result[0]["id"] == "1184"
+    assert result[0]["name"] == "google.com"
+    assert result[0]["username"] == "USER_NAME"
+    assert result[0]["userlogin"] == "p-341161"
+    assert result[0]["domains"] == [
+        "google.com",
+        "test.google.com",
+        "mx.google.com",
+        "zless.zlessgoogle.com",
+        "1.google.com",
+        "gog.google.com",
+        "asd.google.com",
+        "oht.google.com",
+        "ts.google.com",
+        "lkok.google.com",
+    ]
 
 
 @pytest.mark.asyncio
 async def test_get_nonexisting_subscription_info(init_test_db):
     result = await plesk_fetch_subscription_info(SubscriptionName(name="zless.kz"))
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_partial_search_returns_one_row_per_subscription(init_test_db):
+    result = await plesk_fetch_subscription_info(
+        SubscriptionName(name="google.com"), partial_search=True
+    )
+
+    assert [subscription["id"] for subscription in result] == ["1184"]
+    assert len(result[0]["domains"]) == 10
+
+
+@pytest.mark.asyncio
+async def test_bulk_subscription_info_is_keyed_by_domain(init_test_db):
+    result = await plesk_fetch_subscription_info_bulk(
+        [
+            SubscriptionName(name="google.com"),
+            SubscriptionName(name="mx.google.com"),
+            SubscriptionName(name="zless.kz"),
+        ]
+    )
+
+    assert set(result) == {"google.com", "mx.google.com", "zless.kz"}
+    assert [sub["id"] for sub in result["google.com"]] == ["1184"]
+    assert [sub["id"] for sub in result["mx.google.com"]] == ["1184"]
+    assert result["zless.kz"] == []
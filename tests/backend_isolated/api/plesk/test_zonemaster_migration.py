@@ -0,0 +1,114 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.api.dns.ssh_utils import parse_zone_masters
+from app.api.plesk.zonemaster_migration import (
+    get_migration_target,
+    migrate_zone_master_batch,
+    run_zonemaster_migration_batch,
+)
+from app.db.models import Job, JobItem
+from app.job_queue import JobHandler, _batch_job_items
+from app.schemas import PleskServerDomain, SubscriptionName
+
+
+ZONEFILE_OUTPUT = "\n".join(
+    [
+        'zone "example.kz" { type slave; file "example.kz.db"; masters { 10.0.0.1; }; };',
+        'zone "other.kz" { type slave; file "other.kz.db"; masters { 10.0.0.3; }; };',
+        'zone "sub.example.kz" { type slave; masters { 10.0.0.9; }; };',
+    ]
+)
+
+
+def test_parse_zone_masters_maps_only_requested_domains():
+    zone_masters = parse_zone_masters(
+        ZONEFILE_OUTPUT.splitlines(), {"example.kz", "other.kz"}
+    )
+
+    assert zone_masters == {"example.kz": {"10.0.0.1"}, "other.kz": {"10.0.0.3"}}
+
+
+def test_parse_zone_masters_empty_output():
+    assert parse_zone_masters([], {"example.kz"}) == {}
+
+
+def test_batch_job_items_groups_by_target():
+    handler = JobHandler(
+        run_batch=AsyncMock(), group_by=get_migration_target, batch_size=2
+    )
+    items = [
+        JobItem(key=f"domain{i}.kz", payload={"target_plesk_server": target})
+        for i, target in enumerate(["b.kz", "a.kz", "b.kz", "b.kz"])
+    ]
+
+    batches = _batch_job_items(handler, items)
+
+    assert [(get_migration_target(batch[0]), len(batch)) for batch in batches] == [
+        ("a.kz", 1),
+        ("b.kz", 2),
+        ("b.kz", 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_migrate_zone_master_batch_skips_missing_and_failed_domains():
+    domains = [
+        SubscriptionName(name="example.kz"),
+        SubscriptionName(name="other.kz"),
+        SubscriptionName(name="missing.kz"),
+    ]
+    target = PleskServerDomain(name="plesk.example.com")
+    module = "app.api.plesk.zonemaster_migration"
+
+    with (
+        patch(
+            f"{module}.fetch_existing_domains",
+            new_callable=AsyncMock,
+            return_value={"example.kz", "other.kz"},
+        ),
+        patch(
+            f"{module}.dns_query_zone_masters_bulk",
+            new_callable=AsyncMock,
+            return_value={"example.kz": {"10.0.0.1"}},
+        ),
+        patch(
+            f"{module}.dns_remove_zone_masters_bulk",
+            new_callable=AsyncMock,
+            return_value={"other.kz": "ns1.example.com: permission denied"},
+        ) as mock_remove,
+        patch(
+            f"{module}.restart_dns_service_for_domains",
+            new_callable=AsyncMock,
+            return_value={},
+        ) as mock_restart,
+        patch("app.api.dns.ssh_utils.resolve_record", return_value=None),
+    ):
+        zone_masters, errors = await migrate_zone_master_batch(target, domains, {})
+
+    assert [d.name for d in mock_remove.await_args.args[0]] == [
+        "example.kz",
+        "other.kz",
+    ]
+    assert [d.name for d in mock_restart.await_args.args[1]] == ["example.kz"]
+    assert zone_masters == {"example.kz": "10.0.0.1"}
+    assert set(errors) == {"other.kz", "missing.kz"}
+
+
+@pytest.mark.asyncio
+async def test_migration_audit_log_keeps_missing_zone_master_empty():
+    job = Job(user_id=None, ip="10.0.0.5")
+    items = [
+        JobItem(key=name, payload={"target_plesk_server": "plesk.example.com"})
+        for name in ("example.kz", "missing.kz")
+    ]
+
+    with patch(
+        "app.api.plesk.zonemaster_migration.migrate_zone_master_batch",
+        new_callable=AsyncMock,
+        return_value=({"example.kz": "ns.example.kz"}, {}),
+    ):
+        outcomes = await run_zonemaster_migration_batch(job, items)
+
+    assert outcomes["example.kz"].audit_log.current_zone_master == "ns.example.kz"
+    assert outcomes["missing.kz"].audit_log.current_zone_master is None
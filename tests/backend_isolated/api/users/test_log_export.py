@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+from sqlalchemy.dialects import postgresql
+
+from app.api.users import users_router
+from app.db import crud
+from app.schemas import (
+    ExportFormat,
+    IPv4Address,
+    UserActionType,
+    UserLogFilterSchema,
+)
+
+LOG_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+TIMESTAMP = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_row(domain):
+    row = dict.fromkeys(column.name for column in crud.LOG_EXPORT_COLUMNS)
+    row.update(
+        id=LOG_ID,
+        user_id=LOG_ID,
+        ip=IPv4Address(ip="127.0.0.1"),
+        timestamp=TIMESTAMP,
+        log_type=UserActionType.GET_ZONE_MASTER,
+        domain=domain,
+    )
+    return row
+
+
+class StreamingSession:
+    def __init__(self):
+        self.statement = None
+
+    async def stream(self, statement):
+        self.statement = statement
+        return self
+
+    def mappings(self):
+        return self
+
+    async def partitions(self):
+        yield [make_row("a.kz")]
+
+
+@pytest.fixture
+def exported_partitions(monkeypatch):
+    partitions = [[make_row("a.kz"), make_row("b.kz")], [make_row("c.kz")]]
+
+    async def fake_iter_user_log_export(session, filters):
+        for partition in partitions:
+            yield partition
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    monkeypatch.setattr(
+        "app.api.users.users_router.crud.iter_user_log_export",
+        fake_iter_user_log_export,
+    )
+    monkeypatch.setattr("app.api.users.users_router.AsyncSessionLocal", fake_session)
+    return partitions
+
+
+async def collect(format):
+    return [
+        chunk
+        async for chunk in users_router._stream_log_export(
+            UserLogFilterSchema(), format
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_query_reads_oldest_first_through_a_server_side_cursor(
+    monkeypatch,
+):
+    monkeypatch.setattr("app.db.crud.settings.LOG_EXPORT_FETCH_SIZE", 500)
+    session = StreamingSession()
+    filters = UserLogFilterSchema(
+        user_id=LOG_ID, domain={"name": "a.kz"}, since=TIMESTAMP, until=TIMESTAMP
+    )
+
+    partitions = [
+        partition
+        async for partition in crud.iter_user_log_export(session, filters=filters)
+    ]
+
+    sql = str(session.statement.compile(dialect=postgresql.dialect()))
+    assert "coalesce(log_zone_master_delete.current_zone_master" in sql
+    assert "log_user_activity.timestamp >= " in sql
+    assert "log_user_activity.timestamp < " in sql
+    assert sql.endswith("ORDER BY log_user_activity.timestamp, log_user_activity.id")
+    assert session.statement.get_execution_options()["yield_per"] == 500
+    assert len(partitions) == 1
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_yields_a_chunk_per_partition(exported_partitions):
+    chunks = await collect(ExportFormat.NDJSON)
+
+    assert len(chunks) == 2
+    records = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [record["domain"] for record in records] == ["a.kz", "b.kz", "c.kz"]
+    assert records[0]["ip"] == "127.0.0.1"
+    assert records[0]["log_type"] == "GET_ZONE_MASTER"
+    assert records[0]["timestamp"] == TIMESTAMP.isoformat()
+
+
+@pytest.mark.asyncio
+async def test_csv_export_starts_with_a_header(exported_partitions):
+    chunks = await collect(ExportFormat.CSV)
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[0] == [column.name for column in crud.LOG_EXPORT_COLUMNS]
+    assert [row[rows[0].index("domain")] for row in rows[1:]] == [
+        "a.kz",
+        "b.kz",
+        "c.kz",
+    ]
+    assert rows[1][rows[0].index("log_type")] == "GET_ZONE_MASTER"
+
+
+def test_unknown_plesk_server_is_a_validation_error():
+    with pytest.raises(RequestValidationError):
+        users_router.get_log_export_filters(plesk_server="unknown.example.com")
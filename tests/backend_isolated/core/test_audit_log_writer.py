@@ -0,0 +1,134 @@
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.audit_log_writer import AuditLogWriter
+from app.db.models import GetZoneMasterLog
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr("app.audit_log_writer.settings.AUDIT_LOG_BATCH_SIZE", 3)
+    monkeypatch.setattr(
+        "app.audit_log_writer.settings.AUDIT_LOG_FLUSH_INTERVAL_SECONDS", 0.05
+    )
+    monkeypatch.setattr("app.audit_log_writer.settings.AUDIT_LOG_QUEUE_SIZE", 4)
+    monkeypatch.setattr(
+        "app.audit_log_writer.settings.AUDIT_LOG_RETRY_DELAY_SECONDS", 0.001
+    )
+
+
+@pytest_asyncio.fixture(loop_scope="function")
+async def writer(monkeypatch):
+    writer = AuditLogWriter()
+    writer.batches = []
+    writer.release = asyncio.Event()
+    writer.release.set()
+
+    async def fake_write_batch(records):
+        await writer.release.wait()
+        writer.batches.append(records)
+
+    monkeypatch.setattr(writer, "_write_batch", fake_write_batch)
+    writer.start()
+    yield writer
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_written_without_waiting(writer):
+    for record in range(6):
+        await writer.enqueue(record)
+    await asyncio.sleep(0.01)
+
+    assert writer.batches == [[0, 1, 2], [3, 4, 5]]
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_written_after_interval(writer):
+    await writer.enqueue("a")
+    await writer.enqueue("b")
+    await asyncio.sleep(0.01)
+    assert writer.batches == []
+
+    await asyncio.sleep(0.1)
+    assert writer.batches == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_producers_wait_when_queue_is_full(writer):
+    writer.release.clear()
+    # The first batch is taken from the queue and blocks in the database
+    for record in range(3):
+        await writer.enqueue(record)
+    await asyncio.sleep(0.01)
+    for record in range(3, 7):
+        await writer.enqueue(record)
+
+    blocked = asyncio.create_task(writer.enqueue(7))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    writer.release.set()
+    await asyncio.wait_for(blocked, 1)
+    await writer.stop()
+    assert [record for batch in writer.batches for record in batch] == list(range(8))
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_queued_records(writer):
+    writer.release.clear()
+    for record in range(3):
+        await writer.enqueue(record)
+    await asyncio.sleep(0.01)
+    for record in range(3, 7):
+        await writer.enqueue(record)
+    writer.release.set()
+
+    await writer.stop()
+
+    assert writer.batches[-2:] == [[3, 4, 5], [6]]
+    assert not writer.is_running
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried(writer, monkeypatch):
+    calls = []
+
+    async def failing_write_batch(records):
+        calls.append(records)
+        if len(calls) == 1:
+            raise RuntimeError("database is down")
+
+    monkeypatch.setattr(writer, "_write_batch", failing_write_batch)
+    for record in range(6):
+        await writer.enqueue(record)
+    await asyncio.sleep(0.05)
+
+    assert calls == [[0, 1, 2], [0, 1, 2], [3, 4, 5]]
+
+
+@pytest.mark.asyncio
+async def test_failing_record_is_dropped_alone(writer, monkeypatch, caplog):
+    records = [
+        GetZoneMasterLog(user_id=uuid.uuid4(), ip="10.0.0.1", domain=f"{name}.kz")
+        for name in ("a", "bad", "c")
+    ]
+    written = []
+
+    async def write_batch(batch):
+        if records[1] in batch:
+            raise RuntimeError("value too long")
+        written.extend(batch)
+
+    monkeypatch.setattr(writer, "_write_batch", write_batch)
+    for record in records:
+        await writer.enqueue(record)
+    await asyncio.sleep(0.05)
+
+    assert written == [records[0], records[2]]
+    dropped = [r.message for r in caplog.records if r.levelname == "ERROR"]
+    assert len(dropped) == 1
+    assert "domain=bad.kz" in dropped[0]
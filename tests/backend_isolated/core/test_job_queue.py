@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import crud
+from app.db.models import Base, User
+from app.job_queue import ItemOutcome, JobHandler, JobQueue, register_job_handler
+from app.schemas import IPv4Address, JobItemStatus, JobStatus, JobType
+
+
+@pytest.fixture
+def db_engine(tmp_path, monkeypatch):
+    # A file database, the queue uses a connection per worker thread
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr("app.job_queue.engine", engine)
+    return engine
+
+
+def create_test_job(engine, keys):
+    with Session(engine) as session:
+        user = User(email="jobs@example.com", hashed_password="x", ssh_username="jobs")
+        session.add(user)
+        session.commit()
+        job = crud.create_job(
+            session=session,
+            user=user,
+            ip=IPv4Address(ip="127.0.0.1"),
+            job_type=JobType.ZONE_MASTER_REMOVAL,
+            items=[(key, {}) for key in keys],
+        )
+        return job.id
+
+
+async def wait_for_status(engine, job_id, statuses):
+    for _ in range(100):
+        with Session(engine) as session:
+            job = crud.get_job(session=session, job_id=job_id)
+            if job.status in statuses:
+                return crud.get_job_progress(session=session, job=job)
+        await asyncio.sleep(0.01)
+    raise AssertionError("Job did not reach the expected status")
+
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_items_and_records_failures(db_engine, monkeypatch):
+    async def run_batch(job, items):
+        return {
+            item.key: ItemOutcome(error="boom" if item.key == "b.kz" else None)
+            for item in items
+        }
+
+    monkeypatch.setattr("app.job_queue.JOB_HANDLERS", {})
+    register_job_handler(
+        JobType.ZONE_MASTER_REMOVAL, JobHandler(run_batch=run_batch, batch_size=2)
+    )
+    job_id = create_test_job(db_engine, ["a.kz", "b.kz", "c.kz"])
+    queue = JobQueue()
+    await queue.start(1)
+    queue.enqueue(job_id)
+    try:
+        progress = await wait_for_status(db_engine, job_id, {JobStatus.COMPLETED})
+    finally:
+        await queue.stop()
+
+    assert progress.items_done == 2
+    assert progress.items_failed == 1
+    assert progress.failures[0].key == "b.kz"
+
+
+@pytest.mark.asyncio
+async def test_job_queue_cancel_finishes_started_batch(db_engine, monkeypatch):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def run_batch(job, items):
+        started.set()
+        await release.wait()
+        return {item.key: ItemOutcome() for item in items}
+
+    monkeypatch.setattr("app.job_queue.JOB_HANDLERS", {})
+    register_job_handler(
+        JobType.ZONE_MASTER_REMOVAL, JobHandler(run_batch=run_batch, batch_size=1)
+    )
+    job_id = create_test_job(db_engine, ["a.kz", "b.kz"])
+    queue = JobQueue()
+    await queue.start(1)
+    queue.enqueue(job_id)
+    try:
+        await asyncio.wait_for(started.wait(), 1)
+        with Session(db_engine) as session:
+            crud.cancel_job(
+                session=session, job=crud.get_job(session=session, job_id=job_id)
+            )
+        queue.cancel(job_id)
+        release.set()
+        for _ in range(100):
+            if not queue.is_running(job_id):
+                break
+            await asyncio.sleep(0.01)
+        progress = await wait_for_status(db_engine, job_id, {JobStatus.CANCELLED})
+    finally:
+        await queue.stop()
+
+    assert not queue.is_running(job_id)
+    # The started batch ran to completion, the next one never started
+    assert progress.items_done == 1
+    assert progress.items_cancelled == 1
+    with Session(db_engine) as session:
+        items = crud.get_job_items(
+            session=session, job_id=job_id, status=JobItemStatus.DONE
+        )
+    assert [item.key for item in items.data] == ["a.kz"]
@@ -0,0 +1,141 @@
+import uuid
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.db.models import User
+from app.user_cache import UserCache
+
+
+class FakeSession:
+    def __init__(self, user, version=1):
+        self.user = user
+        self.version = version
+        self.gets = 0
+        self.statements = []
+
+    def get(self, model, user_id):
+        self.gets += 1
+        return self.user
+
+    def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        result.scalar.return_value = self.version
+        return result
+
+
+def make_user(**kwargs):
+    return User(
+        id=uuid.uuid4(),
+        email="a@example.com",
+        is_active=True,
+        role="USER",
+        **kwargs,
+    )
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = UserCache()
+    monkeypatch.setattr("app.api.dependencies.USER_CACHE", cache)
+    monkeypatch.setattr("app.user_cache.settings.USER_CACHE_TTL_SECONDS", 60)
+    monkeypatch.setattr("app.user_cache.settings.USER_CACHE_VERSION_CHECK_SECONDS", 0)
+    return cache
+
+
+def token_for(user):
+    return create_access_token(user.id, timedelta(minutes=5))
+
+
+def test_user_is_loaded_once():
+    user = make_user()
+    session = FakeSession(user)
+
+    first = get_current_user(session, token_for(user))
+    second = get_current_user(session, token_for(user))
+
+    assert first == second
+    assert first.id == user.id
+    assert session.gets == 1
+
+
+def test_version_change_drops_cached_users():
+    user = make_user()
+    session = FakeSession(user)
+    get_current_user(session, token_for(user))
+
+    session.version = 2
+    get_current_user(session, token_for(user))
+
+    assert session.gets == 2
+
+
+def test_version_is_read_at_most_once_per_interval(monkeypatch):
+    monkeypatch.setattr(
+        "app.user_cache.settings.USER_CACHE_VERSION_CHECK_SECONDS", 3600
+    )
+    user = make_user()
+    session = FakeSession(user)
+
+    for _ in range(3):
+        get_current_user(session, token_for(user))
+
+    assert len(session.statements) == 1
+    assert session.gets == 1
+
+
+def test_expired_users_are_reloaded(monkeypatch):
+    user = make_user()
+    session = FakeSession(user)
+    get_current_user(session, token_for(user))
+
+    monkeypatch.setattr("app.user_cache.settings.USER_CACHE_TTL_SECONDS", -1)
+    get_current_user(session, token_for(user))
+
+    assert session.gets == 2
+
+
+def test_invalidate_evicts_and_bumps_the_version(cache):
+    user = make_user()
+    session = FakeSession(user)
+    get_current_user(session, token_for(user))
+
+    cache.invalidate(session, user.id)
+    get_current_user(session, token_for(user))
+
+    assert session.gets == 2
+    assert (
+        "ON CONFLICT (id) DO UPDATE SET version = (user_version.version + "
+        in (session.statements[1])
+    )
+
+
+def test_cached_inactive_user_is_rejected(cache):
+    user = make_user()
+    session = FakeSession(user)
+    get_current_user(session, token_for(user))
+    user.is_active = False
+    cache.invalidate(session, user.id)
+
+    with pytest.raises(HTTPException) as error:
+        get_current_user(session, token_for(user))
+
+    assert error.value.status_code == 400
+
+
+def test_oldest_users_are_evicted_first(monkeypatch, cache):
+    monkeypatch.setattr("app.user_cache.settings.USER_CACHE_MAX_ENTRIES", 1)
+    first, second = make_user(), make_user()
+    session = FakeSession(first)
+    get_current_user(session, token_for(first))
+    session.user = second
+    get_current_user(session, token_for(second))
+
+    assert cache.get(session, first.id) is None
+    assert cache.get(session, second.id).id == second.id
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.workflow import Workflow, WorkflowError, WorkflowStep
+
+
+@pytest.mark.asyncio
+async def test_workflow_runs_independent_steps_concurrently():
+    async def slow_step():
+        await asyncio.sleep(0.1)
+        return 1
+
+    async def dependent_step(first, second):
+        return first + second
+
+    result = await Workflow(
+        [
+            WorkflowStep("first", slow_step),
+            WorkflowStep("second", slow_step),
+            WorkflowStep("sum", dependent_step, depends_on=["first", "second"]),
+        ]
+    ).run()
+
+    assert result.results["sum"] == 2
+    assert result.timings["first"].started_ms < 50
+    assert result.timings["second"].started_ms < 50
+    assert result.timings["sum"].started_ms >= 100
+    assert "sum;dur=" in result.server_timing_header()
+
+
+@pytest.mark.asyncio
+async def test_workflow_failure_cancels_pending_steps():
+    dependent_ran = False
+
+    async def failing_step():
+        raise RuntimeError("failed")
+
+    async def dependent_step(failing):
+        nonlocal dependent_ran
+        dependent_ran = True
+
+    with pytest.raises(RuntimeError):
+        await Workflow(
+            [
+                WorkflowStep("failing", failing_step),
+                WorkflowStep("dependent", dependent_step, depends_on=["failing"]),
+            ]
+        ).run()
+    assert not dependent_ran
+
+
+def test_workflow_rejects_cycles():
+    async def step(**kwargs):
+        pass
+
+    with pytest.raises(WorkflowError):
+        Workflow(
+            [
+                WorkflowStep("first", step, depends_on=["second"]),
+                WorkflowStep("second", step, depends_on=["first"]),
+            ]
+        )
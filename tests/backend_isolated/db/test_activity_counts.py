@@ -0,0 +1,106 @@
+import uuid
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.db.activity_counts import activity_count_upsert, get_activity_counts
+from app.db.models import GetPleskLoginLinkLog, GetZoneMasterLog
+from app.schemas import AnalyticsBucket, AnalyticsGroupBy, UserActionType
+
+USER_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+
+def zone_master_log(hour):
+    return GetZoneMasterLog(
+        user_id=USER_ID,
+        ip="127.0.0.1",
+        domain="a.kz",
+        timestamp=datetime(2024, 1, 1, hour, tzinfo=timezone.utc),
+    )
+
+
+class RecordingSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        result.mappings.return_value.all.return_value = self.rows
+        return result
+
+
+def test_logs_are_counted_per_day_user_type_and_server():
+    login_log = GetPleskLoginLinkLog(
+        user_id=USER_ID,
+        ip="127.0.0.1",
+        plesk_server="plesk.example.com",
+        ssh_username="user",
+        subscription_id=1,
+        timestamp=datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc),
+    )
+
+    statement = activity_count_upsert(
+        [zone_master_log(1), zone_master_log(2), login_log]
+    )
+
+    compiled = statement.compile(dialect=postgresql.dialect())
+    assert "ON CONFLICT (day, user_id, log_type, plesk_server) DO UPDATE" in str(
+        compiled
+    )
+    assert "log_activity_daily_count.count + excluded.count" in str(compiled)
+    rows = sorted(
+        (params["plesk_server"], params["log_type"], params["count"])
+        for params in (
+            {
+                key: compiled.params[f"{key}_m{i}"]
+                for key in ("plesk_server", "log_type", "count")
+            }
+            for i in range(2)
+        )
+    )
+    assert rows == [
+        ("", UserActionType.GET_ZONE_MASTER, 2),
+        ("plesk.example.com", UserActionType.GET_SUBSCRIPTION_LOGIN_LINK, 1),
+    ]
+
+
+def test_no_logs_no_statement():
+    assert activity_count_upsert([]) is None
+
+
+@pytest.mark.asyncio
+async def test_counts_are_summed_per_bucket_and_group():
+    session = RecordingSession(
+        rows=[
+            {
+                "bucket": date(2024, 1, 1),
+                "log_type": UserActionType.GET_ZONE_MASTER,
+                "plesk_server": "",
+                "count": 3,
+            }
+        ]
+    )
+
+    analytics = await get_activity_counts(
+        session,
+        since=date(2024, 1, 1),
+        until=date(2024, 2, 1),
+        bucket=AnalyticsBucket.WEEK,
+        group_by=[AnalyticsGroupBy.SERVER],
+        log_type=UserActionType.GET_ZONE_MASTER,
+    )
+
+    sql = session.statements[0]
+    assert "date_trunc(%(date_trunc_1)s, log_activity_daily_count.day)" in sql
+    assert "sum(log_activity_daily_count.count)" in sql
+    assert "log_activity_daily_count.plesk_server" in sql
+    assert "log_activity_daily_count.user_id" not in sql
+    assert "log_user_activity" not in sql
+    assert analytics.bucket == AnalyticsBucket.WEEK
+    assert analytics.data[0].count == 3
+    assert analytics.data[0].plesk_server is None
+    assert analytics.data[0].user_id is None
@@ -0,0 +1,128 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.db.counts import CountCache, Explain, count_rows, count_rows_sync
+from app.db.models import User
+from app.schemas import CountStrategy
+
+
+class FakeSession:
+    def __init__(self, count=7, plan_rows=50000):
+        self.count = count
+        self.plan_rows = plan_rows
+        self.statements = []
+
+    def execute(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        result = MagicMock()
+        if sql.startswith("EXPLAIN"):
+            result.scalar.return_value = [{"Plan": {"Plan Rows": self.plan_rows}}]
+        else:
+            result.scalar.return_value = self.count
+        return result
+
+    async def run_sync(self, fn, *args):
+        return fn(self, *args)
+
+
+@pytest.fixture(autouse=True)
+def count_cache(monkeypatch):
+    cache = CountCache()
+    monkeypatch.setattr("app.db.counts.COUNT_CACHE", cache)
+    monkeypatch.setattr("app.db.counts.settings.COUNT_CACHE_TTL_SECONDS", 30)
+    monkeypatch.setattr("app.db.counts.settings.COUNT_ESTIMATE_MIN_ROWS", 10000)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_exact_count_runs_every_time():
+    session = FakeSession()
+
+    for _ in range(2):
+        assert await count_rows(session, select(User.id), CountStrategy.EXACT) == (
+            7,
+            CountStrategy.EXACT,
+        )
+
+    assert len(session.statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_count_is_kept_per_filter():
+    session = FakeSession()
+    admins = select(User.id).where(User.full_name == "admin")
+    others = select(User.id).where(User.full_name == "other")
+
+    await count_rows(session, admins, CountStrategy.CACHED)
+    session.count = 8
+    assert await count_rows(session, admins, CountStrategy.CACHED) == (
+        7,
+        CountStrategy.CACHED,
+    )
+    assert await count_rows(session, others, CountStrategy.CACHED) == (
+        8,
+        CountStrategy.CACHED,
+    )
+    assert len(session.statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_count_expires(monkeypatch):
+    session = FakeSession()
+    await count_rows(session, select(User.id), CountStrategy.CACHED)
+
+    monkeypatch.setattr("app.db.counts.settings.COUNT_CACHE_TTL_SECONDS", -1)
+    session.count = 8
+
+    assert await count_rows(session, select(User.id), CountStrategy.CACHED) == (
+        8,
+        CountStrategy.CACHED,
+    )
+
+
+@pytest.mark.asyncio
+async def test_large_results_use_the_planner_estimate():
+    session = FakeSession(plan_rows=50000)
+
+    assert await count_rows(session, select(User.id), CountStrategy.ESTIMATED) == (
+        50000,
+        CountStrategy.ESTIMATED,
+    )
+    assert session.statements == [
+        'EXPLAIN (FORMAT JSON) SELECT 1 \nFROM "user"',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_small_estimates_are_counted_exactly():
+    session = FakeSession(plan_rows=12)
+
+    assert await count_rows(session, select(User.id), CountStrategy.ESTIMATED) == (
+        7,
+        CountStrategy.EXACT,
+    )
+
+
+def test_sync_sessions_share_the_count_cache():
+    session = FakeSession()
+    count_rows_sync(session, select(User.id), CountStrategy.CACHED)
+    session.count = 8
+
+    assert count_rows_sync(session, select(User.id), CountStrategy.CACHED) == (
+        7,
+        CountStrategy.CACHED,
+    )
+    assert len(session.statements) == 1
+
+
+def test_explain_keeps_bind_parameters():
+    compiled = Explain(select(User.id).where(User.email == "a@example.com")).compile(
+        dialect=postgresql.dialect()
+    )
+
+    assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert list(compiled.params.values()) == ["a@example.com"]
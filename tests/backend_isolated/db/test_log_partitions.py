@@ -0,0 +1,132 @@
+import gzip
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.db import log_partitions
+from app.db.log_partitions import (
+    LOG_TABLES,
+    add_months,
+    archive_log_partition,
+    create_log_partitions,
+    month_start,
+    partition_name,
+)
+
+
+class RecordingConnection:
+    def __init__(self, partitions=()):
+        self.partitions = list(partitions)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        result = MagicMock()
+        result.scalar.return_value = True
+        result.scalars.return_value = self.partitions
+        return result
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    connection = RecordingConnection()
+    engine = MagicMock()
+    engine.begin.return_value.__enter__.return_value = connection
+    monkeypatch.setattr("app.db.log_partitions.engine", engine)
+    return connection
+
+
+def test_months_roll_over_years():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert month_start(datetime(2024, 3, 31, 23, 30, tzinfo=timezone.utc)) == date(
+        2024, 3, 1
+    )
+
+
+def test_partitions_are_created_for_every_table_and_month():
+    connection = RecordingConnection()
+
+    create_log_partitions(connection, date(2024, 12, 15), date(2025, 1, 1))
+
+    assert len(connection.statements) == 2 * len(LOG_TABLES)
+    assert connection.statements[0] == (
+        "CREATE TABLE IF NOT EXISTS log_user_activity_p202412 "
+        "PARTITION OF log_user_activity FOR VALUES "
+        "FROM ('2024-12-01 00:00:00+00') TO ('2025-01-01 00:00:00+00')"
+    )
+    assert "log_zone_master_get_p202501 " in " ".join(connection.statements)
+
+
+def test_archive_exports_before_dropping_details_first(monkeypatch, tmp_path):
+    def fake_copy(connection, partition, file):
+        connection.statements.append(f"COPY {partition}")
+        file.write(f"id\n{partition}\n".encode())
+
+    monkeypatch.setattr("app.db.log_partitions._copy_partition", fake_copy)
+    connection = RecordingConnection()
+
+    archive_log_partition(connection, date(2024, 1, 1), str(tmp_path))
+
+    statements = connection.statements
+    last_copy = max(i for i, sql in enumerate(statements) if sql.startswith("COPY"))
+    first_drop = min(i for i, sql in enumerate(statements) if "DETACH" in sql)
+    assert last_copy < first_drop
+    assert statements[-1] == "DROP TABLE log_user_activity_p202401"
+    archive = tmp_path / "log_zone_master_get_p202401.csv.gz"
+    assert gzip.decompress(archive.read_bytes()) == b"id\nlog_zone_master_get_p202401\n"
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_logs_are_kept_without_a_retention(monkeypatch, connection):
+    monkeypatch.setattr("app.db.log_partitions.settings.LOG_RETENTION_MONTHS", None)
+    connection.partitions = [partition_name("log_user_activity", date(2000, 1, 1))]
+    archive = MagicMock()
+    monkeypatch.setattr("app.db.log_partitions.archive_log_partition", archive)
+
+    log_partitions.maintain_log_partitions(datetime(2024, 5, 10, tzinfo=timezone.utc))
+
+    archive.assert_not_called()
+    assert any("log_user_activity_p202408 " in sql for sql in connection.statements)
+
+
+def test_months_before_the_retention_window_are_archived(monkeypatch, connection):
+    monkeypatch.setattr("app.db.log_partitions.settings.LOG_RETENTION_MONTHS", 2)
+    connection.partitions = [
+        partition_name("log_user_activity", date(2024, month, 1))
+        for month in (1, 2, 3, 4, 5)
+    ]
+    archive = MagicMock()
+    monkeypatch.setattr("app.db.log_partitions.archive_log_partition", archive)
+
+    log_partitions.maintain_log_partitions(datetime(2024, 5, 10, tzinfo=timezone.utc))
+
+    assert [call.args[1] for call in archive.call_args_list] == [
+        date(2024, 1, 1),
+        date(2024, 2, 1),
+    ]
+
+
+def test_a_failed_month_does_not_stop_the_others(monkeypatch, connection):
+    monkeypatch.setattr("app.db.log_partitions.settings.LOG_RETENTION_MONTHS", 2)
+    connection.partitions = [
+        partition_name("log_user_activity", date(2024, month, 1))
+        for month in (1, 2, 3, 4, 5)
+    ]
+
+    def fail_january(connection, month, archive_dir):
+        if month == date(2024, 1, 1):
+            raise OSError("disk full")
+
+    archive = MagicMock(side_effect=fail_january)
+    monkeypatch.setattr("app.db.log_partitions.archive_log_partition", archive)
+
+    log_partitions.maintain_log_partitions(datetime(2024, 5, 10, tzinfo=timezone.utc))
+
+    assert [call.args[1] for call in archive.call_args_list] == [
+        date(2024, 1, 1),
+        date(2024, 2, 1),
+    ]
+    # The setup and each month run in their own transaction
+    assert log_partitions.engine.begin.call_count == 3
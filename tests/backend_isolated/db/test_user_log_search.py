@@ -0,0 +1,151 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.db import crud
+from app.db.models import DeleteZonemasterLog, GetZoneMasterLog, User
+from app.schemas import UserLogFilterSchema
+
+
+class RecordingSession:
+    def __init__(self, total_count, rows):
+        self.total_count = total_count
+        self.rows = rows
+        self.statements = []
+
+    def record(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        result.scalar.return_value = self.total_count
+        result.all.return_value = self.rows
+        return result
+
+    async def execute(self, statement):
+        return self.record(statement)
+
+    async def run_sync(self, fn, *args):
+        return fn(MagicMock(execute=self.record), *args)
+
+
+def make_row(minute):
+    log = GetZoneMasterLog(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        ip="127.0.0.1",
+        domain="a.kz",
+        timestamp=datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc),
+    )
+    user = User(id=log.user_id, email="a@example.com", full_name="A")
+    return log, user
+
+
+def test_cursor_round_trip():
+    log = MagicMock(timestamp=datetime.now(timezone.utc), id=uuid.uuid4())
+
+    assert crud.decode_log_cursor(crud.encode_log_cursor(log)) == (
+        log.timestamp,
+        log.id,
+    )
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "YWJj"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        crud.decode_log_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_only_subtables_with_the_filtered_columns_are_joined():
+    session = RecordingSession(total_count=1, rows=[])
+    filters = UserLogFilterSchema(
+        user_id=uuid.uuid4(), domain={"name": "a.kz"}, subscription_id=1
+    )
+
+    await crud.get_user_log_entries_by_id(session, filters=filters)
+
+    for statement in session.statements:
+        assert "log_plesk_subscription_login" in statement
+        assert "log_zone_master" not in statement
+        assert "log_plesk_mail_get_test_mail" not in statement
+    assert '"user"' not in session.statements[0]
+
+
+@pytest.mark.asyncio
+async def test_domain_is_searched_without_joining_details():
+    session = RecordingSession(total_count=1, rows=[])
+    filters = UserLogFilterSchema(domain={"name": "a.kz"})
+
+    await crud.get_user_log_entries_by_id(session, filters=filters)
+
+    for statement in session.statements:
+        assert "log_user_activity.domain = " in statement
+        assert "JOIN log_" not in statement
+
+
+@pytest.mark.asyncio
+async def test_cursor_page_seeks_instead_of_offset():
+    rows = [make_row(minute) for minute in (3, 2, 1)]
+    session = RecordingSession(total_count=10, rows=rows)
+    cursor = crud.encode_log_cursor(rows[0][0])
+
+    page = await crud.get_user_log_entries_by_id(
+        session, filters=UserLogFilterSchema(), page_size=2, cursor=cursor
+    )
+
+    statement = session.statements[1]
+    assert "(log_user_activity.timestamp, log_user_activity.id) <" in statement
+    assert "OFFSET" not in statement
+    assert len(page.data) == 2
+    assert page.next_cursor == crud.encode_log_cursor(rows[1][0])
+
+
+@pytest.mark.asyncio
+async def test_last_page_has_no_next_cursor():
+    session = RecordingSession(total_count=1, rows=[make_row(1)])
+
+    page = await crud.get_user_log_entries_by_id(
+        session, filters=UserLogFilterSchema(), page_size=2
+    )
+
+    assert page.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_filters_no_log_type_has_are_not_queried(monkeypatch):
+    # Every filterable details column is in the login link logs, move one
+    # to another log type for the filters to exclude each other
+    monkeypatch.setitem(
+        crud.LOG_FILTER_COLUMNS,
+        "subscription_id",
+        {DeleteZonemasterLog: DeleteZonemasterLog.__table__.c.current_zone_master},
+    )
+    session = RecordingSession(total_count=1, rows=[])
+    filters = UserLogFilterSchema(subscription_id=1, plesk_server="plesk.example.com")
+
+    assert await crud.get_user_log_entries_by_id(session, filters=filters) is None
+    assert session.statements == []
+
+
+@pytest.mark.asyncio
+async def test_time_range_is_repeated_on_joined_details_for_partition_pruning():
+    session = RecordingSession(total_count=1, rows=[])
+    filters = UserLogFilterSchema(
+        ssh_username="user",
+        since=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        until=datetime(2024, 2, 1, tzinfo=timezone.utc),
+    )
+
+    await crud.get_user_log_entries_by_id(session, filters=filters)
+
+    statement = session.statements[1]
+    for table in ("log_user_activity", "log_plesk_subscription_login"):
+        assert statement.count(f"{table}.timestamp >= ") == 1
+        assert statement.count(f"{table}.timestamp < ") == 1
+    assert (
+        "log_plesk_subscription_login.id = log_user_activity.id AND "
+        "log_plesk_subscription_login.timestamp = log_user_activity.timestamp"
+        in statement
+    )
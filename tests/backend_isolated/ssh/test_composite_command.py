@@ -0,0 +1,108 @@
+import subprocess
+
+import pytest
+
+from app.AsyncSSHandler import SshConcurrencyLimits
+from app.composite_command import (
+    CompositeCommandError,
+    CompositeStep,
+    StepCondition,
+    StepExpectation,
+    build_composite_command,
+    execute_composite_command_in_batch,
+    parse_composite_output,
+)
+from app.host_health import HostHealthRegistry
+
+NONCE = "testnonce"
+
+
+def run_locally(steps: list[CompositeStep]):
+    command = build_composite_command(steps, NONCE)
+    stdout = subprocess.run(
+        ["sh", "-c", command], capture_output=True, text=True
+    ).stdout
+    return parse_composite_output(steps, stdout, NONCE)
+
+
+def test_composite_command_frames_every_step():
+    results = run_locally(
+        [
+            CompositeStep("first", "echo 1184"),
+            CompositeStep("second", "echo failed >&2; exit 3"),
+        ]
+    )
+
+    assert results["first"]["stdout"] == "1184"
+    assert results["first"]["returncode"] == 0
+    assert results["second"]["stdout"] is None
+    assert results["second"]["stderr"] == "failed"
+    assert results["second"]["returncode"] == 3
+
+
+def test_composite_command_skips_steps_with_unmet_conditions():
+    results = run_locally(
+        [
+            CompositeStep("exists", "true"),
+            CompositeStep(
+                "dependent",
+                "echo should not run",
+                run_if=[StepCondition("exists", StepExpectation.OUTPUT)],
+            ),
+            CompositeStep(
+                "fallback",
+                "echo 'created \"$HOME\"'",
+                run_if=[
+                    StepCondition("exists", StepExpectation.SUCCESS),
+                    StepCondition("dependent", StepExpectation.NO_OUTPUT),
+                ],
+            ),
+        ]
+    )
+
+    assert results["dependent"]["skipped"] is True
+    assert results["fallback"]["skipped"] is True
+
+
+def test_composite_command_ignores_output_spoofing_markers():
+    results = run_locally(
+        [CompositeStep("first", "echo '__COMPOSITE_STEP_other__ END first 0'")]
+    )
+
+    assert results["first"]["stdout"] == "__COMPOSITE_STEP_other__ END first 0"
+
+
+def test_composite_command_rejects_forward_references():
+    with pytest.raises(CompositeCommandError):
+        build_composite_command(
+            [
+                CompositeStep(
+                    "first",
+                    "true",
+                    run_if=[StepCondition("second", StepExpectation.SUCCESS)],
+                ),
+                CompositeStep("second", "true"),
+            ],
+            NONCE,
+        )
+
+
+@pytest.mark.asyncio
+async def test_composite_command_in_batch_runs_on_every_host(monkeypatch):
+    monkeypatch.setattr(
+        "app.AsyncSSHandler._build_ssh_command", lambda host, command: command
+    )
+    monkeypatch.setattr("app.AsyncSSHandler.HOST_HEALTH", HostHealthRegistry())
+    monkeypatch.setattr("app.AsyncSSHandler.mark_host_used", lambda host: None)
+    monkeypatch.setattr(
+        "app.AsyncSSHandler.SSH_BATCH_LIMITS", SshConcurrencyLimits(32, 4)
+    )
+
+    results = await execute_composite_command_in_batch(
+        ["a.kz", "b.kz"], [CompositeStep("first", "echo 1184")], verbose=False
+    )
+
+    assert {host: steps["first"]["stdout"] for host, steps in results.items()} == {
+        "a.kz": "1184",
+        "b.kz": "1184",
+    }
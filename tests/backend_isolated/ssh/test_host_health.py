@@ -0,0 +1,103 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.AsyncSSHandler import HOST_UNAVAILABLE, execute_ssh_commands_in_batch
+from app.host_health import CircuitState, HostHealthRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_COOLDOWN_SECONDS", 60)
+    registry = HostHealthRegistry()
+    monkeypatch.setattr("app.AsyncSSHandler.HOST_HEALTH", registry)
+    return registry
+
+
+def test_circuit_opens_after_consecutive_connection_failures(registry):
+    registry.record_result("down.kz", 255, 1.0)
+    assert registry.allow_request("down.kz")
+
+    registry.record_result("down.kz", 255, 1.0)
+
+    assert registry._get("down.kz").state == CircuitState.OPEN
+    assert not registry.allow_request("down.kz")
+
+
+def test_remote_command_failure_keeps_circuit_closed(registry):
+    for _ in range(5):
+        registry.record_result("up.kz", 1, 12.0)
+
+    assert registry._get("up.kz").state == CircuitState.CLOSED
+    assert registry._get("up.kz").rolling_latency_ms == 12.0
+
+
+def test_half_open_probe_closes_circuit(registry, monkeypatch):
+    registry.record_failure("flaky.kz")
+    registry.record_failure("flaky.kz")
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_COOLDOWN_SECONDS", 0)
+
+    assert registry.allow_request("flaky.kz")
+    assert registry._get("flaky.kz").state == CircuitState.HALF_OPEN
+
+    registry.record_success("flaky.kz", 5.0)
+    assert registry._get("flaky.kz").state == CircuitState.CLOSED
+
+
+def test_failed_half_open_probe_reopens_circuit(registry, monkeypatch):
+    registry.record_failure("flaky.kz")
+    registry.record_failure("flaky.kz")
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_COOLDOWN_SECONDS", 0)
+    registry.allow_request("flaky.kz")
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_COOLDOWN_SECONDS", 60)
+
+    registry.record_failure("flaky.kz")
+
+    assert registry._get("flaky.kz").state == CircuitState.OPEN
+    assert not registry.allow_request("flaky.kz")
+
+
+def test_open_circuit_is_shared_between_workers(registry, tmp_path):
+    first = HostHealthRegistry(str(tmp_path))
+    second = HostHealthRegistry(str(tmp_path))
+
+    first.record_failure("down.kz")
+    first.record_failure("down.kz")
+    assert not second.allow_request("down.kz")
+
+    second.record_success("down.kz", 5.0)
+    assert first.allow_request("down.kz")
+    assert first._get("down.kz").state == CircuitState.CLOSED
+
+
+def test_only_one_worker_probes_a_host(registry, tmp_path, monkeypatch):
+    first = HostHealthRegistry(str(tmp_path))
+    second = HostHealthRegistry(str(tmp_path))
+    first.record_failure("flaky.kz")
+    first.record_failure("flaky.kz")
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_COOLDOWN_SECONDS", 0)
+    assert first.allow_request("flaky.kz")
+
+    monkeypatch.setattr("app.host_health.settings.HOST_CIRCUIT_COOLDOWN_SECONDS", 60)
+    assert not second.allow_request("flaky.kz")
+
+
+@pytest.mark.asyncio
+async def test_batch_skips_open_circuit_hosts(registry):
+    registry.record_failure("down.kz")
+    registry.record_failure("down.kz")
+    mock_result = {"host": "up.kz", "stdout": "ok", "stderr": None, "returncode": 0}
+
+    with patch(
+        "app.AsyncSSHandler._execute_ssh_command",
+        new_callable=AsyncMock,
+        return_value=mock_result,
+    ) as mock_execute:
+        results = await execute_ssh_commands_in_batch(
+            ["up.kz", "down.kz"], "echo ok", verbose=False
+        )
+
+    assert mock_execute.await_count == 1
+    assert results[0] == mock_result
+    assert results[1].stderr == HOST_UNAVAILABLE
+    assert results[1].returncode is None
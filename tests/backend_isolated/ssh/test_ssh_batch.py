@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.AsyncSSHandler import SshConcurrencyLimits, execute_ssh_commands_per_host
+from app.host_health import HostHealthRegistry
+
+
+@pytest.fixture
+def running(monkeypatch):
+    monkeypatch.setattr("app.AsyncSSHandler.HOST_HEALTH", HostHealthRegistry())
+    monkeypatch.setattr("app.AsyncSSHandler.mark_host_used", lambda host: None)
+    monkeypatch.setattr(
+        "app.AsyncSSHandler.SSH_BATCH_LIMITS", SshConcurrencyLimits(32, 4)
+    )
+    running = {"total": 0, "max_total": 0, "max_per_host": {}}
+    per_host = {}
+
+    async def fake_execute(host, command, verbose):
+        per_host[host] = per_host.get(host, 0) + 1
+        running["total"] += 1
+        running["max_total"] = max(running["max_total"], running["total"])
+        running["max_per_host"][host] = max(
+            running["max_per_host"].get(host, 0), per_host[host]
+        )
+        await asyncio.sleep(0.01)
+        per_host[host] -= 1
+        running["total"] -= 1
+        return {"host": host, "stdout": command, "stderr": None, "returncode": 0}
+
+    monkeypatch.setattr("app.AsyncSSHandler._execute_ssh_command", fake_execute)
+    return running
+
+
+@pytest.mark.asyncio
+async def test_results_keep_host_and_command_order(running):
+    commands_by_host = {
+        "a.kz": [f"echo a{i}" for i in range(5)],
+        "b.kz": ["echo b0"],
+        "c.kz": [],
+    }
+
+    results = await execute_ssh_commands_per_host(commands_by_host, verbose=False)
+
+    assert list(results) == ["a.kz", "b.kz", "c.kz"]
+    for host, commands in commands_by_host.items():
+        assert [result.stdout for result in results[host]] == commands
+        assert all(result.host == host for result in results[host])
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limits(running):
+    commands_by_host = {f"{name}.kz": ["true"] * 6 for name in "abcd"}
+
+    await execute_ssh_commands_per_host(
+        commands_by_host, verbose=False, limits=SshConcurrencyLimits(5, 2)
+    )
+
+    assert running["max_total"] == 5
+    assert max(running["max_per_host"].values()) == 2
+
+
+@pytest.mark.asyncio
+async def test_limits_are_shared_by_concurrent_calls(running):
+    limits = SshConcurrencyLimits(32, 2)
+
+    await asyncio.gather(
+        *(
+            execute_ssh_commands_per_host(
+                {"a.kz": ["true"] * 2}, verbose=False, limits=limits
+            )
+            for _ in range(3)
+        )
+    )
+
+    assert running["max_per_host"]["a.kz"] == 2
@@ -0,0 +1,131 @@
+import pytest
+import pytest_asyncio
+from unittest.mock import patch, AsyncMock
+
+from app.AsyncSSHandler import execute_ssh_command, execute_ssh_commands_in_batch
+from app.host_health import HostHealthRegistry
+from app.ssh_broker import SshBrokerServer
+from app.ssh_broker_client import (
+    SshBrokerClient,
+    SshBrokerError,
+    SshBrokerResponseError,
+)
+
+
+def mock_result(host):
+    return {"host": host, "stdout": "ok", "stderr": None, "returncode": 0}
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "broker.sock")
+    monkeypatch.setattr("app.ssh_broker_client.settings.SSH_BROKER_SOCKET", path)
+    monkeypatch.setattr("app.AsyncSSHandler.HOST_HEALTH", HostHealthRegistry())
+    monkeypatch.setattr("app.ssh_broker.HOST_HEALTH", HostHealthRegistry())
+    monkeypatch.setattr("app.AsyncSSHandler.mark_host_used", lambda host: None)
+    return path
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = SshBrokerClient()
+    monkeypatch.setattr("app.AsyncSSHandler.SSH_BROKER_CLIENT", client)
+    return client
+
+
+@pytest_asyncio.fixture(loop_scope="function")
+async def server(socket_path):
+    server = SshBrokerServer(socket_path)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_batch_commands_run_in_broker(server, client):
+    with patch(
+        "app.AsyncSSHandler._execute_ssh_command",
+        new_callable=AsyncMock,
+        side_effect=lambda host, command, verbose: mock_result(host),
+    ) as mock_execute:
+        results = await execute_ssh_commands_in_batch(
+            ["a.kz", "b.kz", "c.kz"], "echo ok", verbose=False
+        )
+
+    assert [result.host for result in results] == ["a.kz", "b.kz", "c.kz"]
+    assert mock_execute.await_count == 3
+    assert server.commands_executed == 3
+    assert (await client.request("stats"))["clients"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_output_budget_is_applied_in_broker(server, client, monkeypatch):
+    monkeypatch.setattr(
+        "app.AsyncSSHandler._build_ssh_command", lambda host, command: command
+    )
+
+    result = await execute_ssh_command(
+        "a.kz", "seq 1 10000000", verbose=False, max_lines=2
+    )
+
+    assert (result.stdout, result.truncated, result.returncode) == ("1\n2", True, None)
+    assert server.commands_executed == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_reports_errors_per_request(server, client):
+    with pytest.raises(SshBrokerError, match="Unknown operation"):
+        await client.request("reboot")
+
+    assert await client.request("health") == []
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_execution_without_broker(socket_path, client):
+    with patch(
+        "app.AsyncSSHandler._execute_ssh_command",
+        new_callable=AsyncMock,
+        return_value=mock_result("a.kz"),
+    ) as mock_execute:
+        result = await execute_ssh_command("a.kz", "echo ok", verbose=False)
+
+    assert result == mock_result("a.kz")
+    mock_execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_pending_requests_fail_when_broker_stops(server, client):
+    async def slow_command(host, command, verbose):
+        await server.stop()
+        return mock_result(host)
+
+    with (
+        patch("app.AsyncSSHandler._execute_ssh_command", side_effect=slow_command),
+        pytest.raises(SshBrokerResponseError),
+    ):
+        await client.request("exec", host="a.kz", command="echo ok")
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_command_is_not_rerun_locally_when_broker_fails_after_receiving_it(
+    server, client
+):
+    async def slow_command(host, command, verbose):
+        await server.stop()
+        return mock_result(host)
+
+    with (
+        patch(
+            "app.AsyncSSHandler._execute_ssh_command", side_effect=slow_command
+        ) as mock_execute,
+        pytest.raises(SshBrokerResponseError),
+    ):
+        await execute_ssh_command("a.kz", "echo ok", verbose=False)
+
+    # Only the run inside the broker
+    assert mock_execute.call_count == 1
+    await client.close()
@@ -0,0 +1,40 @@
+import os
+import time
+
+import pytest
+
+from app.ssh_warmup import SshKeepAlive
+
+
+@pytest.fixture(autouse=True)
+def usage_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.ssh_socket_usage.SSH_SOCKET_USAGE_DIR", str(tmp_path))
+    monkeypatch.setattr("app.ssh_warmup.SSH_SOCKETS_LIVETIME_MIN", 5)
+    monkeypatch.setattr(
+        "app.ssh_warmup.settings.SSH_KEEPALIVE_REFRESH_MARGIN_SECONDS", 60
+    )
+    return tmp_path
+
+
+def test_only_sockets_close_to_expiry_are_refreshed(usage_dir):
+    now = time.time()
+    for host, idle_seconds in [("busy.kz", 10), ("idle.kz", 250)]:
+        marker = usage_dir / host
+        marker.touch()
+        os.utime(marker, (now - idle_seconds, now - idle_seconds))
+    keepalive = SshKeepAlive(["busy.kz", "idle.kz", "new.kz"])
+
+    assert keepalive.hosts_to_refresh(now) == ["idle.kz", "new.kz"]
+
+
+def test_single_scheduler_holds_the_lock(tmp_path):
+    lock_path = str(tmp_path / "keepalive.lock")
+    first = SshKeepAlive([], lock_path=lock_path)
+    second = SshKeepAlive([], lock_path=lock_path)
+
+    assert first.try_acquire_lock()
+    assert not second.try_acquire_lock()
+
+    first.release_lock()
+    assert second.try_acquire_lock()
+    second.release_lock()
@@ -0,0 +1,45 @@
+import re
+
+from app.ssh_result import SSHResult, SSHResultSet
+
+
+def test_output_is_decoded_once_and_stripped():
+    result = SSHResult("a.kz", b"  first\n\nsecond\tcol\n", b"", 0, elapsed=0.5)
+
+    assert result.stdout == "first\n\nsecond\tcol"
+    assert result.stdout is result.stdout
+    assert result.stderr is None
+    assert result == {
+        "host": "a.kz",
+        "stdout": "first\n\nsecond\tcol",
+        "stderr": None,
+        "returncode": 0,
+    }
+
+
+def test_line_helpers():
+    result = SSHResult("a.kz", b"1\tone\r\n\n2\ttwo\nzone 10.0.0.1;\n", None, 0)
+
+    assert list(result.lines()) == ["1\tone", "2\ttwo", "zone 10.0.0.1;"]
+    assert list(result.tsv_rows()) == [["1", "one"], ["2", "two"], ["zone 10.0.0.1;"]]
+    assert result.first_match(r"\d+\.\d+\.\d+\.\d+").group(0) == "10.0.0.1"
+    assert result.first_match(re.compile("missing")) is None
+    assert list(SSHResult("a.kz", None, None, 0).tsv_rows()) == []
+
+
+def test_result_set_helpers():
+    results = SSHResultSet(
+        [
+            SSHResult("ns1.kz", b"10.0.0.1", None, 0, elapsed=0.1),
+            {"host": "ns2.kz", "stdout": "10.0.0.1", "stderr": None, "returncode": 0},
+            SSHResult("ns3.kz", b"", b"not found", 1, elapsed=0.3),
+        ]
+    )
+
+    assert [result.host for result in results.answered()] == ["ns1.kz", "ns2.kz"]
+    assert results.group_by_output() == {
+        "10.0.0.1": ["ns1.kz", "ns2.kz"],
+        None: ["ns3.kz"],
+    }
+    assert results.timings() == {"ns1.kz": 0.1, "ns2.kz": None, "ns3.kz": 0.3}
+    assert results.by_host()["ns3.kz"].stderr == "not found"
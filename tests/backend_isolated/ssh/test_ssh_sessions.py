@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from app.AsyncSSHandler import execute_ssh_command
+from app.host_health import HostHealthRegistry
+from app.ssh_sessions import RemoteShellSessionPool
+
+
+@pytest.fixture(autouse=True)
+def local_sessions(monkeypatch):
+    # Sessions run a local bash instead of one over ssh
+    monkeypatch.setattr(
+        "app.ssh_sessions._build_session_command", lambda host: "exec bash"
+    )
+    monkeypatch.setattr("app.ssh_sessions.settings.SSH_SESSIONS_PER_HOST", 1)
+    monkeypatch.setattr("app.AsyncSSHandler.HOST_HEALTH", HostHealthRegistry())
+    monkeypatch.setattr("app.AsyncSSHandler.mark_host_used", lambda host: None)
+
+
+@pytest_asyncio.fixture(loop_scope="function")
+async def pool():
+    pool = RemoteShellSessionPool()
+    yield pool
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pipelined_commands_are_demultiplexed(pool):
+    results = await asyncio.gather(
+        *(pool.run("a.kz", f"seq 1 {i}; echo oops >&2; exit {i}") for i in range(5))
+    )
+
+    for i, (stdout, stderr, returncode) in enumerate(results):
+        assert stdout.split() == [str(n).encode() for n in range(1, i + 1)]
+        assert stderr == b"oops\n"
+        assert returncode == i
+    assert len(pool._sessions["a.kz"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_command_is_expanded_like_one_shot_ssh(pool):
+    stdout, _, _ = await pool.run("a.kz", r"echo \"a  b\" | grep -Po '\\w+' | head -n1")
+
+    assert stdout.strip() == b"a"
+
+
+@pytest.mark.asyncio
+async def test_dead_session_is_restarted(pool):
+    _, _, returncode = await pool.run("a.kz", "kill -9 \\$\\$")
+    assert returncode == 255
+
+    stdout, _, returncode = await pool.run("a.kz", "echo back")
+    assert (stdout.strip(), returncode) == (b"back", 0)
+
+
+@pytest.mark.asyncio
+async def test_executor_uses_sessions_when_enabled(pool, monkeypatch):
+    monkeypatch.setattr("app.AsyncSSHandler.settings.SSH_PERSISTENT_SESSIONS", True)
+    monkeypatch.setattr("app.AsyncSSHandler.SSH_SESSIONS", pool)
+
+    result = await execute_ssh_command("a.kz", "echo $((6 * 7))", verbose=False)
+
+    assert result == {"host": "a.kz", "stdout": "42", "stderr": None, "returncode": 0}
+
+
+@pytest.mark.asyncio
+async def test_session_budget_stops_the_command_on_the_host(pool, monkeypatch):
+    monkeypatch.setattr("app.AsyncSSHandler.settings.SSH_PERSISTENT_SESSIONS", True)
+    monkeypatch.setattr("app.AsyncSSHandler.SSH_SESSIONS", pool)
+
+    lines = await execute_ssh_command(
+        "a.kz", "seq 1 10000000", max_lines=2, verbose=False
+    )
+    partial = await execute_ssh_command(
+        "a.kz", "seq 1 1000", max_bytes=7, verbose=False
+    )
+    whole = await execute_ssh_command(
+        "a.kz", "printf 'a\\nb'; exit 3", max_bytes=3, verbose=False
+    )
+
+    assert (lines.stdout, lines.truncated, lines.returncode) == ("1\n2", True, None)
+    assert (partial.stdout, partial.truncated) == ("1\n2\n3", True)
+    assert (whole.stdout, whole.truncated, whole.returncode) == ("a\nb", False, 3)
@@ -0,0 +1,49 @@
+import pytest
+
+from app.AsyncSSHandler import execute_ssh_command
+from app.host_health import HostHealthRegistry
+
+
+@pytest.fixture(autouse=True)
+def run_commands_locally(monkeypatch):
+    monkeypatch.setattr(
+        "app.AsyncSSHandler._build_ssh_command", lambda host, command: command
+    )
+    monkeypatch.setattr("app.AsyncSSHandler.HOST_HEALTH", HostHealthRegistry())
+    monkeypatch.setattr("app.AsyncSSHandler.mark_host_used", lambda host: None)
+
+
+@pytest.mark.asyncio
+async def test_line_budget_stops_the_command():
+    result = await execute_ssh_command(
+        "localhost", "seq 1 10000000", max_lines=3, verbose=False
+    )
+
+    assert result.stdout == "1\n2\n3"
+    assert result.truncated is True
+    assert result.returncode is None
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_drops_partial_line():
+    result = await execute_ssh_command(
+        "localhost", "seq 1 1000", max_bytes=7, verbose=False
+    )
+
+    assert result.stdout == "1\n2\n3"
+    assert result.truncated is True
+
+
+@pytest.mark.asyncio
+async def test_whole_output_within_budget_is_read():
+    result = await execute_ssh_command(
+        "localhost",
+        "printf 'a\\nb\\nc'; echo oops >&2; exit 3",
+        max_lines=10,
+        verbose=False,
+    )
+
+    assert result.stdout == "a\nb\nc"
+    assert result.stderr == "oops"
+    assert result.returncode == 3
+    assert result.truncated is False
@@ -0,0 +1,108 @@
+"""
+Compares daily log counts per user and log type computed by scanning the
+polymorphic activity log with reading them from the daily counts table.
+
+Needs the PostgreSQL database from the settings:
+`python -m tests.benchmarks.bench_activity_analytics`.
+"""
+
+import asyncio
+import time
+from datetime import date
+
+from sqlalchemy import Date, cast, delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, async_engine, engine
+from app.db.activity_counts import get_activity_counts
+from app.db.models import (
+    ActivityDailyCount,
+    GetZoneMasterLog,
+    User,
+    UsersActivityLog,
+)
+from app.schemas import AnalyticsBucket, AnalyticsGroupBy
+from tests.benchmarks.bench_log_search_pages import LOGS, seed
+
+RUNS = 20
+SINCE = date(2020, 1, 1)
+UNTIL = date(2020, 2, 1)
+
+
+async def scan_logs(session) -> None:
+    day = cast(func.timezone("UTC", UsersActivityLog.timestamp), Date)
+    await session.execute(
+        select(day, UsersActivityLog.user_id, UsersActivityLog.log_type, func.count())
+        .where(UsersActivityLog.timestamp >= SINCE, UsersActivityLog.timestamp < UNTIL)
+        .group_by(day, UsersActivityLog.user_id, UsersActivityLog.log_type)
+    )
+
+
+async def read_counts(session) -> None:
+    await get_activity_counts(
+        session,
+        since=SINCE,
+        until=UNTIL,
+        bucket=AnalyticsBucket.DAY,
+        group_by=[AnalyticsGroupBy.USER],
+    )
+
+
+async def timed(name: str, query) -> None:
+    timings = []
+    for _ in range(RUNS):
+        async with AsyncSessionLocal() as session:
+            start_time = time.perf_counter()
+            await query(session)
+            timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    print(f"{name}: median {timings[len(timings) // 2] * 1000:.1f}ms")
+
+
+async def main() -> None:
+    with Session(engine) as session:
+        user_id = session.execute(
+            select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+        ).scalar_one()
+    seed(user_id)
+    # seed() inserts past the audit write path, count its logs like the
+    # migration does
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO log_activity_daily_count "
+                "(day, user_id, log_type, plesk_server, count) "
+                "SELECT (timestamp AT TIME ZONE 'UTC')::date, user_id, log_type, '', "
+                "count(*) FROM log_user_activity "
+                "WHERE timestamp >= :since AND timestamp < :until GROUP BY 1, 2, 3 "
+                "ON CONFLICT (day, user_id, log_type, plesk_server) "
+                "DO UPDATE SET count = excluded.count"
+            ),
+            {"since": SINCE, "until": UNTIL},
+        )
+    print(f"{LOGS} logs")
+
+    await timed("scan logs", scan_logs)
+    await timed("daily counts", read_counts)
+
+    with Session(engine) as session:
+        bench_logs = select(GetZoneMasterLog.id).where(
+            GetZoneMasterLog.domain == "bench.kz"
+        )
+        session.execute(
+            delete(UsersActivityLog).where(UsersActivityLog.id.in_(bench_logs))
+        )
+        session.execute(
+            delete(ActivityDailyCount).where(
+                ActivityDailyCount.user_id == user_id,
+                ActivityDailyCount.day >= SINCE,
+                ActivityDailyCount.day < UNTIL,
+            )
+        )
+        session.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Measures audit log write throughput in records/s: one transaction per
+record, as the log functions did before the writer, versus records queued
+to AuditLogWriter and inserted in batches.
+
+Needs the PostgreSQL database from the settings:
+`python -m tests.benchmarks.bench_audit_log_writer`.
+"""
+
+import asyncio
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.audit_log_writer import AuditLogWriter
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, async_engine, engine
+from app.db.models import GetZoneMasterLog, User, UsersActivityLog
+
+RECORDS = 5000
+CONCURRENCY = 20
+
+
+def bench_record(user_id) -> GetZoneMasterLog:
+    return GetZoneMasterLog(user_id=user_id, domain="bench.kz", ip="127.0.0.1")
+
+
+async def per_record_commit(user_id) -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def write() -> None:
+        async with semaphore, AsyncSessionLocal() as session:
+            session.add(bench_record(user_id))
+            await session.commit()
+
+    await asyncio.gather(*(write() for _ in range(RECORDS)))
+
+
+async def batched_writer(user_id) -> None:
+    writer = AuditLogWriter()
+    writer.start()
+    for _ in range(RECORDS):
+        await writer.enqueue(bench_record(user_id))
+    await writer.stop()
+
+
+async def measure(name: str, write, user_id) -> None:
+    start_time = time.perf_counter()
+    await write(user_id)
+    elapsed = time.perf_counter() - start_time
+    print(f"{name}: {RECORDS / elapsed:.0f} records/s ({elapsed:.2f}s)")
+
+
+async def main() -> None:
+    with Session(engine) as session:
+        user_id = session.execute(
+            select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+        ).scalar_one()
+
+    await measure("commit per record", per_record_commit, user_id)
+    await measure(
+        f"writer, batches of {settings.AUDIT_LOG_BATCH_SIZE}", batched_writer, user_id
+    )
+
+    with Session(engine) as session:
+        bench_logs = select(GetZoneMasterLog.id).where(
+            GetZoneMasterLog.domain == "bench.kz"
+        )
+        session.execute(
+            delete(UsersActivityLog).where(UsersActivityLog.id.in_(bench_logs))
+        )
+        session.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Measures how long the event loop stalls while audit logs are written
+concurrently, with a sync Session committing inside async functions
+versus an AsyncSession. A ticker sleeping 1ms records how late it wakes up.
+
+Needs the PostgreSQL database from the settings:
+`python -m tests.benchmarks.bench_audit_log_writes`.
+"""
+
+import asyncio
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, async_engine, engine
+from app.db.models import GetZoneMasterLog, User, UsersActivityLog
+from app.schemas import UserPublic
+
+WRITES = 500
+CONCURRENCY = 20
+TICK_SECONDS = 0.001
+
+
+async def sync_log_write(user: UserPublic) -> None:
+    # The behaviour before the async engine: a blocking commit on the loop
+    with Session(engine) as session:
+        session.add(
+            GetZoneMasterLog(user_id=user.id, domain="bench.kz", ip="127.0.0.1")
+        )
+        session.commit()
+
+
+async def async_log_write(user: UserPublic) -> None:
+    async with AsyncSessionLocal() as session:
+        session.add(
+            GetZoneMasterLog(user_id=user.id, domain="bench.kz", ip="127.0.0.1")
+        )
+        await session.commit()
+
+
+async def measure(name: str, write, user: UserPublic) -> None:
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            start_time = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start_time - TICK_SECONDS)
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited_write() -> None:
+        async with semaphore:
+            await write(user)
+
+    ticker_task = asyncio.create_task(ticker())
+    start_time = time.perf_counter()
+    await asyncio.gather(*(limited_write() for _ in range(WRITES)))
+    elapsed = time.perf_counter() - start_time
+    done.set()
+    await ticker_task
+
+    lags.sort()
+    print(
+        f"{name}: {WRITES / elapsed:.0f} writes/s, "
+        f"loop stalled {sum(lags) * 1000:.0f}ms in total, "
+        f"max stall {lags[-1] * 1000:.1f}ms, "
+        f"p99 stall {lags[int(len(lags) * 0.99) - 1] * 1000:.1f}ms"
+    )
+
+
+async def main() -> None:
+    with Session(engine) as session:
+        user = session.execute(
+            select(User).where(User.email == settings.FIRST_SUPERUSER)
+        ).scalar_one()
+        user = UserPublic.model_validate(user, from_attributes=True)
+
+    await measure("sync session", sync_log_write, user)
+    await measure("async session", async_log_write, user)
+
+    with Session(engine) as session:
+        bench_logs = select(GetZoneMasterLog.id).where(
+            GetZoneMasterLog.domain == "bench.kz"
+        )
+        session.execute(
+            delete(UsersActivityLog).where(UsersActivityLog.id.in_(bench_logs))
+        )
+        session.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Measures the time get_current_user adds to a request: loading and
+validating the user on every call as it used to, versus serving it from
+the user cache.
+
+Needs the PostgreSQL database from the settings:
+`python -m tests.benchmarks.bench_auth_overhead`.
+"""
+
+import time
+from datetime import timedelta
+
+import jwt
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.dependencies import get_current_user
+from app.core import security
+from app.core.config import settings
+from app.core.db import engine
+from app.db.models import User
+from app.schemas import TokenPayload, UserPublic
+from app.user_cache import USER_CACHE
+
+RUNS = 2000
+
+
+def uncached_current_user(session: Session, token: str) -> UserPublic:
+    # The lookup get_current_user did before the cache
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    user = session.get(User, TokenPayload(**payload).sub)
+    return UserPublic.model_validate(user, from_attributes=True)
+
+
+def timed(name: str, current_user, token: str) -> None:
+    timings = []
+    for _ in range(RUNS):
+        # A session per request, as SessionDep opens
+        with Session(engine) as session:
+            start_time = time.perf_counter()
+            current_user(session, token)
+            timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    print(
+        f"{name}: median {timings[len(timings) // 2] * 1e6:.0f}us, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f}us"
+    )
+
+
+def main() -> None:
+    with Session(engine) as session:
+        user_id = session.execute(
+            select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+        ).scalar_one()
+    token = security.create_access_token(user_id, timedelta(minutes=30))
+
+    timed("database lookup", uncached_current_user, token)
+    USER_CACHE.clear()
+    timed("user cache", get_current_user, token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares peak Python memory while exporting a user's activity logs: loading
+them all with `.scalars().all()` as GET /users/{id}/history does, versus
+streaming NDJSON chunks from a server-side cursor.
+
+Needs the PostgreSQL database from the settings:
+`python -m tests.benchmarks.bench_log_export`.
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.api.users.users_router import _stream_log_export
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, async_engine, engine
+from app.db.models import GetZoneMasterLog, User, UsersActivityLog
+from app.schemas import ExportFormat, UserLogFilterSchema
+from tests.benchmarks.bench_log_search_pages import LOGS, seed
+
+
+async def load_all(user_id) -> int:
+    async with AsyncSessionLocal() as session:
+        logs = (
+            (
+                await session.execute(
+                    select(UsersActivityLog).where(UsersActivityLog.user_id == user_id)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        return len(str([vars(log) for log in logs]))
+
+
+async def stream(user_id) -> int:
+    size = 0
+    async for chunk in _stream_log_export(
+        UserLogFilterSchema(user_id=user_id), ExportFormat.NDJSON
+    ):
+        size += len(chunk)
+    return size
+
+
+async def measure(name: str, export, user_id) -> None:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    size = await export(user_id)
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name}: {elapsed:.2f}s, peak {peak / 2**20:.1f}MiB, "
+        f"{size / 2**20:.1f}MiB of output"
+    )
+
+
+async def main() -> None:
+    with Session(engine) as session:
+        user_id = session.execute(
+            select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+        ).scalar_one()
+    seed(user_id)
+    print(f"{LOGS} logs, fetch size {settings.LOG_EXPORT_FETCH_SIZE}")
+
+    await measure("load all", load_all, user_id)
+    await measure("stream", stream, user_id)
+
+    with Session(engine) as session:
+        bench_logs = select(GetZoneMasterLog.id).where(
+            GetZoneMasterLog.domain == "bench.kz"
+        )
+        session.execute(
+            delete(UsersActivityLog).where(UsersActivityLog.id.in_(bench_logs))
+        )
+        session.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Compares the time to fetch the first and a deep page of the activity log
+search, with OFFSET paging versus the (timestamp, id) cursor, and the
+first page with each total count strategy.
+
+Needs the PostgreSQL database from the settings:
+`python -m tests.benchmarks.bench_log_search_pages`.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, async_engine, engine
+from app.db import crud
+from app.db.log_partitions import create_log_partitions
+from app.db.models import GetZoneMasterLog, User, UsersActivityLog
+from app.schemas import CountStrategy, UserActionType, UserLogFilterSchema
+
+LOGS = 100_000
+PAGE_SIZE = 50
+DEEP_PAGE = LOGS // PAGE_SIZE - 1
+RUNS = 20
+
+
+def seed(user_id) -> None:
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as connection:
+        create_log_partitions(
+            connection, start.date(), (start + timedelta(seconds=LOGS)).date()
+        )
+    with Session(engine) as session:
+        logs = session.execute(
+            insert(UsersActivityLog).returning(
+                UsersActivityLog.id, UsersActivityLog.timestamp
+            ),
+            [
+                {
+                    "user_id": user_id,
+                    "ip": "127.0.0.1",
+                    "log_type": UserActionType.GET_ZONE_MASTER,
+                    "domain": "bench.kz",
+                    "timestamp": start + timedelta(seconds=i),
+                }
+                for i in range(LOGS)
+            ],
+        ).all()
+        session.execute(
+            insert(GetZoneMasterLog.__table__),
+            [{"id": log_id, "timestamp": timestamp} for log_id, timestamp in logs],
+        )
+        session.commit()
+
+
+async def timed(name: str, **kwargs) -> None:
+    filters = UserLogFilterSchema(domain={"name": "bench.kz"})
+    timings = []
+    for _ in range(RUNS):
+        async with AsyncSessionLocal() as session:
+            start_time = time.perf_counter()
+            await crud.get_user_log_entries_by_id(
+                session, filters=filters, page_size=PAGE_SIZE, **kwargs
+            )
+            timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    print(f"{name}: median {timings[len(timings) // 2] * 1000:.1f}ms")
+
+
+async def main() -> None:
+    with Session(engine) as session:
+        user_id = session.execute(
+            select(User.id).where(User.email == settings.FIRST_SUPERUSER)
+        ).scalar_one()
+    seed(user_id)
+
+    # The cursor a client walking the pages holds before the deep page: the
+    # last log of the page before it
+    with Session(engine) as session:
+        last_log = session.scalars(
+            select(GetZoneMasterLog)
+            .where(GetZoneMasterLog.domain == "bench.kz")
+            .order_by(GetZoneMasterLog.timestamp.desc(), GetZoneMasterLog.id.desc())
+            .offset((DEEP_PAGE - 1) * PAGE_SIZE - 1)
+            .limit(1)
+        ).one()
+        deep_cursor = crud.encode_log_cursor(last_log)
+
+    await timed("first page")
+    await timed(f"page {DEEP_PAGE} by offset", page=DEEP_PAGE)
+    await timed(f"page {DEEP_PAGE} by cursor", cursor=deep_cursor)
+    for strategy in CountStrategy:
+        await timed(f"first page, {strategy.value} count", count_strategy=strategy)
+
+    with Session(engine) as session:
+        bench_logs = select(GetZoneMasterLog.id).where(
+            GetZoneMasterLog.domain == "bench.kz"
+        )
+        session.execute(
+            delete(UsersActivityLog).where(UsersActivityLog.id.in_(bench_logs))
+        )
+        session.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
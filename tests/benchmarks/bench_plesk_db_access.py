@@ -0,0 +1,44 @@
+"""
+Compares Plesk database query latency of `plesk db` CLI calls with pooled
+connections over an SSH forwarded MySQL socket.
+
+Needs SSH access to a real Plesk server:
+`python -m tests.benchmarks.bench_plesk_db_access <plesk server>`.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from app.api.plesk.plesk_db import PleskDb
+from app.core.config import settings
+
+RUNS = 50
+QUERY = "SELECT CASE WHEN webspace_id = 0 THEN id ELSE webspace_id END AS result FROM domains WHERE name = %s"
+
+
+async def measure(plesk_db: PleskDb, host: str, domain: str) -> list[float]:
+    timings = []
+    for _ in range(RUNS):
+        start_time = time.perf_counter()
+        await plesk_db.query(host, QUERY, (domain,))
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return timings
+
+
+async def main(host: str, domain: str) -> None:
+    plesk_db = PleskDb()
+    for mode in ("cli", "tunnel"):
+        settings.PLESK_DB_ACCESS_MODE = mode
+        timings = await measure(plesk_db, host, domain)
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(
+            f"{mode}: first {timings[0]:.1f}ms, "
+            f"p50 {statistics.median(timings):.1f}ms, p95 {p95:.1f}ms"
+        )
+    await plesk_db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "example.com"))
@@ -0,0 +1,129 @@
+"""
+Compares one and four API worker processes running SSH commands directly
+with the same workers sending them through the SSH broker. Reports the
+ssh processes spawned, the processes holding their own host health and
+circuit state, and the p50/p99 command latency seen by the workers.
+
+Runs the command on hosts over SSH:
+`python -m tests.benchmarks.bench_ssh_broker <host> [<host> ...]`, or
+locally without host arguments.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+import app.AsyncSSHandler as ssh_handler
+from app.core.config import settings
+from app.ssh_broker import SshBrokerServer
+from app.ssh_broker_client import SSH_BROKER_CLIENT
+
+COMMAND = "echo online"
+REQUESTS_PER_WORKER = 200
+CONCURRENCY_PER_WORKER = 8
+
+
+def count_spawns(counter) -> None:
+    execute = ssh_handler._execute_ssh_command
+
+    async def counted(host, command, verbose):
+        with counter.get_lock():
+            counter.value += 1
+        return await execute(host, command, verbose)
+
+    ssh_handler._execute_ssh_command = counted
+
+
+async def run_requests(hosts: List[str]) -> List[float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(CONCURRENCY_PER_WORKER)
+
+    async def request(i: int) -> None:
+        async with semaphore:
+            start_time = time.perf_counter()
+            await ssh_handler.execute_ssh_command(
+                hosts[i % len(hosts)], COMMAND, verbose=False
+            )
+            latencies.append((time.perf_counter() - start_time) * 1000)
+
+    await asyncio.gather(*(request(i) for i in range(REQUESTS_PER_WORKER)))
+    await SSH_BROKER_CLIENT.close()
+    return latencies
+
+
+def worker(hosts, socket_path, counter, results) -> None:
+    settings.SSH_BROKER_SOCKET = socket_path
+    count_spawns(counter)
+    results.extend(asyncio.run(run_requests(hosts)))
+
+
+def broker(socket_path, counter, ready) -> None:
+    settings.SSH_BROKER_SOCKET = socket_path
+    SSH_BROKER_CLIENT.disable()
+    count_spawns(counter)
+
+    async def serve() -> None:
+        server = SshBrokerServer(socket_path)
+        await server.start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def measure(hosts: List[str], workers: int, use_broker: bool) -> None:
+    context = multiprocessing.get_context("fork")
+    manager = context.Manager()
+    latencies = manager.list()
+    spawns = context.Value("i", 0)
+    socket_path = None
+    broker_process = None
+    if use_broker:
+        socket_path = os.path.join(tempfile.mkdtemp(), "ssh-broker.sock")
+        ready = context.Event()
+        broker_process = context.Process(
+            target=broker, args=(socket_path, spawns, ready)
+        )
+        broker_process.start()
+        ready.wait()
+
+    processes = [
+        context.Process(target=worker, args=(hosts, socket_path, spawns, latencies))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    if broker_process is not None:
+        broker_process.terminate()
+        broker_process.join()
+
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    name = f"{workers} worker(s) {'with' if use_broker else 'without'} broker"
+    print(
+        f"{name}: {spawns.value} ssh processes, "
+        f"{1 if use_broker else workers} health registries, "
+        f"p50 {statistics.median(latencies):.1f}ms, p99 {p99:.1f}ms"
+    )
+    manager.shutdown()
+
+
+def main(hosts: List[str]) -> None:
+    for workers in (1, 4):
+        for use_broker in (False, True):
+            measure(hosts, workers, use_broker)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1:])
+    else:
+        ssh_handler._build_ssh_command = lambda host, command: command
+        main(["localhost"])
@@ -0,0 +1,49 @@
+"""
+Compares per-command latency of one ssh process per command with the same
+commands sent through a persistent remote shell session.
+
+Runs the command on a host over SSH:
+`python -m tests.benchmarks.bench_ssh_sessions <host>`, or locally
+without a host argument.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import app.AsyncSSHandler as ssh_handler
+import app.ssh_sessions as ssh_sessions
+
+COMMAND = "grep -F root /etc/passwd | head -n1"
+REQUESTS = 200
+
+
+async def measure(name: str, host: str) -> None:
+    latencies = []
+    for _ in range(REQUESTS):
+        start_time = time.perf_counter()
+        await ssh_handler._run_ssh_command(host, COMMAND, verbose=False)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    latencies.sort()
+    print(
+        f"{name}: p50 {statistics.median(latencies):.2f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}ms"
+    )
+
+
+async def main(host: str) -> None:
+    ssh_handler.settings.SSH_PERSISTENT_SESSIONS = False
+    await measure("ssh process per command", host)
+    ssh_handler.settings.SSH_PERSISTENT_SESSIONS = True
+    await measure("persistent session", host)
+    await ssh_sessions.SSH_SESSIONS.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        asyncio.run(main(sys.argv[1]))
+    else:
+        ssh_handler._build_ssh_command = lambda host, command: command
+        ssh_sessions._build_session_command = lambda host: "exec bash"
+        asyncio.run(main("localhost"))
@@ -0,0 +1,53 @@
+"""
+Compares peak Python memory and latency of the buffered SSH executor with
+the streaming reader stopping after a line budget.
+
+Runs the command on a host over SSH:
+`python -m tests.benchmarks.bench_ssh_stream_reader <host>`, or locally
+without a host argument.
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+import app.AsyncSSHandler as ssh_handler
+
+LINES = 2_000_000
+MAX_LINES = 1000
+COMMAND = f"seq 1 {LINES}"
+
+
+async def measure(name: str, run) -> None:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = await run()
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name}: {elapsed_ms:.1f}ms, peak {peak / 1024 / 1024:.2f}MiB, "
+        f"stdout {len(result.stdout or '')} chars"
+    )
+
+
+async def main(host: str) -> None:
+    await measure(
+        "buffered",
+        lambda: ssh_handler.execute_ssh_command(host, COMMAND, verbose=False),
+    )
+    await measure(
+        "streaming",
+        lambda: ssh_handler.execute_ssh_command(
+            host, COMMAND, verbose=False, max_lines=MAX_LINES
+        ),
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        asyncio.run(main(sys.argv[1]))
+    else:
+        ssh_handler._build_ssh_command = lambda host, command: command
+        asyncio.run(main("localhost"))
@@ -0,0 +1,83 @@
+"""
+Compares the correlated-subquery subscription lookup with the join based one
+on a MariaDB container seeded with 100k domains.
+
+The plans are printed with EXPLAIN; timings are measured over a direct
+connection so the container exec overhead does not hide the difference.
+
+Run with `python -m tests.benchmarks.bench_subscription_query`.
+"""
+
+import time
+
+from app.api.plesk.ssh_utils import (
+    build_subscription_info_query,
+    extract_subscription_details,
+)
+from app.ssh_result import SSHResult
+from tests.utils.container_db_utils import TestMariadb, TEST_DB_CMD
+
+DOMAIN_COUNT = 100_000
+RUNS = 20
+SEARCHES = {
+    "exact": "d10001.bulk10000.kz",
+    "partial": "d1000%",
+}
+
+
+def build_legacy_subscription_info_query(domain_to_find: str) -> str:
+    return f"""
+    SELECT
+        base.subscription_id AS result,
+        (SELECT name FROM domains WHERE id = base.subscription_id) AS name,
+        (SELECT pname FROM clients WHERE id = base.cl_id) AS username,
+        (SELECT login FROM clients WHERE id = base.cl_id) AS userlogin,
+        (SELECT GROUP_CONCAT(CONCAT(d2.name, ':', d2.status) SEPARATOR ',')
+        FROM domains d2
+        WHERE base.subscription_id IN (d2.id, d2.webspace_id)) AS domains,
+        (SELECT overuse FROM domains WHERE id = base.subscription_id) as is_space_overused,
+        (SELECT ROUND(real_size/1024/1024) FROM domains WHERE id = base.subscription_id) as subscription_size_mb,
+        (SELECT status FROM domains WHERE id = base.subscription_id) as subscription_status
+    FROM (
+        SELECT
+            CASE
+                WHEN webspace_id = 0 THEN id
+                ELSE webspace_id
+            END AS subscription_id,
+            cl_id,
+            name
+        FROM domains
+        WHERE name LIKE '{domain_to_find}'
+    ) AS base;
+    """
+
+
+def time_query(testdb: TestMariadb, query: str) -> float:
+    with testdb.engine.connect() as connection:
+        start_time = time.perf_counter()
+        for _ in range(RUNS):
+            connection.exec_driver_sql(query).all()
+        return (time.perf_counter() - start_time) / RUNS * 1000
+
+
+def main() -> None:
+    testdb = TestMariadb().populate_db_bulk(domain_count=DOMAIN_COUNT)
+    builders = {
+        "legacy": build_legacy_subscription_info_query,
+        "join": build_subscription_info_query,
+    }
+    for search_name, search in SEARCHES.items():
+        for builder_name, builder in builders.items():
+            query = builder(search)
+            plan = testdb.run_cmd(TEST_DB_CMD.format("EXPLAIN " + query.strip()))
+            output = testdb.run_cmd(TEST_DB_CMD.format(query))
+            rows = len(
+                extract_subscription_details(SSHResult("bench", output, None, 0))
+            )
+            print(f"== {search_name} search, {builder_name} query ==")
+            print(plan)
+            print(f"rows: {rows}, avg: {time_query(testdb, query):.2f}ms\n")
+
+
+if __name__ == "__main__":
+    main()
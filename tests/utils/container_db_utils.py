@@ -1,9 +1,10 @@
-from sqlalchemy import String, ForeignKey, Integer, create_engine
+from sqlalchemy import String, ForeignKey, Integer, create_engine, insert
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
 from testcontainers.mysql import MySqlContainer
 from enum import IntEnum
 
 TEST_DB_CMD = "mariadb -B --disable-column-names -p'test' -D'test' -e \\\"{}\\\""
+BULK_DOMAIN_ID_OFFSET = 10_000
 
 
 class Base(DeclarativeBase):
@@ -33,8 +34,8 @@ class Domains(Base):
     id: Mapped[int | None] = mapped_column(
         Integer, primary_key=True, autoincrement=True, nullable=True
     )
-    name: Mapped[str] = mapped_column(String(255), nullable=False)
-    webspace_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    webspace_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     cl_id: Mapped[int | None] = mapped_column(
         Integer, ForeignKey("clients.id"), nullable=True
     )
@@ -141,11 +142,47 @@ class TestMariadb:
             session.add_all(subdomains)
             session.commit()
 
+    def __insert_bulk_data(self, domain_count: int, domains_per_subscription: int):
+        with Session(self.engine) as session:
+            client = Clients(pname="BULK_USER", login="p-bulk")
+            session.add(client)
+            session.commit()
+
+            rows = []
+            subscription_id = 0
+            last_domain_id = BULK_DOMAIN_ID_OFFSET + domain_count
+            for domain_id in range(BULK_DOMAIN_ID_OFFSET, last_domain_id):
+                offset = domain_id - BULK_DOMAIN_ID_OFFSET
+                is_subscription = offset % domains_per_subscription == 0
+                if is_subscription:
+                    subscription_id = domain_id
+                rows.append(
+                    {
+                        "id": domain_id,
+                        "name": f"d{domain_id}.bulk{subscription_id}.kz",
+                        "webspace_id": 0 if is_subscription else subscription_id,
+                        "cl_id": client.id,
+                        "status": DomainStatus.ONLINE.value,
+                        "overuse": 0,
+                        "real_size": 317 * 1024 * 1024,
+                    }
+                )
+            session.execute(insert(Domains), rows)
+            session.commit()
+
     def populate_db(self):
         self.__create_db_and_tables()
         self.__insert_sample_data()
         return self
 
+    def populate_db_bulk(
+        self, domain_count: int = 100_000, domains_per_subscription: int = 10
+    ):
+        self.__create_db_and_tables()
+        self.__insert_sample_data()
+        self.__insert_bulk_data(domain_count, domains_per_subscription)
+        return self
+
     def run_cmd(self, cmd: str) -> str:
         cmd_to_exec = f'sh -c "{cmd}"'
         return self.container.exec(cmd_to_exec).output.decode("utf-8")